@@ -0,0 +1,167 @@
+# bench_crawler.py
+# Đo hiệu năng loop_ver3 (engine crawler_core) offline: chạy crawler headless trên mock_tvpl_server.py.
+#
+# Báo cáo:
+#   - docs/min
+#   - số request mạng của trình duyệt mỗi văn bản, chia theo method + loại tài nguyên
+#     (sự kiện công khai context.on("request"); request HTTP thuần / tải file đếm ở phía server)
+#   - bytes tải về mỗi văn bản (đếm phía server)
+#   - thời gian + số lần save_checkpoint
+#   - bảng thời gian từng stage (lấy từ crawler_core.METRICS, xem crawl_metrics.py)
+#
+# Chạy:
+#   python bench_crawler.py --max-docs 50 --latency-ms 100 --no-sleep
+#   python bench_crawler.py --max-docs 30 --fail-rate 0.05 --out bench.json
+#   python bench_crawler.py --max-docs 1 --search-pages 120 --search-fetch browser   (so với mặc định http)
+
+import argparse, asyncio, builtins, json, shutil, tempfile, time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+import loop_ver3  # noqa: F401  (nạp cấu hình loop_ver3 vào crawler_core)
+import crawler_core as crawler
+from mock_tvpl_server import Corpus, MockState, start_server
+
+# ========== ĐẾM REQUEST ==========
+class RequestCounter:
+    """Gắn context.on("request") vào mọi context crawler mở (bọc crawler_core.open_browser)."""
+    def __init__(self):
+        self.by_type = Counter()
+
+    def attach(self, context):
+        context.on("request", lambda req: self.by_type.update([f"{req.method} {req.resource_type}"]))
+
+    @contextmanager
+    def installed(self):
+        orig = crawler.open_browser
+
+        async def counted(p):
+            context, page = await orig(p)
+            contexts = [s.context for s in context.sessions] if crawler.SESSION == "pool" else [context]
+            for ctx in contexts:
+                self.attach(ctx)
+            return context, page
+
+        crawler.open_browser = counted
+        try:
+            yield self
+        finally:
+            crawler.open_browser = orig
+
+    @property
+    def total(self) -> int:
+        return sum(self.by_type.values())
+
+@contextmanager
+def auto_enter():
+    """Challenge giả: coi như người dùng nhấn Enter ngay; trả lại input gốc khi xong."""
+    orig = builtins.input
+    builtins.input = lambda *a, **k: ""
+    try:
+        yield
+    finally:
+        builtins.input = orig
+
+# ========== CẤU HÌNH CRAWLER ==========
+def configure_crawler(base: str, workdir: Path, args):
+    throttle = crawler.THROTTLE
+    if args.max_rate:
+        crawler.THROTTLE_PROFILES["bench"] = dict(crawler.THROTTLE_PROFILES[throttle], max_rate=args.max_rate)
+        throttle = "bench"
+    if args.no_sleep:
+        throttle = "none"
+    crawler.configure(
+        SEEDS=crawler.SearchRangeSeeds(f"{base}/page/searchlegal.aspx?keyword=mock&page=1", 1, args.search_pages),
+        BASE_URL=base,
+        DOMAIN_OK=base.split("://", 1)[1],
+        OUTPUT_DIR=workdir / "out",
+        PERSIST_DIR=str(workdir / "profile"),
+        HEADLESS=True,
+        SKIP_MANUAL_LOGIN=True,
+        THROTTLE=throttle,
+        SEARCH_FETCH=args.search_fetch,
+        SEARCH_CONCURRENCY=args.search_concurrency,
+    )
+
+# ========== CHẠY ==========
+async def run_until(max_docs: int, timeout_sec: float):
+    task = asyncio.create_task(crawler.crawl())
+    t0 = time.perf_counter()
+    while not task.done():
+        await asyncio.sleep(0.2)
+        if crawler.METRICS.counters.get("docs_saved", 0) >= max_docs or time.perf_counter() - t0 > timeout_sec:
+            task.cancel()
+            break
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    return time.perf_counter() - t0
+
+def bench(args) -> dict:
+    corpus = Corpus(Path(args.raw), args.links_per_section)
+    state = MockState(corpus, args.latency_ms, args.jitter_ms, args.fail_rate, args.challenge_rate)
+    server, base = start_server(state)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_crawl_"))
+    configure_crawler(base, workdir, args)
+
+    rc = RequestCounter()
+    try:
+        with rc.installed(), auto_enter():
+            elapsed = asyncio.run(run_until(args.max_docs, args.timeout))
+    finally:
+        server.shutdown()
+
+    summary = crawler.METRICS.summary()
+    docs = summary["counters"].get("docs_saved", 0)
+    cp = summary["stages"].get("save_checkpoint", {})
+    per_doc = lambda x: round(x / docs, 2) if docs else None
+    report = {
+        "docs": docs,
+        "elapsed_sec": round(elapsed, 2),
+        "docs_per_min": round(docs / elapsed * 60, 2) if elapsed else 0,
+        "browser_requests_total": rc.total,
+        "browser_requests_per_doc": per_doc(rc.total),
+        "top_request_types": rc.by_type.most_common(10),
+        "bytes_total": state.stats["bytes"],
+        "bytes_per_doc": per_doc(state.stats["bytes"]),
+        "server": state.stats,
+        "checkpoint_calls": cp.get("count", 0),
+        "checkpoint_sec": cp.get("total_sec", 0.0),
+        "checkpoint_share": round(cp.get("total_sec", 0.0) / elapsed, 4) if elapsed else 0,
+        "seed_sec": summary["stages"].get("seed.search", {}).get("total_sec", 0.0),
+        "rate": crawler.LIMITER.stats(),
+        "stages": summary["stages"],
+        "counters": summary["counters"],
+        "settings": {k: v for k, v in vars(args).items() if k != "out"},
+    }
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+    else:
+        report["workdir"] = str(workdir)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw", default=str(Path(__file__).resolve().parent.parent / "out_luocdo" / "raw"))
+    parser.add_argument("--max-docs", type=int, default=30)
+    parser.add_argument("--timeout", type=float, default=900)
+    parser.add_argument("--search-pages", type=int, default=1)
+    parser.add_argument("--search-fetch", choices=["http", "browser"], default="http")
+    parser.add_argument("--search-concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--challenge-rate", type=float, default=0.0)
+    parser.add_argument("--links-per-section", type=int, default=3)
+    parser.add_argument("--max-rate", type=float, default=None, help="trần req/s của bộ điều tốc (mặc định như loop_ver3)")
+    parser.add_argument("--no-sleep", action="store_true", help="bỏ điều tốc để đo riêng engine")
+    parser.add_argument("--keep", action="store_true", help="giữ thư mục output tạm")
+    parser.add_argument("--out", default=None, help="ghi báo cáo JSON")
+    args = parser.parse_args()
+
+    report = bench(args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
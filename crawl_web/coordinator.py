@@ -0,0 +1,114 @@
+# coordinator.py
+# Chạy nhiều tiến trình loop_ver3 song song trên 1 frontier chung (SQLite, xem shared_frontier.py).
+#
+# - mỗi worker: profile Chromium riêng (pw_profile_w<i>), output riêng (out_luocdo/workers/w<i>)
+# - trang search được chia theo page_idx mod tổng số worker
+# - URL được cho thuê có hạn; worker chết -> lease hết hạn -> worker khác nhận lại
+# - worker thoát bất thường thì coordinator khởi động lại (tối đa --restarts lần)
+# - worker chạy không người (stdin=DEVNULL): gặp challenge thì trả URL về hàng đợi, nghỉ rồi làm tiếp, không chờ Enter
+#
+# Nhiều máy: để db trong thư mục chia sẻ, mỗi máy chạy `run` với --id-offset khác nhau,
+# cùng --total-workers, thêm --shared-fs. Gộp kết quả: merge_members.py --raw out_luocdo/workers
+#
+# Lần đầu mỗi profile cần đăng nhập / qua Cloudflare bằng tay:
+#   CRAWL_WORKER_ID=0 python loop_ver3.py      (nhấn Enter sau khi login, Ctrl+C để thoát)
+#
+# Chạy:
+#   python coordinator.py seed --db out_luocdo/frontier.db --from out_luocdo/checkpoints/queue.json
+#   python coordinator.py run --db out_luocdo/frontier.db --workers 4 --headless
+#   python coordinator.py status --db out_luocdo/frontier.db
+
+import argparse, json, os, subprocess, sys, time
+from pathlib import Path
+
+from frontier import PriorityFrontier
+from shared_frontier import SQLiteFrontier
+
+HERE = Path(__file__).resolve().parent
+
+def seed(db: str, sources, seen_files, shared_fs: bool):
+    fr = SQLiteFrontier(db, "seed", shared_fs=shared_fs)
+    added = 0
+    for src in sources:
+        items = json.loads(Path(src).read_text(encoding="utf-8"))
+        # queue.json cũ (list URL) hoặc mới (list dict) đều đọc qua PriorityFrontier
+        for e in PriorityFrontier.from_list(items).to_list():
+            added += fr.push(e["url"], e["score"], e["depth"], e["relation"])
+    for src in seen_files:
+        fr.mark_seen(json.loads(Path(src).read_text(encoding="utf-8")))
+    print(f"[SEED] thêm {added} URL -> {db}: {fr.stats()}")
+
+def spawn(worker_id: int, args) -> subprocess.Popen:
+    env = dict(os.environ,
+               CRAWL_WORKER_ID=str(worker_id),
+               CRAWL_FRONTIER_DB=str(Path(args.db).resolve()),
+               CRAWL_NUM_WORKERS=str(args.total_workers or args.workers),
+               CRAWL_NO_LOGIN="1",
+               CRAWL_HEADLESS="1" if args.headless else "0",
+               CRAWL_SHARED_FS="1" if args.shared_fs else "0")
+    log = open(Path(args.log_dir) / f"w{worker_id}.log", "a", encoding="utf-8")
+    print(f"[RUN] khởi động worker w{worker_id} (log: {log.name})")
+    return subprocess.Popen([sys.executable, str(HERE / "loop_ver3.py")], env=env, cwd=os.getcwd(),
+                            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL)
+
+def run(args):
+    Path(args.log_dir).mkdir(parents=True, exist_ok=True)
+    fr = SQLiteFrontier(args.db, "coordinator", shared_fs=args.shared_fs)
+    ids = range(args.id_offset, args.id_offset + args.workers)
+    procs = {i: spawn(i, args) for i in ids}
+    restarts = {i: 0 for i in ids}
+    try:
+        while procs:
+            time.sleep(args.status_every)
+            for i, proc in list(procs.items()):
+                code = proc.poll()
+                if code is None:
+                    continue
+                del procs[i]
+                if code != 0 and restarts[i] < args.restarts and len(fr):
+                    restarts[i] += 1
+                    print(f"[RUN] w{i} thoát mã {code}, khởi động lại ({restarts[i]}/{args.restarts})")
+                    procs[i] = spawn(i, args)
+                else:
+                    print(f"[RUN] w{i} kết thúc (mã {code})")
+            expired = fr.requeue_expired()
+            print(f"[STATUS] {fr.stats()}" + (f", trả lại {expired} lease hết hạn" if expired else ""))
+    except KeyboardInterrupt:
+        print("[RUN] dừng các worker...")
+        for proc in procs.values():
+            proc.terminate()
+        for proc in procs.values():
+            proc.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_seed = sub.add_parser("seed")
+    p_seed.add_argument("--db", required=True)
+    p_seed.add_argument("--from", dest="sources", nargs="*", default=[], help="các queue.json")
+    p_seed.add_argument("--seen", nargs="*", default=[], help="các seen_ids.json")
+    p_seed.add_argument("--shared-fs", action="store_true")
+
+    p_run = sub.add_parser("run")
+    p_run.add_argument("--db", required=True)
+    p_run.add_argument("--workers", type=int, default=2, help="số worker trên máy này")
+    p_run.add_argument("--id-offset", type=int, default=0, help="id worker đầu tiên (khác nhau giữa các máy)")
+    p_run.add_argument("--total-workers", type=int, default=None, help="tổng worker mọi máy (chia trang search)")
+    p_run.add_argument("--headless", action="store_true")
+    p_run.add_argument("--shared-fs", action="store_true", help="db nằm trên ổ mạng dùng chung")
+    p_run.add_argument("--restarts", type=int, default=3)
+    p_run.add_argument("--status-every", type=float, default=30)
+    p_run.add_argument("--log-dir", default="out_luocdo/workers/logs")
+
+    p_status = sub.add_parser("status")
+    p_status.add_argument("--db", required=True)
+    p_status.add_argument("--shared-fs", action="store_true")
+
+    args = parser.parse_args()
+    if args.cmd == "seed":
+        seed(args.db, args.sources, args.seen, args.shared_fs)
+    elif args.cmd == "run":
+        run(args)
+    else:
+        print(json.dumps(SQLiteFrontier(args.db, "status", shared_fs=args.shared_fs).stats(), ensure_ascii=False, indent=2))
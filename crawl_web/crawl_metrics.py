@@ -0,0 +1,144 @@
+# crawl_metrics.py
+# Đo thời gian từng giai đoạn của vòng crawl (goto, sleep, scrape, expand, download, checkpoint).
+#
+# - mỗi lần đo ghi 1 dòng JSONL:  <out>/events.jsonl
+#   {"ts": ..., "stage": "page.goto", "sec": 0.812, "ok": true, "url": "..."}
+# - file text kiểu Prometheus (ghi đè định kỳ + lúc kết thúc): <out>/crawl.prom
+# - lúc kết thúc in bảng p50/p90/p99 + % thời gian mỗi stage, ghi <out>/summary.json
+#
+# Dùng:
+#   METRICS = CrawlMetrics()
+#   METRICS.open(OUTPUT_DIR / "metrics")
+#   with METRICS.stage("page.goto", url=url):
+#       await page.goto(url)
+#   METRICS.incr("docs_saved")
+#   METRICS.close()
+
+import json, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROM_PREFIX = "tvpl_crawl"
+QUANTILES = (0.5, 0.9, 0.99)
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+class CrawlMetrics:
+    def __init__(self, prom_every: int = 20):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.out_dir: Optional[Path] = None
+        self.prom_every = prom_every
+        self._events = None
+        self._n_events = 0
+        self._t_start = time.perf_counter()
+
+    # ---------- vòng đời ----------
+    def open(self, out_dir: Path):
+        """Bật ghi file; chưa open thì chỉ giữ số liệu trong bộ nhớ."""
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._events = open(self.out_dir / "events.jsonl", "a", encoding="utf-8", buffering=1)
+        self._t_start = time.perf_counter()
+
+    def close(self):
+        if self.out_dir is None:
+            return
+        self.write_prometheus()
+        summary = self.summary()
+        (self.out_dir / "summary.json").write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        self.print_summary(summary)
+        if self._events:
+            self._events.close()
+            self._events = None
+
+    # ---------- ghi nhận ----------
+    @contextmanager
+    def stage(self, name: str, **labels):
+        t0 = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - t0, ok, **labels)
+
+    def observe(self, name: str, sec: float, ok: bool = True, **labels):
+        self.samples.setdefault(name, []).append(sec)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        self._emit({"stage": name, "sec": round(sec, 4), "ok": ok, **labels})
+
+    def incr(self, name: str, n: int = 1, **labels):
+        self.counters[name] = self.counters.get(name, 0) + n
+        self._emit({"counter": name, "n": n, **labels})
+
+    def _emit(self, event: dict):
+        if self._events is None:
+            return
+        event["ts"] = round(time.time(), 3)
+        self._events.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._n_events += 1
+        if self._n_events % self.prom_every == 0:
+            self.write_prometheus()
+
+    # ---------- xuất ----------
+    def write_prometheus(self):
+        if self.out_dir is None:
+            return
+        lines = [
+            f"# HELP {PROM_PREFIX}_stage_seconds Thời gian mỗi stage của vòng crawl",
+            f"# TYPE {PROM_PREFIX}_stage_seconds summary",
+        ]
+        for name, vals in sorted(self.samples.items()):
+            s = sorted(vals)
+            for q in QUANTILES:
+                lines.append(f'{PROM_PREFIX}_stage_seconds{{stage="{name}",quantile="{q}"}} {percentile(s, q):.6f}')
+            lines.append(f'{PROM_PREFIX}_stage_seconds_sum{{stage="{name}"}} {sum(s):.6f}')
+            lines.append(f'{PROM_PREFIX}_stage_seconds_count{{stage="{name}"}} {len(s)}')
+        lines.append(f"# TYPE {PROM_PREFIX}_stage_errors_total counter")
+        for name in sorted(self.samples):
+            lines.append(f'{PROM_PREFIX}_stage_errors_total{{stage="{name}"}} {self.errors.get(name, 0)}')
+        lines.append(f"# TYPE {PROM_PREFIX}_events_total counter")
+        for name, n in sorted(self.counters.items()):
+            lines.append(f'{PROM_PREFIX}_events_total{{name="{name}"}} {n}')
+        lines.append(f"# TYPE {PROM_PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PROM_PREFIX}_uptime_seconds {time.perf_counter() - self._t_start:.3f}")
+        # ghi file tạm rồi replace để scraper không đọc phải file dở
+        tmp = self.out_dir / "crawl.prom.tmp"
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        tmp.replace(self.out_dir / "crawl.prom")
+
+    def summary(self) -> dict:
+        wall = time.perf_counter() - self._t_start
+        stages = {}
+        for name, vals in self.samples.items():
+            s = sorted(vals)
+            total = sum(s)
+            stages[name] = {
+                "count": len(s),
+                "errors": self.errors.get(name, 0),
+                "total_sec": round(total, 3),
+                "share": round(total / wall, 4) if wall else 0.0,
+                **{f"p{int(q * 100)}": round(percentile(s, q), 4) for q in QUANTILES},
+                "max": round(s[-1], 4) if s else 0.0,
+            }
+        return {"wall_sec": round(wall, 3), "stages": stages, "counters": dict(self.counters)}
+
+    def print_summary(self, summary: Optional[dict] = None):
+        summary = summary or self.summary()
+        print(f"\n[METRICS] wall {summary['wall_sec']:.1f}s (stage lồng nhau, vd expand_all_in nằm trong scrape_full_tab4)")
+        print(f"{'stage':<24}{'n':>7}{'total s':>10}{'%wall':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'err':>6}")
+        for name, st in sorted(summary["stages"].items(), key=lambda kv: -kv[1]["total_sec"]):
+            print(f"{name:<24}{st['count']:>7}{st['total_sec']:>10.2f}{st['share'] * 100:>7.1f}%"
+                  f"{st['p50']:>9.3f}{st['p90']:>9.3f}{st['p99']:>9.3f}{st['errors']:>6}")
+        if summary["counters"]:
+            print("[METRICS] " + ", ".join(f"{k}={v}" for k, v in sorted(summary["counters"].items())))
@@ -0,0 +1,1225 @@
+# crawler_core.py
+# Engine crawl thuvienphapluat.vn dùng chung cho loop.py, loop_ver2.py, loop_ver3.py.
+#
+# Mỗi script chỉ là cấu hình: gọi configure(...) rồi chạy crawl() / refresh().
+#   - seed:    SingleSeed(url)                    (loop.py, loop_ver2.py)
+#              SearchRangeSeeds(url, start, end)  (loop_ver3.py, dùng build_search_page_url)
+#                 -> trang search tải song song bằng HTTP + cookie của phiên (SEARCH_FETCH / SEARCH_CONCURRENCY)
+#   - phiên:   SESSION = "persistent"     -> profile Chromium (PERSIST_DIR)
+#              SESSION = "storage_state"  -> trình duyệt mới + AUTH_STATE_PATH (lưu sau lần login đầu)
+#              SESSION = "pool"           -> mọi state trong SESSION_DIR chạy song song, gặp CAPTCHA thì
+#                                            cách ly phiên đó và xếp lại URL, không chờ Enter (session_pool.py)
+#   - điều tốc: THROTTLE = tên profile trong THROTTLE_PROFILES (xem rate_limiter.py)
+#   - thứ tự:  FRONTIER_ORDER = "priority" -> điểm theo quan hệ / từ khóa / độ sâu, cắt ở MAX_DEPTH (loop_ver3.py)
+#              FRONTIER_ORDER = "fifo"     -> BFS vào trước ra trước, MAX_DEPTH = None (loop.py, loop_ver2.py như cũ)
+#   - lưu:     RECORD_STORE = "files"     -> docs/<doc_id>.json (indent=2)
+#              RECORD_STORE = "segments"  -> store/ nén, append-only (segment_store.py)
+# Sửa hiệu năng ở đây là mọi chế độ cùng được hưởng.
+
+import asyncio, json, os, re, hashlib, time
+from collections import OrderedDict
+from html import unescape
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlencode, urlparse, parse_qs
+from playwright.async_api import async_playwright, Page, TimeoutError as PWTimeoutError
+from crawl_metrics import CrawlMetrics
+from rate_limiter import AdaptiveRateLimiter, THROTTLE_STATUS
+from frontier import PriorityFrontier, relation_of, score_link
+from shared_frontier import SQLiteFrontier
+from segment_store import SegmentStore
+from session_pool import SessionChallenged, SessionPool
+
+# ========== CẤU HÌNH MẶC ĐỊNH (script ghi đè qua configure) ==========
+SEEDS = None                        # SingleSeed / SearchRangeSeeds, đặt trong script
+OUTPUT_DIR = Path("out_luocdo")
+HEADLESS   = False
+SCRAPE_SUMMARY = True               # lấy .Tomtatvanban vào meta["Tóm tắt văn bản"]
+RECORD_STORE = "files"              # "files" | "segments" (OUTPUT_DIR/store, xuất lại docs/ bằng segment_store.py export)
+
+SESSION = "persistent"              # "persistent" | "storage_state" | "pool"
+PERSIST_DIR = "pw_profile"
+AUTH_STATE_PATH = None              # mặc định OUTPUT_DIR / "auth_state.json"
+SESSION_DIR = None                  # pool: mặc định OUTPUT_DIR / "sessions" (dùng chung giữa các worker)
+SESSION_QUARANTINE_SEC = 600        # pool: cách ly phiên bị challenge (gấp đôi mỗi lần liên tiếp)
+SESSION_MAX_STRIKES = 3             # pool: challenge liên tiếp quá số này thì loại phiên
+
+# điều tốc (AIMD, xem rate_limiter.py)
+THROTTLE_PROFILES = {
+    # không nghỉ giữa các request (hành vi cũ của loop.py / loop_ver2.py)
+    "none":     dict(start_rate=1e6, min_rate=1e6, max_rate=1e6),
+    # ~2.5s / request lúc đầu, tăng dần tới trần 1 req/s khi site khỏe
+    "adaptive": dict(start_rate=0.4, min_rate=0.05, max_rate=1.0, slow_sec=4.0),
+    # chạy nền lâu dài / giờ cao điểm
+    "polite":   dict(start_rate=0.2, min_rate=0.02, max_rate=0.3, slow_sec=3.0),
+}
+THROTTLE = "adaptive"
+MAX_RETRIES = 3                 # số lần xếp lại 1 URL bị 429/503 (trang search: số lần thử lại)
+
+# giai đoạn seed trang search (SearchRangeSeeds)
+SEARCH_FETCH = "http"               # "http" -> HTTP thuần bằng cookie của phiên, không render | "browser" -> goto từng trang
+SEARCH_CONCURRENCY = 4              # số trang search tải đồng thời (vẫn đi qua bộ điều tốc chung)
+# trang search hết kết quả phải hiện 1 trong các câu này (so không phân biệt hoa thường);
+# trang 200 không có link mà cũng không có câu nào -> coi là lỗi, thử lại, không dừng quét
+SEARCH_EMPTY_MARKERS = ["không tìm thấy văn bản", "không tìm thấy kết quả", "không có kết quả"]
+
+# frontier ưu tiên (frontier.py): văn bản giá trị cao được cào trước
+FRONTIER_ORDER = "priority"         # "priority" | "fifo" (mọi link cùng điểm -> BFS theo thứ tự thêm)
+FRONTIER_KEYWORDS = []              # tên link chứa từ khóa -> cộng điểm
+FRONTIER_EXCLUDE  = []              # tên link chứa từ này -> bỏ hẳn
+PRIORITY_FIELDS   = []              # "Lĩnh vực, ngành" của văn bản cha -> cộng điểm
+MAX_DEPTH = 4                       # sâu hơn (tính từ seed) thì không thêm vào hàng đợi; None = không giới hạn
+
+# chế độ refresh: thăm lại văn bản đã cào, chỉ cào lại khi meta / số quan hệ thay đổi
+REFRESH_BATCH = 100                 # số văn bản kiểm tra mỗi lần chạy
+REFRESH_MIN_AGE_DAYS = 7            # mới kiểm tra gần hơn thì bỏ qua
+FINGERPRINT_FIELDS = ["Số hiệu", "Loại văn bản", "Ngày ban hành", "Ngày hiệu lực",
+                      "Ngày đăng", "Số công báo", "Tình trạng"]
+# trọng số lịch refresh theo Tình trạng: văn bản sắp có hiệu lực hay đổi, hết hiệu lực thì ít
+STATUS_REFRESH_WEIGHT = {"chưa có hiệu lực": 3.0, "còn hiệu lực": 1.0, "hết hiệu lực": 0.2}
+DEFAULT_REFRESH_WEIGHT = 1.5        # "Đã biết", "Dữ liệu đang cập nhật", trống...
+
+VIEWPORT   = {"width": 1366, "height": 880}
+DOMAIN_OK  = "thuvienphapluat.vn"
+BASE_URL   = "https://thuvienphapluat.vn"
+# frontier chung của cả nhóm, tạo bằng merge_members.py (không có thì bỏ qua)
+GLOBAL_CP_DIR = None                # mặc định OUTPUT_DIR / "global" / "checkpoints"
+USE_GLOBAL_SEEN = True              # False: không đọc seen / queue chung, cào như 1 thành viên độc lập
+MEMBER = os.environ.get("CRAWL_MEMBER")  # tên thư mục của mình trong raw/ (merge_members chia queue theo tên này)
+
+# chạy làm worker của coordinator.py (không set biến môi trường thì chạy 1 tiến trình như cũ):
+# mỗi worker có profile + thư mục output riêng, hàng đợi chung trong SQLite
+WORKER_ID   = os.environ.get("CRAWL_WORKER_ID")
+FRONTIER_DB = os.environ.get("CRAWL_FRONTIER_DB")
+NUM_WORKERS = int(os.environ.get("CRAWL_NUM_WORKERS", "1"))
+SHARED_FS   = os.environ.get("CRAWL_SHARED_FS") == "1"
+SKIP_MANUAL_LOGIN = os.environ.get("CRAWL_NO_LOGIN") == "1"
+LEASE_POLL_SEC = 10                 # hết URL trống nhưng worker khác còn giữ lease -> chờ rồi hỏi lại
+CHALLENGE_BACKOFF_SEC = 60          # worker không có người (stdin=DEVNULL) gặp challenge -> trả URL, nghỉ rồi làm tiếp
+
+# timer + counter từng stage -> OUTPUT_DIR/metrics (events.jsonl, crawl.prom, summary.json)
+METRICS = CrawlMetrics()
+LIMITER = AdaptiveRateLimiter(**THROTTLE_PROFILES[THROTTLE])
+STORE: Optional[SegmentStore] = None    # mở trong _run khi RECORD_STORE = "segments"
+FAILED: Dict[str, dict] = {}            # url bỏ cuộc -> checkpoints/failed.json (load_checkpoint / save_checkpoint)
+CHALLENGE_REQUEUES: Dict[str, int] = {}  # url -> số lần bị challenge rồi xếp lại (quá MAX_RETRIES -> record_failed)
+
+# giá trị script đặt (trước khi cộng hậu tố worker) -> configure gọi nhiều lần vẫn đúng
+_BASE = {"OUTPUT_DIR": OUTPUT_DIR, "PERSIST_DIR": PERSIST_DIR, "GLOBAL_CP_DIR": None, "AUTH_STATE_PATH": None,
+         "SESSION_DIR": None}
+
+def configure(**options):
+    """Ghi đè cấu hình mặc định (tên giống biến toàn cục ở trên), rồi tính các giá trị suy ra."""
+    g = globals()
+    for name, value in options.items():
+        if name not in g or not name.isupper():
+            raise KeyError(f"không có tùy chọn cấu hình {name}")
+        if name in _BASE:
+            _BASE[name] = value
+        else:
+            g[name] = value
+    global OUTPUT_DIR, PERSIST_DIR, HEADLESS, GLOBAL_CP_DIR, AUTH_STATE_PATH, SESSION_DIR
+    OUTPUT_DIR, PERSIST_DIR = Path(_BASE["OUTPUT_DIR"]), _BASE["PERSIST_DIR"]
+    GLOBAL_CP_DIR = _BASE["GLOBAL_CP_DIR"] or OUTPUT_DIR / "global" / "checkpoints"
+    AUTH_STATE_PATH = _BASE["AUTH_STATE_PATH"] or OUTPUT_DIR / "auth_state.json"
+    SESSION_DIR = Path(_BASE["SESSION_DIR"] or OUTPUT_DIR / "sessions")
+    if WORKER_ID is not None:
+        OUTPUT_DIR = OUTPUT_DIR / "workers" / f"w{WORKER_ID}"
+        PERSIST_DIR = f"{PERSIST_DIR}_w{WORKER_ID}"
+        HEADLESS = HEADLESS or os.environ.get("CRAWL_HEADLESS") == "1"
+
+def make_limiter() -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(**THROTTLE_PROFILES[THROTTLE])
+
+# ========== TRƯỜNG META ==========
+FIELDS_ORDER = [
+    "Tiêu đề","Số hiệu","Loại văn bản","Lĩnh vực, ngành","Nơi ban hành",
+    "Người ký","Ngày ban hành","Ngày hiệu lực","Ngày đăng","Số công báo",
+    "Tình trạng","Tóm tắt văn bản",
+]
+
+DIAGRAM_TAB       = 'a[href="#tab4"]'
+VIEWING_DOCUMENT  = '#viewingDocument.ct'
+SECTION_HEADER    = '.ghd, .ghda'
+SECTION_BOX       = '.ct'
+LOAD_MORE         = '.dgcvm'
+LINKS_IN_SECTION  = '.dgc a[href]'
+CONTENT_CONN_WRAP = '#contentConnection .dgcParent .dgc a[href]'
+HEADER_COUNT_RE   = re.compile(r"\[\s*(\d+)\s*\]")
+EXPAND_WAIT_MS    = 5000        # chờ tối đa sau mỗi click "xem thêm" (thường xong sớm hơn nhiều)
+
+# chờ tới khi số link trong section tăng (MutationObserver), hết hạn thì trả số hiện tại
+WAIT_LINKS_GROW_JS = """
+([id, sel, n, timeout]) => new Promise(resolve => {
+  const box = document.getElementById(id);
+  const count = () => box ? box.querySelectorAll(sel).length : 0;
+  if (!box || count() > n) return resolve(count());
+  const obs = new MutationObserver(() => {
+    if (count() > n) { obs.disconnect(); resolve(count()); }
+  });
+  obs.observe(box, {childList: true, subtree: true});
+  setTimeout(() => { obs.disconnect(); resolve(count()); }, timeout);
+})
+"""
+
+# ========== HỖ TRỢ FILE ==========
+def ensure_dirs():
+    (OUTPUT_DIR / "docs").mkdir(parents=True, exist_ok=True)
+    (OUTPUT_DIR / "checkpoints").mkdir(parents=True, exist_ok=True)
+    (OUTPUT_DIR / "downloads").mkdir(parents=True, exist_ok=True)
+    if SESSION == "persistent":
+        Path(PERSIST_DIR).mkdir(parents=True, exist_ok=True)
+
+def save_json(path: Path, data: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+def safe_name(s: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", s).strip("_") or "unknown"
+
+# ========== URL HELPERS ==========
+def url_in_domain(url: str) -> bool:
+    return DOMAIN_OK in url.lower()
+
+def tail_numeric_id(url: str) -> Optional[str]:
+    m = re.search(r"-(\d+)\.aspx$", url)
+    return m.group(1) if m else None
+
+def make_fallback_id(url: str) -> str:
+    h = hashlib.sha1(url.encode("utf-8")).hexdigest()[:12]
+    return f"u_{h}"
+
+def normalize_tvpl_url(u: str) -> str:
+    p = urlparse(u)
+    qs = parse_qs(p.query)
+    qs.pop("tab", None)
+    new_query = "&".join(f"{k}={v[0]}" for k, v in qs.items())
+    return p._replace(query=new_query).geturl()
+
+# ========== SLEEP / THROTTLE ==========
+async def throttle():
+    with METRICS.stage("sleep.throttle"):
+        await LIMITER.wait()
+
+async def throttled_goto(page: Page, url: str, kind: str) -> int:
+    """goto qua bộ điều tốc, báo status + độ trễ lại cho LIMITER. Trả HTTP status (0 nếu không có response)."""
+    await throttle()
+    t0 = time.perf_counter()
+    try:
+        with METRICS.stage("page.goto", kind=kind, url=url):
+            resp = await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+    except Exception:
+        LIMITER.on_response(0, time.perf_counter() - t0)
+        raise
+    status = resp.status if resp else 0
+    LIMITER.on_response(status, time.perf_counter() - t0, resp.headers.get("retry-after") if resp else None)
+    return status
+
+async def http_get(page: Page, url: str, kind: str) -> Tuple[int, str, dict]:
+    """GET bằng APIRequestContext của phiên (cùng cookie, không render) qua bộ điều tốc. Trả (status, html, headers)."""
+    await throttle()
+    t0 = time.perf_counter()
+    try:
+        with METRICS.stage("http.get", kind=kind, url=url):
+            resp = await page.context.request.get(url, timeout=60000)
+            body = await resp.text()
+    except Exception:
+        LIMITER.on_response(0, time.perf_counter() - t0)
+        raise
+    LIMITER.on_response(resp.status, time.perf_counter() - t0, resp.headers.get("retry-after"))
+    return resp.status, body, resp.headers
+
+# ========== DETECT & PAUSE KHI CLOUDLFARE ==========
+# chỉ nhận markup của trang challenge, không dò từ khóa trong nội dung: "xác minh", "captcha",
+# "cloudflare" là chữ bình thường trong tóm tắt văn bản (vd 194/2025/NĐ-CP) -> báo nhầm, cách ly phiên
+CHALLENGE_MARKUP = ["/cdn-cgi/challenge-platform", "window._cf_chl_opt", 'id="challenge-form"', "id='challenge-form'",
+                    "<title>just a moment...</title>", "<title>attention required! | cloudflare</title>"]
+CHALLENGE_URL_MARKERS = ["/cdn-cgi/challenge-platform", "__cf_chl_"]
+
+def looks_like_challenge(html: str, url: str, status: int = 0, headers: Optional[dict] = None) -> bool:
+    """Trang challenge thật: 403/503 kèm header cf-mitigated, URL challenge của Cloudflare, hoặc markup form challenge."""
+    if status in (403, 503) and "cf-mitigated" in {k.lower() for k in (headers or {})}:
+        return True
+    html, url = (html or "").lower(), (url or "").lower()
+    return any(k in url for k in CHALLENGE_URL_MARKERS) or any(k in html for k in CHALLENGE_MARKUP)
+
+def unattended() -> bool:
+    """Worker của coordinator.py (CRAWL_NO_LOGIN=1 + CRAWL_WORKER_ID, stdin=DEVNULL): không có ai để nhấn Enter."""
+    return SKIP_MANUAL_LOGIN and WORKER_ID is not None
+
+async def wait_if_human_check(page: Page) -> bool:
+    """True nếu trang đang là challenge và người dùng đã xử lý xong.
+    pool / worker không người: raise SessionChallenged (URL được trả lại hàng đợi), không chờ input()."""
+    try:
+        html = await page.content()
+    except Exception:
+        html = ""
+    if looks_like_challenge(html, page.url):
+        METRICS.incr("challenges", url=page.url)
+        LIMITER.on_challenge()
+        if SESSION == "pool" or unattended():
+            raise SessionChallenged(page.url)       # phiên khác / lần sau làm tiếp, không chờ người
+        print("\n[HUMAN] Phát hiện Cloudflare / CAPTCHA. Vui lòng xử lý bằng tay trên cửa sổ trình duyệt.")
+        print("→ Khi bạn đã hoàn tất (trang tải đúng nội dung), quay lại terminal và nhấn Enter để tiếp tục.")
+        loop = asyncio.get_running_loop()
+        with METRICS.stage("human_check"):
+            await loop.run_in_executor(None, input, ">> Nhấn Enter khi đã xử lý xong: ")
+        return True
+    return False
+
+# ========== SCRAPE SEARCH PAGE ==========
+async def collect_detail_links_from_search(page: Page) -> List[str]:
+    links = page.locator('a[href*="/van-ban/"]')
+    out: List[str] = []
+    seen = set()
+    cnt = await links.count()
+    for i in range(cnt):
+        href = await links.nth(i).get_attribute("href")
+        if not href: continue
+        if "/van-ban/" not in href: continue
+        abs_url = urljoin(BASE_URL, href.strip())
+        abs_url = normalize_tvpl_url(abs_url)
+        if abs_url not in seen: 
+            seen.add(abs_url)
+            out.append(abs_url)
+    return out
+
+SEARCH_LINK_RE = re.compile(r"""<a\b[^>]*?\bhref\s*=\s*["']([^"']*/van-ban/[^"']*)["']""", re.IGNORECASE)
+
+def detail_links_from_html(html: str) -> List[str]:
+    """Như collect_detail_links_from_search nhưng trên HTML thô (trang search tải bằng http_get)."""
+    out: List[str] = []
+    seen = set()
+    for m in SEARCH_LINK_RE.finditer(html or ""):
+        abs_url = normalize_tvpl_url(urljoin(BASE_URL, unescape(m.group(1)).strip()))
+        if abs_url not in seen:
+            seen.add(abs_url)
+            out.append(abs_url)
+    return out
+
+def build_search_page_url(base_url: str, page_num: int) -> str:
+    parsed = urlparse(base_url)
+    qs = parse_qs(parsed.query)
+    qs["page"] = [str(page_num)]
+    new_query = urlencode({k: v[0] for k, v in qs.items()})
+    return parsed._replace(query=new_query).geturl()
+
+# ========== LƯỢC ĐỒ / TAB4 ==========
+async def ensure_tab4(page: Page):
+    try:
+        if await page.locator(DIAGRAM_TAB).count() > 0:
+            await page.click(DIAGRAM_TAB)
+    except Exception:
+        pass
+
+def header_count(title: str) -> Optional[int]:
+    """'Văn bản thay thế [ 3 ]' -> 3; không có [ N ] -> None."""
+    m = HEADER_COUNT_RE.search(title or "")
+    return int(m.group(1)) if m else None
+
+async def expand_all_in(page: Page, section_id: str, expected: Optional[int] = None, max_clicks: int = 20):
+    with METRICS.stage("expand_all_in"):
+        await _expand_all_in(page, section_id, expected, max_clicks)
+
+async def _expand_all_in(page: Page, section_id: str, expected: Optional[int], max_clicks: int):
+    container = page.locator(f"#{section_id}")
+    links = container.locator(LINKS_IN_SECTION)
+    have = await links.count()
+    for _ in range(max_clicks):
+        # đủ số link như header báo -> không cần bấm thêm
+        if expected is not None and have >= expected:
+            break
+        btns = container.locator(LOAD_MORE)
+        cnt = await btns.count()
+        if cnt == 0:
+            break
+        clicked = False
+        for i in range(cnt):
+            b = btns.nth(i)
+            if await b.is_visible():
+                try:
+                    await b.click()
+                    clicked = True
+                    break
+                except Exception:
+                    continue
+        if not clicked:
+            break
+        grown = await page.evaluate(WAIT_LINKS_GROW_JS, [section_id, LINKS_IN_SECTION, have, EXPAND_WAIT_MS])
+        if grown <= have:
+            break
+        have = grown
+
+async def collect_links_in_section(page: Page, section_id: str, expected: Optional[int] = None) -> List[Dict[str, str]]:
+    try:
+        await page.wait_for_selector(f'#{section_id}{SECTION_BOX}', state="visible", timeout=6000)
+    except PWTimeoutError:
+        return []
+    await expand_all_in(page, section_id, expected)
+    links = page.locator(f'#{section_id} {LINKS_IN_SECTION}')
+    items: List[Dict[str, str]] = []
+    for i in range(await links.count()):
+        a = links.nth(i)
+        try:
+            name = " ".join((await a.inner_text()).split())
+            url  = (await a.get_attribute("href")) or ""
+            if name and url:
+                items.append({"name": name, "url": url})
+        except Exception:
+            continue
+    return items
+
+async def collect_content_connection(page: Page) -> List[Dict[str, str]]:
+    items: List[Dict[str, str]] = []
+    if await page.locator("#contentConnection").count() == 0:
+        return items
+    links = page.locator(CONTENT_CONN_WRAP)
+    for i in range(await links.count()):
+        a = links.nth(i)
+        try:
+            name = " ".join((await a.inner_text()).split())
+            url  = (await a.get_attribute("href")) or ""
+            if name and url:
+                items.append({"name": name, "url": url})
+        except Exception:
+            continue
+    return items
+
+async def collect_column_sections(page: Page, container_selector: str) -> Dict[str, List[Dict[str, str]]]:
+    result: Dict[str, List[Dict[str, str]]] = {}
+    container = page.locator(container_selector)
+    if await container.count() == 0:
+        return result
+    headers = container.locator(SECTION_HEADER)
+    for i in range(await headers.count()):
+        h = headers.nth(i)
+        title = (await h.inner_text()).strip()
+        onclick = await h.get_attribute("onclick")
+        if not onclick:
+            continue
+        m = re.search(r"toggle\('([^']+)'\)", onclick)
+        if not m:
+            continue
+        section_id = m.group(1)
+        clean_title = re.sub(r"\s*\[\s*\d+\s*\]\s*", "", title).strip()
+        key = f"{section_id} | {clean_title}"
+        expected = header_count(title)
+        if expected == 0:
+            # header "[ 0 ]": không mở, giữ key rỗng như trước
+            METRICS.incr("sections_skipped")
+            result[key] = []
+            continue
+        try:
+            # không chờ cố định: collect_links_in_section đợi box hiện ra
+            await h.click()
+        except Exception:
+            pass
+        result[key] = await collect_links_in_section(page, section_id, expected)
+    return result
+
+async def scrape_viewing_document(page: Page) -> OrderedDict:
+    await page.wait_for_selector(VIEWING_DOCUMENT, state="visible", timeout=8000)
+    box = page.locator(VIEWING_DOCUMENT)
+    data = OrderedDict((k, "") for k in FIELDS_ORDER if SCRAPE_SUMMARY or k != "Tóm tắt văn bản")
+    titles = box.locator(".tt")
+    for i in range(await titles.count()):
+        t = (await titles.nth(i).inner_text()).strip()
+        if t:
+            data["Tiêu đề"] = " ".join(t.split())
+            break
+    rows = box.locator(".att")
+    for i in range(await rows.count()):
+        row = rows.nth(i)
+        key = (await row.locator(".hd.fl").inner_text()).strip() if await row.locator(".hd.fl").count() else ""
+        val = (await row.locator(".ds.fl").inner_text()).strip() if await row.locator(".ds.fl").count() else ""
+        if not key:
+            continue
+        key = key[:-1].strip() if key.endswith(":") else key
+        key = " ".join(key.split())
+        val = " ".join(val.split())
+        if key in data:
+            data[key] = val
+    return data
+
+async def scrape_summary_text(page: Page) -> str:
+    sel = ".Tomtatvanban"
+    if await page.locator(sel).count() == 0:
+        return ""
+    div = page.locator(sel).first
+    txt = await div.inner_text()
+    return " ".join(txt.split())
+
+async def scrape_full_tab4(page: Page) -> Tuple[OrderedDict, Dict[str, List[Dict[str, str]]], List[Dict[str, str]], dict]:
+    with METRICS.stage("scrape_full_tab4"):
+        await ensure_tab4(page)
+        meta_view = await scrape_viewing_document(page)
+        # đọc trạng thái nhẹ đúng như refresh sẽ đọc (header [ N ], meta innerText), trước khi click mở rộng
+        light = await read_light_state(page)
+        left_sections  = await collect_column_sections(page, ".left.fl")
+        right_sections = await collect_column_sections(page, ".rr.fl")
+        sections = {**left_sections, **right_sections}
+        content_conn = await collect_content_connection(page)
+    return meta_view, sections, content_conn, light
+
+# ========== DOWNLOAD ==========
+async def open_download_tab(page: Page) -> bool:
+    tabs = page.locator('a:has-text("Tải về")')
+    if await tabs.count() > 0:
+        try:
+            await tabs.nth(0).click()
+            await page.wait_for_timeout(500)
+            return True
+        except Exception:
+            pass
+    for maybe in ["#tab7", "#tab5", "#tab6"]:
+        loc = page.locator(f'a[href="{maybe}"]')
+        if await loc.count() > 0:
+            try:
+                await loc.nth(0).click()
+                await page.wait_for_timeout(500)
+                return True
+            except Exception:
+                pass
+    return False
+
+async def download_vietnamese_doc(page: Page, doc_id: str):
+    with METRICS.stage("download"):
+        ok = await _download_vietnamese_doc(page, doc_id)
+    METRICS.incr("downloads_ok" if ok else "downloads_fail")
+    return ok
+
+async def _download_vietnamese_doc(page: Page, doc_id: str):
+    if not await open_download_tab(page):
+        return False
+    sel = '#ctl00_Content_ThongTinVB_vietnameseHyperLink'
+    if await page.locator(sel).count() == 0:
+        link_loc = page.locator('a:has-text("Tải Văn bản tiếng Việt"), a:has-text("Văn bản tiếng Việt")')
+        if await link_loc.count() == 0:
+            return False
+        link = link_loc.nth(0)
+    else:
+        link = page.locator(sel)
+    href = await link.get_attribute("href")
+    if not href:
+        return False
+    abs_url = urljoin(BASE_URL, href)
+    try:
+        await throttle()
+        t0 = time.perf_counter()
+        resp = await page.context.request.get(abs_url)
+        LIMITER.on_response(resp.status, time.perf_counter() - t0, resp.headers.get("retry-after"))
+        if resp.status != 200:
+            print(f"[DL] {doc_id} tải thất bại, HTTP {resp.status}")
+            return False
+        content = await resp.body()
+        METRICS.incr("download_bytes", len(content))
+        ctype = resp.headers.get("content-type", "").lower()
+        if ".docx" in abs_url or "openxml" in ctype:
+            ext = "docx"
+        elif ".doc" in abs_url or "msword" in ctype:
+            ext = "doc"
+        else:
+            ext = "doc"
+        out_path = OUTPUT_DIR / "downloads" / f"{doc_id}.{ext}"
+        out_path.write_bytes(content)
+        print(f"[DL] saved download for {doc_id} -> {out_path.name}")
+        return True
+    except Exception as e:
+        print(f"[DL] fail {doc_id}: {e}")
+        return False
+
+# ========== JSON SAVE ==========
+def doc_id_from_meta(meta: Dict[str, str], url: str) -> str:
+    so_hieu = (meta.get("Số hiệu") or "").strip()
+    if so_hieu:
+        return safe_name(so_hieu)
+    tid = tail_numeric_id(url)
+    if tid:
+        return f"id_{tid}"
+    return make_fallback_id(url)
+
+def build_doc_json(meta: OrderedDict, sections: Dict[str, List[Dict[str, str]]], content_conn: List[Dict[str, str]], url: str,
+                   light: Optional[dict] = None) -> dict:
+    record = {"source_url": url, "meta": meta, "relations_sections": sections, "content_connection": content_conn}
+    if light:
+        record["light_state"] = light
+    return record
+
+def save_document_record(out_dir: Path, doc_json: dict, doc_id: str):
+    if STORE is not None:
+        STORE.put(doc_id, doc_json)
+        return STORE.root / doc_id
+    path = out_dir / "docs" / f"{doc_id}.json"
+    save_json(path, doc_json)
+    return path
+
+def saved_doc_ids() -> List[Tuple[str, float]]:
+    """(doc_id, thời điểm ghi) của mọi văn bản đã lưu."""
+    if STORE is not None:
+        return [(doc_id, STORE.saved_at(doc_id)) for doc_id in STORE.ids()]
+    return [(p.stem, p.stat().st_mtime) for p in (OUTPUT_DIR / "docs").glob("*.json")]
+
+def load_document_record(doc_id: str) -> Optional[dict]:
+    if STORE is not None:
+        return STORE.get(doc_id)
+    return json.loads((OUTPUT_DIR / "docs" / f"{doc_id}.json").read_text(encoding="utf-8"))
+
+# ========== HARVEST ==========
+def harvest_new_urls(sections: Dict[str, List[Dict[str, str]]], content_conn: List[Dict[str, str]]) -> List[Tuple[str, str, str]]:
+    """(url, loại quan hệ, tên link); 1 URL xuất hiện ở nhiều section thì giữ lần đầu."""
+    items = []
+    for key, arr in sections.items():
+        for it in arr:
+            items.append((it, relation_of(key)))
+    for it in content_conn:
+        items.append((it, "content_connection"))
+    out = []
+    seen = set()
+    for it, relation in items:
+        u = (it.get("url") or "").strip()
+        if not u or not url_in_domain(u):
+            continue
+        u = normalize_tvpl_url(u)
+        if u not in seen:
+            seen.add(u)
+            out.append((u, relation, it.get("name") or ""))
+    return out
+
+def push_link(frontier: PriorityFrontier, url: str, relation: str, depth: int, name: str = "", parent_field: str = "") -> bool:
+    if MAX_DEPTH is not None and depth > MAX_DEPTH:
+        return False
+    if FRONTIER_ORDER == "fifo":
+        return frontier.push(url, 0.0, depth, relation)
+    score = score_link(relation, depth, name, parent_field, FRONTIER_KEYWORDS, FRONTIER_EXCLUDE, PRIORITY_FIELDS)
+    if score is None:
+        return False
+    return frontier.push(url, score, depth, relation)
+
+# ========== CHECKPOINT ==========
+def load_checkpoint():
+    ensure_dirs()
+    cp_seen  = OUTPUT_DIR / "checkpoints" / "seen_ids.json"
+    cp_queue = OUTPUT_DIR / "checkpoints" / "queue.json"
+    if cp_seen.exists():
+        seen_ids = set(json.loads(cp_seen.read_text(encoding="utf-8")))
+    else:
+        seen_ids = set()
+    if FRONTIER_DB:
+        queue = SQLiteFrontier(FRONTIER_DB, f"w{WORKER_ID or 0}", shared_fs=SHARED_FS)
+    elif cp_queue.exists():
+        queue = PriorityFrontier.from_list(json.loads(cp_queue.read_text(encoding="utf-8")))
+    else:
+        queue = PriorityFrontier()
+    cp_visited = OUTPUT_DIR / "checkpoints" / "visited.json"
+    if not queue.durable and cp_visited.exists():
+        queue.visited = set(json.loads(cp_visited.read_text(encoding="utf-8")))
+    cp_failed = OUTPUT_DIR / "checkpoints" / "failed.json"
+    FAILED.clear()
+    if cp_failed.exists():
+        FAILED.update((e["url"], e) for e in json.loads(cp_failed.read_text(encoding="utf-8")))
+    return seen_ids, queue
+
+def save_checkpoint(seen_ids: set, queue: PriorityFrontier):
+    cp_seen  = OUTPUT_DIR / "checkpoints" / "seen_ids.json"
+    cp_queue = OUTPUT_DIR / "checkpoints" / "queue.json"
+    with METRICS.stage("save_checkpoint"):
+        cp_seen.write_text(json.dumps(sorted(list(seen_ids)), ensure_ascii=False, indent=2), encoding="utf-8")
+        if not queue.durable:
+            cp_queue.write_text(json.dumps(queue.to_list(), ensure_ascii=False, indent=2), encoding="utf-8")
+            (OUTPUT_DIR / "checkpoints" / "visited.json").write_text(
+                json.dumps(sorted(queue.visited), ensure_ascii=False), encoding="utf-8")
+        cp_failed = OUTPUT_DIR / "checkpoints" / "failed.json"
+        if FAILED or cp_failed.exists():
+            cp_failed.write_text(json.dumps(list(FAILED.values()), ensure_ascii=False, indent=2), encoding="utf-8")
+
+def record_failed(entry: dict, reason: str):
+    """URL đã lấy khỏi frontier nhưng bỏ cuộc (hết lượt thử lại / goto lỗi) -> failed.json, lần chạy sau xếp lại."""
+    FAILED[entry["url"]] = {"url": entry["url"], "score": entry["score"], "depth": entry["depth"],
+                            "relation": entry["relation"], "reason": reason, "at": round(time.time())}
+    METRICS.incr("failed")
+
+def requeue_failed(queue) -> int:
+    n = sum(1 for e in FAILED.values() if queue.push(e["url"], e["score"], e["depth"], e["relation"], requeue=True))
+    if FAILED:
+        print(f"[FAILED] xếp lại {n}/{len(FAILED)} url lỗi từ lần chạy trước")
+    FAILED.clear()
+    return n
+
+def load_global_seen():
+    """seen-set chung (id + url) do merge_members.py gộp từ mọi thành viên."""
+    ids, urls = set(), set()
+    for name, target in (("seen_ids.json", ids), ("seen_urls.json", urls)):
+        p = GLOBAL_CP_DIR / name
+        if p.exists():
+            target.update(json.loads(p.read_text(encoding="utf-8")))
+    if ids or urls:
+        print(f"[GLOBAL] đã có {len(ids)} văn bản / {len(urls)} url từ các thành viên khác")
+    return ids, urls
+
+def load_global_queue(queue, seen_ids: set, global_urls: set) -> int:
+    """
+    Nạp phần queue chung được chia cho mình (merge_members.py: queue_parts/<MEMBER>.json) vào frontier;
+    URL chia cho thành viên khác bị bỏ khỏi frontier của mình. Mỗi lần gộp mới chỉ nạp 1 lần.
+    """
+    full = GLOBAL_CP_DIR / "queue.json"
+    if not full.exists():
+        return 0
+    p = GLOBAL_CP_DIR / "queue_parts" / f"{MEMBER}.json"
+    if not MEMBER or not p.exists():
+        # nạp cả queue chung thì mọi thành viên cào trùng nhau tới lần gộp sau
+        print(f"[GLOBAL] không nạp queue chung: đặt MEMBER / CRAWL_MEMBER = tên thư mục của mình trong raw/ "
+              f"(chưa có {p.name} trong {p.parent})")
+        return 0
+    marker = OUTPUT_DIR / "checkpoints" / "global_queue_loaded.json"
+    stamp = p.stat().st_mtime
+    if marker.exists() and json.loads(marker.read_text(encoding="utf-8")).get("mtime") == stamp:
+        return 0
+    mine = PriorityFrontier.from_list(json.loads(p.read_text(encoding="utf-8"))).to_list()
+    added = 0
+    for e in mine:
+        if e["url"] not in global_urls and queue.push(e["url"], e["score"], e["depth"], e["relation"]):
+            added += 1
+    dropped = 0
+    if not queue.durable:
+        mine_urls = {e["url"] for e in mine}
+        for e in json.loads(full.read_text(encoding="utf-8")):
+            if e["url"] not in mine_urls and queue.discard(e["url"]):
+                dropped += 1
+    save_checkpoint(seen_ids, queue)
+    save_json(marker, {"mtime": stamp, "added": added, "dropped": dropped})
+    print(f"[GLOBAL] nạp {added} url phần của {MEMBER}, bỏ {dropped} url đã chia cho thành viên khác")
+    return added
+
+# ========== REFRESH ==========
+# đọc meta + số [ N ] ở header các section bằng 1 lần evaluate, không click, không mở rộng
+LIGHT_STATE_JS = """
+() => {
+  const norm = s => (s || "").split(/\\s+/).filter(Boolean).join(" ");
+  const meta = {};
+  document.querySelectorAll("#viewingDocument .att").forEach(r => {
+    const k = r.querySelector(".hd.fl"), v = r.querySelector(".ds.fl");
+    if (!k) return;
+    let key = norm(k.innerText);
+    if (key.endsWith(":")) key = key.slice(0, -1).trim();
+    meta[key] = norm(v ? v.innerText : "");
+  });
+  const counts = {};
+  document.querySelectorAll(".left.fl .ghd, .left.fl .ghda, .rr.fl .ghd, .rr.fl .ghda").forEach(h => {
+    const m = /toggle\\('([^']+)'\\)/.exec(h.getAttribute("onclick") || "");
+    const c = /\\[\\s*(\\d+)\\s*\\]/.exec(h.innerText);
+    if (m && c) counts[m[1]] = parseInt(c[1], 10);
+  });
+  return {meta, counts};
+}
+"""
+
+def light_state(meta: Dict[str, str], counts: Dict[str, int]) -> dict:
+    return {"meta": {k: " ".join((meta.get(k) or "").split()) for k in FINGERPRINT_FIELDS},
+            "counts": dict(sorted(counts.items()))}
+
+async def read_light_state(page: Page) -> dict:
+    live = await page.evaluate(LIGHT_STATE_JS)
+    return light_state(live["meta"], live["counts"])
+
+def record_light_state(record: dict, live_counts: Dict[str, int]) -> dict:
+    """Trạng thái lúc cào. Record cũ chưa lưu light_state: số link đã gom không so được với header [ N ]
+    (header có thể lệch số link thật) -> chỉ so meta, lấy số đếm hiện tại làm mốc."""
+    if record.get("light_state"):
+        return record["light_state"]
+    return light_state(record.get("meta") or {}, live_counts)
+
+def fingerprint(state: dict) -> str:
+    return hashlib.sha1(json.dumps(state, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+def diff_light_state(old: dict, new: dict) -> List[str]:
+    changed = [f"meta:{k}" for k in FINGERPRINT_FIELDS if old["meta"].get(k, "") != new["meta"].get(k, "")]
+    # chỉ so các section trang hiện có header [ N ]
+    changed += [f"rel:{k}" for k, n in new["counts"].items() if old["counts"].get(k, 0) != n]
+    return changed
+
+def refresh_state_path() -> Path:
+    return OUTPUT_DIR / "checkpoints" / "refresh_state.json"
+
+def load_refresh_state() -> Dict[str, dict]:
+    p = refresh_state_path()
+    return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+
+def save_refresh_state(state: Dict[str, dict]):
+    save_json(refresh_state_path(), state)
+
+def refresh_weight(record: dict) -> float:
+    status = ((record.get("meta") or {}).get("Tình trạng") or "").lower()
+    for prefix, w in STATUS_REFRESH_WEIGHT.items():
+        if status.startswith(prefix):
+            return w
+    return DEFAULT_REFRESH_WEIGHT
+
+def pick_refresh_batch(state: Dict[str, dict], now: float) -> List[Tuple[str, dict]]:
+    """Ưu tiên = tuổi (ngày từ lần kiểm tra cuối, chưa kiểm tra thì tính từ lúc ghi file) x trọng số Tình trạng."""
+    cands = []
+    for doc_id, saved_at in saved_doc_ids():
+        last = (state.get(doc_id) or {}).get("checked_at") or saved_at
+        age_days = (now - last) / 86400
+        if age_days < REFRESH_MIN_AGE_DAYS:
+            continue
+        try:
+            record = load_document_record(doc_id)
+        except Exception as e:
+            print(f"[WARN] lỗi đọc {doc_id}: {e}")
+            continue
+        if not record or not record.get("source_url"):
+            continue
+        cands.append((age_days * refresh_weight(record), doc_id, record))
+    cands.sort(key=lambda c: -c[0])
+    return [(doc_id, record) for _, doc_id, record in cands[:REFRESH_BATCH]]
+
+async def refresh_one(page: Page, doc_id: str, record: dict, state: Dict[str, dict], queue: PriorityFrontier) -> Optional[bool]:
+    """True = đã cào lại, False = không đổi, None = không kiểm tra được."""
+    url = record["source_url"]
+    status = await throttled_goto(page, url, "refresh")
+    if status in THROTTLE_STATUS:
+        return None
+    await wait_if_human_check(page)
+    with METRICS.stage("refresh.light_state"):
+        new = await read_light_state(page)
+    if not any(new["meta"].values()) and not new["counts"]:
+        return None         # layout lạ / trang lỗi -> không kết luận
+    now = time.time()
+    entry = state.setdefault(doc_id, {})
+    old = entry.get("state") or record_light_state(record, new["counts"])
+    changed = diff_light_state(old, new)
+    entry.update({"fp": fingerprint(new), "state": new, "checked_at": now})
+    if not changed:
+        return False
+
+    print(f"[REFRESH] {doc_id} thay đổi: {', '.join(changed)}")
+    meta, sections, content_conn, light = await scrape_full_tab4(page)
+    if SCRAPE_SUMMARY:
+        summary_text = await scrape_summary_text(page)
+        if summary_text:
+            meta["Tóm tắt văn bản"] = summary_text
+    save_document_record(OUTPUT_DIR, build_doc_json(meta, sections, content_conn, url, light), doc_id)
+    await download_vietnamese_doc(page, doc_id)
+    field = meta.get("Lĩnh vực, ngành", "")
+    for u, relation, name in harvest_new_urls(sections, content_conn):
+        push_link(queue, u, relation, 1, name, field)
+    entry.update({"changed_at": now, "last_change": changed})
+    return True
+
+# ========== LOGIN MANUAL ==========
+async def wait_for_manual_login(page: Page):
+    print("\n=== MỞ TRÌNH DUYỆT ĐỂ BẠN ĐĂNG NHẬP / VERIFY ===")
+    print("Đăng nhập / xử lý CAPTCHA trên cửa sổ Chromium vừa mở.")
+    print("Khi xong quay lại terminal và nhấn Enter.\n")
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, input, ">> Nhấn Enter khi đã đăng nhập xong: ")
+
+# ========== SEED ==========
+class SingleSeed:
+    """1 URL xuất phát, chỉ thêm khi hàng đợi (checkpoint) đang rỗng."""
+    def __init__(self, url: str):
+        self.url = url
+
+    async def seed(self, page: Page, queue, seen_ids: set):
+        if not len(queue):
+            push_link(queue, normalize_tvpl_url(self.url), "search", 0)
+
+class SearchRangeSeeds:
+    """Quét các trang kết quả tìm kiếm START..END (build_search_page_url), chia theo worker.
+
+    SEARCH_FETCH = "http": SEARCH_CONCURRENCY trang tải song song bằng http_get (cookie của phiên);
+    trang gặp challenge thì mở lại bằng trình duyệt (lần lượt, để người / pool xử lý).
+    Chỉ nhận HTTP 200. 429 / 503 / 5xx / lỗi mạng / trang 200 mà không có link lẫn thông báo
+    hết kết quả -> thử lại MAX_RETRIES lần; status khác (403, 404...) -> bỏ trang ngay. Trang
+    lỗi được báo cuối giai đoạn, không dừng cả giai đoạn. Chỉ trang hiện rõ thông báo hết kết
+    quả (SEARCH_EMPTY_MARKERS) mới hạ last_page -> không tải các trang sau nó.
+    """
+    def __init__(self, search_url: str, start: int, end: int):
+        self.search_url = search_url
+        self.start = start
+        self.end = end
+        self.last_page = end        # hạ xuống khi gặp trang rỗng (hết kết quả)
+        self.done_pages = set()     # pool: gọi lại seed bằng phiên khác thì bỏ qua trang đã quét
+
+    def pending_pages(self) -> List[int]:
+        # nhiều worker: chia trang search theo page_idx mod số worker
+        mine = int(WORKER_ID or 0) % NUM_WORKERS
+        return [i for i in range(self.start, self.last_page + 1)
+                if (i - self.start) % NUM_WORKERS == mine and i not in self.done_pages]
+
+    async def seed(self, page: Page, queue, seen_ids: set):
+        pages = self.pending_pages()
+        browser_lock = asyncio.Lock()       # 1 page trình duyệt -> fallback chạy lần lượt
+        sem = asyncio.Semaphore(SEARCH_CONCURRENCY if SEARCH_FETCH == "http" else 1)
+
+        async def one(page_idx: int):
+            async with sem:
+                if page_idx > self.last_page:
+                    return
+                if SEARCH_FETCH == "http":
+                    links = await self.fetch_http(page, page_idx, browser_lock)
+                else:
+                    links = await self.fetch_browser(page, page_idx)
+            if links is not None:
+                self.add_links(page_idx, links, queue, seen_ids)
+
+        tasks = [asyncio.ensure_future(one(i)) for i in pages]
+        try:
+            with METRICS.stage("seed.search", pages=len(pages)):
+                await asyncio.gather(*tasks)
+        finally:
+            # SessionChallenged / hủy: dừng các trang còn lại, phiên khác gọi lại seed sẽ tải tiếp
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        failed = [i for i in self.pending_pages() if i <= self.last_page]
+        if failed:
+            METRICS.incr("search_failed", n=len(failed))
+            print(f"[SEARCH-WARN] {len(failed)} trang lỗi (status khác 200 hoặc hết {MAX_RETRIES} lần thử lại): {failed}")
+
+    @staticmethod
+    def _status_retryable(page_idx: int, status: int, attempt: int) -> bool:
+        """Status khác 200: in cảnh báo; True nếu đáng thử lại (429 / 503 / 5xx / không có response)."""
+        print(f"[SEARCH-WARN] trang {page_idx} HTTP {status} ({attempt + 1}/{MAX_RETRIES + 1})")
+        if status in THROTTLE_STATUS or status >= 500 or status == 0:
+            METRICS.incr("throttled", status=status)
+            return True
+        METRICS.incr("search_bad_status", status=status)
+        return False
+
+    @staticmethod
+    def _links_or_empty(page_idx: int, links: List[str], html: str) -> Optional[List[str]]:
+        """links nếu có; [] nếu trang hiện thông báo hết kết quả; None (thử lại) nếu không rõ."""
+        if links:
+            return links
+        html = (html or "").lower()
+        if any(m in html for m in SEARCH_EMPTY_MARKERS):
+            return []
+        print(f"[SEARCH-WARN] trang {page_idx}: không có link văn bản cũng không có thông báo hết kết quả")
+        METRICS.incr("search_unrecognized")
+        return None
+
+    async def fetch_http(self, page: Page, page_idx: int, browser_lock: asyncio.Lock) -> Optional[List[str]]:
+        """Link văn bản của 1 trang search ([] = hết kết quả); None nếu lỗi (xem docstring lớp)."""
+        url = build_search_page_url(self.search_url, page_idx)
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                status, body, headers = await http_get(page, url, "search")
+            except Exception as e:
+                print(f"[SEARCH-WARN] trang {page_idx} ({attempt + 1}/{MAX_RETRIES + 1}): {e}")
+                continue
+            if looks_like_challenge(body, url, status, headers):
+                # cookie hết hạn / Cloudflare chặn client HTTP: trình duyệt mở lại trang này
+                METRICS.incr("search_browser_fallback")
+                async with browser_lock:
+                    return await self.fetch_browser(page, page_idx)
+            if status != 200:
+                if self._status_retryable(page_idx, status, attempt):
+                    continue
+                return None
+            print(f"[SEARCH] trang {page_idx} HTTP {status}")
+            links = self._links_or_empty(page_idx, detail_links_from_html(body), body)
+            if links is not None:
+                return links
+        return None
+
+    async def fetch_browser(self, page: Page, page_idx: int) -> Optional[List[str]]:
+        search_page_url = build_search_page_url(self.search_url, page_idx)
+        print(f"[SEARCH] going to {search_page_url}")
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                status = await throttled_goto(page, search_page_url, "search")
+                if await wait_if_human_check(page):
+                    status = 200        # người đã qua challenge (thường trả 403), trang hiện tại là trang thật
+                if status != 200:
+                    if self._status_retryable(page_idx, status, attempt):
+                        continue
+                    return None
+                links = self._links_or_empty(page_idx, await collect_detail_links_from_search(page),
+                                             await page.content())
+            except SessionChallenged:
+                raise
+            except Exception as e:
+                print(f"[SEARCH-WARN] không mở được {search_page_url} ({attempt + 1}/{MAX_RETRIES + 1}): {e}")
+                continue
+            if links is not None:
+                return links
+        return None
+
+    def add_links(self, page_idx: int, links: List[str], queue, seen_ids: set):
+        self.done_pages.add(page_idx)
+        if not links:
+            if page_idx - 1 < self.last_page:
+                self.last_page = page_idx - 1
+                print(f"[SEARCH] trang {page_idx} không còn kết quả -> dừng ở trang {self.last_page}")
+            return
+        # frontier tự loại URL trùng (dict theo url), không cần dò lại hàng đợi
+        added = sum(1 for link in links if push_link(queue, link, "search", 0))
+        print(f"[SEARCH] trang {page_idx}: thu được {len(links)} link, thêm mới {added}")
+        METRICS.incr("search_pages")
+        save_checkpoint(seen_ids, queue)
+
+# ========== MAIN ==========
+async def crawl_one(page: Page, queue, entry: dict, seen_ids: set, global_ids: set, global_urls: set,
+                    retries: Dict[str, int]):
+    """Mở 1 URL lấy từ frontier: scrape tab4, lưu json, tải .doc, đẩy link liên quan vào frontier."""
+    url, depth = entry["url"], entry["depth"]
+    if not url_in_domain(url):
+        return
+    if url in global_urls:
+        print(f"[GLOBAL] bỏ qua, đã có người cào: {url}")
+        return
+
+    print(f"[DOC] mở {url}")
+    try:
+        status = await throttled_goto(page, url, "doc")
+        if status in THROTTLE_STATUS:
+            retries[url] = retries.get(url, 0) + 1
+            if retries[url] <= MAX_RETRIES:
+                print(f"[RETRY] HTTP {status}, xếp lại với điểm thấp hơn ({retries[url]}/{MAX_RETRIES}): {url}")
+                queue.push(url, entry["score"] - 1, depth, entry["relation"], requeue=True)
+            else:
+                record_failed(entry, f"HTTP {status}")
+                save_checkpoint(seen_ids, queue)
+            METRICS.incr("throttled", status=status)
+            return
+        await wait_if_human_check(page)
+    except SessionChallenged:
+        # xếp lại nguyên điểm cho phiên khác; SessionPool cách ly phiên này.
+        # URL nào cũng bị challenge (hoặc bị nhận nhầm) thì không xếp lại mãi, tránh loại dần mọi phiên
+        n = CHALLENGE_REQUEUES[url] = CHALLENGE_REQUEUES.get(url, 0) + 1
+        if n <= MAX_RETRIES:
+            print(f"[CHALLENGE] xếp lại ({n}/{MAX_RETRIES}): {url}")
+            queue.push(url, entry["score"], depth, entry["relation"], requeue=True)
+        else:
+            print(f"[CHALLENGE] bỏ cuộc sau {MAX_RETRIES} lần xếp lại: {url}")
+            record_failed(entry, "challenge")
+            save_checkpoint(seen_ids, queue)
+        raise
+    except Exception as e:
+        print(f"[SKIP] goto fail: {url} — {e}")
+        METRICS.incr("goto_fail")
+        record_failed(entry, f"goto: {e}")
+        save_checkpoint(seen_ids, queue)
+        return
+
+    try:
+        meta, sections, content_conn, light = await scrape_full_tab4(page)
+        if SCRAPE_SUMMARY:
+            summary_text = await scrape_summary_text(page)
+            if summary_text:
+                meta["Tóm tắt văn bản"] = summary_text
+    except Exception as e:
+        print(f"[WARN] scrape fail: {url} — {e}")
+        METRICS.incr("scrape_fail")
+        save_checkpoint(seen_ids, queue)
+        return
+
+    doc_id = doc_id_from_meta(meta, url)
+    if doc_id in seen_ids or doc_id in global_ids or not queue.claim_doc(doc_id):
+        print(f"[DUP] {doc_id} -> {url}")
+        METRICS.incr("dup")
+        save_checkpoint(seen_ids, queue)
+        return
+
+    record = build_doc_json(meta, sections, content_conn, url, light)
+    path = save_document_record(OUTPUT_DIR, record, doc_id)
+    seen_ids.add(doc_id)
+    print(f"[OK] saved {doc_id} -> {path.name}")
+    METRICS.incr("docs_saved")
+
+    # tải file .doc
+    await download_vietnamese_doc(page, doc_id)
+
+    # add related urls
+    new_urls = harvest_new_urls(sections, content_conn)
+    field = meta.get("Lĩnh vực, ngành", "")
+    for u, relation, name in new_urls:
+        push_link(queue, u, relation, depth + 1, name, field)
+
+    save_checkpoint(seen_ids, queue)
+
+async def crawl():
+    await _run(_crawl)
+
+async def refresh():
+    await _run(_refresh)
+
+async def _run(body):
+    ensure_dirs()
+    global LIMITER, STORE
+    LIMITER = make_limiter()
+    if RECORD_STORE == "segments":
+        STORE = SegmentStore(OUTPUT_DIR / "store")
+    METRICS.open(OUTPUT_DIR / "metrics")
+    try:
+        await body()
+    finally:
+        LIMITER.log()
+        METRICS.close()
+        if STORE is not None:
+            STORE.close()       # nén phần tail còn lại thành block
+            STORE = None
+
+async def open_browser(p):
+    """(context, page); SESSION = "pool" thì trả (SessionPool, page của phiên đầu) — cả 2 đều có close()."""
+    if SESSION == "pool":
+        browser = await p.chromium.launch(headless=HEADLESS)
+        pool = await SessionPool.open(browser, SESSION_DIR, SESSION_QUARANTINE_SEC, SESSION_MAX_STRIKES,
+                                      viewport=VIEWPORT, accept_downloads=True)
+        return pool, pool.sessions[0].page
+    if SESSION == "persistent":
+        context = await p.chromium.launch_persistent_context(
+            user_data_dir=PERSIST_DIR,
+            headless=HEADLESS,
+            viewport=VIEWPORT,
+            accept_downloads=True,
+        )
+        need_login = not SKIP_MANUAL_LOGIN
+    else:
+        browser = await p.chromium.launch(headless=HEADLESS)
+        has_state = AUTH_STATE_PATH.exists()
+        context = await browser.new_context(
+            viewport=VIEWPORT,
+            storage_state=str(AUTH_STATE_PATH) if has_state else None,
+            accept_downloads=True,
+        )
+        need_login = not has_state and not SKIP_MANUAL_LOGIN
+    page = await context.new_page()
+
+    # mở trang chủ để bạn qua Cloudflare nếu cần
+    print("[INIT] mở trang chủ để bạn vượt Cloudflare / login nếu cần...")
+    await page.goto(BASE_URL, wait_until="domcontentloaded")
+    try:
+        await wait_if_human_check(page)
+    except SessionChallenged:
+        # worker không người: không chết lúc khởi động (mất lượt restart), từng URL tự xử lý challenge sau
+        print(f"[CHALLENGE] trang chủ bị challenge, worker không người -> bỏ qua, nghỉ {CHALLENGE_BACKOFF_SEC}s")
+        await asyncio.sleep(CHALLENGE_BACKOFF_SEC)
+    if need_login:
+        await wait_for_manual_login(page)
+        if SESSION == "storage_state":
+            save_json(AUTH_STATE_PATH, await context.storage_state())
+            print(f"[AUTH] Đã lưu phiên vào {AUTH_STATE_PATH}")
+    return context, page
+
+async def _refresh():
+    seen_ids, queue = load_checkpoint()
+    state = load_refresh_state()
+    batch = pick_refresh_batch(state, time.time())
+    print(f"[REFRESH] kiểm tra {len(batch)} văn bản")
+
+    async with async_playwright() as p:
+        context, page = await open_browser(p)
+        for doc_id, record in batch:
+            try:
+                changed = await refresh_one(page, doc_id, record, state, queue)
+            except SessionChallenged:
+                print(f"[CHALLENGE] {doc_id}: worker không người, để lần refresh sau, nghỉ {CHALLENGE_BACKOFF_SEC}s")
+                await asyncio.sleep(CHALLENGE_BACKOFF_SEC)
+                changed = None
+            except Exception as e:
+                print(f"[REFRESH-WARN] {doc_id}: {e}")
+                changed = None
+            METRICS.incr({True: "refresh_changed", False: "refresh_same", None: "refresh_fail"}[changed])
+            save_refresh_state(state)
+        save_checkpoint(seen_ids, queue)
+        await context.close()
+
+async def _crawl():
+    seen_ids, queue = load_checkpoint()
+    # id của thành viên khác để riêng, không ghi vào seen_ids.json của mình
+    global_ids, global_urls = load_global_seen() if USE_GLOBAL_SEEN else (set(), set())
+    if USE_GLOBAL_SEEN:
+        load_global_queue(queue, seen_ids, global_urls)
+    requeue_failed(queue)
+
+    async with async_playwright() as p:
+        context, page = await open_browser(p)
+
+        if SESSION == "pool":
+            await _crawl_pool(context, queue, seen_ids, global_ids, global_urls)
+            await context.close()
+            return
+
+        # 1) seed: trang search / URL đầu
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                await SEEDS.seed(page, queue, seen_ids)
+                break
+            except SessionChallenged:
+                # worker không người: các trang search đã quét được giữ lại (done_pages), nghỉ rồi quét tiếp
+                print(f"[CHALLENGE] seed bị challenge ({attempt + 1}/{MAX_RETRIES + 1}), nghỉ {CHALLENGE_BACKOFF_SEC}s")
+                await asyncio.sleep(CHALLENGE_BACKOFF_SEC)
+
+        # 2) duyệt từng văn bản
+        retries: Dict[str, int] = {}
+        while queue:
+            try:
+                entry = queue.pop()
+            except IndexError:
+                # frontier chung: phần còn lại đang do worker khác giữ lease
+                await asyncio.sleep(LEASE_POLL_SEC)
+                continue
+            try:
+                await crawl_one(page, queue, entry, seen_ids, global_ids, global_urls, retries)
+            except SessionChallenged:
+                # chỉ xảy ra với worker không người: crawl_one đã trả URL về hàng đợi (hoặc failed.json)
+                METRICS.incr("challenge_backoff")
+                print(f"[CHALLENGE] worker không người, nghỉ {CHALLENGE_BACKOFF_SEC}s rồi làm tiếp")
+                await asyncio.sleep(CHALLENGE_BACKOFF_SEC)
+            # xong (kể cả bỏ qua) mới trả lease; worker chết giữa chừng thì lease hết hạn, URL quay lại hàng đợi
+            queue.done(entry["url"])
+
+        await context.close()
+
+async def _crawl_pool(pool: SessionPool, queue, seen_ids: set, global_ids: set, global_urls: set):
+    """Mỗi phiên 1 coroutine lấy URL từ frontier chung; LIMITER vẫn là trần rate chung của cả tiến trình."""
+    while True:
+        s = await pool.acquire()
+        try:
+            await SEEDS.seed(s.page, queue, seen_ids)
+        except SessionChallenged:
+            await pool.quarantine(s)
+            continue
+        await pool.release(s)
+        break
+
+    retries: Dict[str, int] = {}
+    in_flight = 0
+
+    async def worker():
+        nonlocal in_flight
+        while True:
+            # lấy phiên trước rồi mới lấy URL: hết phiên khỏe thì URL vẫn nằm trong frontier
+            s = await pool.acquire()
+            try:
+                entry = queue.pop()
+            except IndexError:
+                await pool.release(s, ok=False)
+                if in_flight == 0 and not len(queue):
+                    return          # không còn URL, cũng không ai đang cào để đẩy thêm link
+                await asyncio.sleep(LEASE_POLL_SEC if queue.durable else 1)
+                continue
+            in_flight += 1
+            try:
+                await crawl_one(s.page, queue, entry, seen_ids, global_ids, global_urls, retries)
+                await pool.release(s)
+            except SessionChallenged:
+                METRICS.incr("session_quarantined", session=s.name)
+                await pool.quarantine(s)
+            except BaseException:
+                await pool.release(s, ok=False)
+                raise
+            finally:
+                in_flight -= 1
+            queue.done(entry["url"])
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(len(pool))))
+    finally:
+        print(f"[POOL] {json.dumps(pool.stats(), ensure_ascii=False)}")
+
+# tính các giá trị suy ra cho cấu hình mặc định; script gọi lại với tùy chọn riêng
+configure()
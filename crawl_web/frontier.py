@@ -0,0 +1,126 @@
+# frontier.py
+# Hàng đợi ưu tiên cho crawler thay cho deque FIFO.
+#
+# Điểm của 1 URL (score_link):
+#   + trọng số theo loại quan hệ (văn bản thay thế / sửa đổi / hợp nhất > căn cứ > dẫn chiếu > nội dung liên quan)
+#   + thưởng nếu "Lĩnh vực, ngành" của văn bản cha thuộc lĩnh vực ưu tiên
+#   + thưởng nếu tên link chứa từ khóa; chứa từ khóa loại trừ thì bỏ hẳn
+#   - phạt theo độ sâu tính từ trang search
+# heapq: push/pop O(log n); URL đã nằm trong hàng đợi thì chỉ nâng điểm (lazy, entry cũ bị bỏ qua khi pop).
+# URL đã pop nằm trong visited: back-link (quan hệ 2 chiều amend/amended, replace/replaced...) không xếp lại
+# nữa, trừ khi push(..., requeue=True) (thử lại 429/503, challenge, failed.json).
+# Checkpoint: to_list()/from_list() (queue.json dạng list các dict; vẫn đọc được queue.json cũ dạng list URL),
+# visited lưu riêng (crawler_core: checkpoints/visited.json).
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+RELATION_WEIGHTS = {
+    "search": 10.0,
+    "replaceDocument": 8.0, "replacedDocument": 8.0,
+    "amendDocument": 8.0, "amendedDocument": 8.0,
+    "HopNhatDocument": 7.0, "DuocHopNhatDocument": 7.0,
+    "guideDocument": 6.0, "guidedDocument": 6.0,
+    "correctingDocument": 5.0, "correctedDocument": 5.0,
+    "basisDocument": 4.0,
+    "referentialDocument": 2.0,
+    "content_connection": 1.0,
+}
+DEFAULT_WEIGHT = 3.0
+FIELD_BONUS = 3.0
+KEYWORD_BONUS = 5.0
+DEPTH_PENALTY = 1.0
+
+def relation_of(section_key: str) -> str:
+    """'replaceDocument | Văn bản thay thế' -> 'replaceDocument'."""
+    return section_key.split("|", 1)[0].strip()
+
+def score_link(relation: str, depth: int, name: str = "", parent_field: str = "",
+               keywords: Iterable[str] = (), exclude: Iterable[str] = (),
+               priority_fields: Iterable[str] = ()) -> Optional[float]:
+    """None = loại (dính từ khóa loại trừ)."""
+    name_l = (name or "").lower()
+    if any(k.lower() in name_l for k in exclude):
+        return None
+    score = RELATION_WEIGHTS.get(relation, DEFAULT_WEIGHT)
+    field_l = (parent_field or "").lower()
+    if field_l and any(f.lower() in field_l for f in priority_fields):
+        score += FIELD_BONUS
+    if name_l and any(k.lower() in name_l for k in keywords):
+        score += KEYWORD_BONUS
+    return score - DEPTH_PENALTY * depth
+
+class PriorityFrontier:
+    durable = False         # nằm trong RAM -> save_checkpoint ghi queue.json
+
+    def __init__(self):
+        self._heap: List[tuple] = []                # (-score, seq, url)
+        self._entries: Dict[str, dict] = {}         # url -> entry còn hiệu lực
+        self._seq = 0
+        self.visited: Set[str] = set()              # url đã pop (đã / đang cào)
+
+    def push(self, url: str, score: float, depth: int = 0, relation: str = "search", requeue: bool = False) -> bool:
+        """True nếu URL mới vào hàng đợi; đã có với điểm >= hoặc đã pop (trừ requeue=True) thì bỏ qua."""
+        if url in self.visited and not requeue:
+            return False
+        cur = self._entries.get(url)
+        if cur is not None and cur["score"] >= score:
+            return False
+        self._seq += 1
+        entry = {"url": url, "score": round(score, 3), "depth": depth, "relation": relation, "seq": self._seq}
+        self._entries[url] = entry
+        heapq.heappush(self._heap, (-entry["score"], self._seq, url))
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+        return cur is None
+
+    def pop(self) -> dict:
+        while self._heap:
+            _, seq, url = heapq.heappop(self._heap)
+            entry = self._entries.get(url)
+            if entry is None or entry["seq"] != seq:
+                continue        # entry cũ đã bị nâng điểm
+            del self._entries[url]
+            self.visited.add(url)
+            return entry
+        raise IndexError("pop from empty frontier")
+
+    def discard(self, url: str) -> bool:
+        """Bỏ URL khỏi hàng đợi (không đánh dấu visited); entry trong heap bị bỏ qua khi pop."""
+        return self._entries.pop(url, None) is not None
+
+    def done(self, url: str):
+        """Chỉ có ý nghĩa với frontier dùng chung (shared_frontier.py); ở đây pop đã xóa URL."""
+
+    def claim_doc(self, doc_id: str) -> bool:
+        """1 tiến trình: seen_ids trong crawler_core đã chống trùng."""
+        return True
+
+    def _compact(self):
+        self._heap = [(-e["score"], e["seq"], u) for u, e in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, url: str):
+        return url in self._entries
+
+    # ---------- checkpoint ----------
+    def to_list(self) -> List[dict]:
+        return list(self._entries.values())
+
+    @classmethod
+    def from_list(cls, items: List[Union[str, dict]]) -> "PriorityFrontier":
+        fr = cls()
+        for it in items:
+            if isinstance(it, str):
+                # queue.json cũ (FIFO): giữ nguyên thứ tự nhờ seq tăng dần
+                it = {"url": it, "score": RELATION_WEIGHTS["search"], "depth": 0, "relation": "search"}
+            seq = it.get("seq") or fr._seq + 1
+            fr._seq = max(fr._seq, seq)
+            entry = {"url": it["url"], "score": it["score"], "depth": it.get("depth", 0),
+                     "relation": it.get("relation", "search"), "seq": seq}
+            fr._entries[entry["url"]] = entry
+        fr._compact()
+        return fr
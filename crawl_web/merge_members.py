@@ -0,0 +1,190 @@
+# merge_members.py
+# Gộp checkpoint + dữ liệu của các thành viên (out_luocdo/raw/<member>/) thành 1 frontier chung.
+#
+# - hợp seen_ids.json của mọi thành viên -> global seen-set
+# - hợp queue.json, bỏ URL đã cào (theo source_url trong json/) -> global queue (giữ điểm / độ sâu cao nhất)
+# - cùng doc_id (safe_name của Số hiệu) ở nhiều thành viên: so content hash,
+#   giống nhau thì coi là 1 bản, khác nhau thì chọn bản đầy đủ hơn và ghi conflicts.json
+#
+# - global queue chia cho các thành viên theo sha1(url) mod số thành viên -> queue_parts/<member>.json
+#
+# Crawler (loop*.py) đọc out_luocdo/global/checkpoints lúc khởi động để không cào lại
+# văn bản người khác đã có (seen giữ riêng, không ghi vào checkpoint của thành viên) và nạp
+# phần queue của mình (crawler_core.MEMBER = tên thư mục trong raw/) 1 lần sau mỗi lần gộp,
+# bỏ khỏi frontier của mình các URL đã chia cho người khác -> không ai cào trùng.
+#
+# Chạy:
+#   python merge_members.py --raw ../out_luocdo/raw --out ../out_luocdo/global
+
+import argparse, hashlib, json, re
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from frontier import RELATION_WEIGHTS
+from segment_store import SegmentStore
+
+SEARCH_SCORE = RELATION_WEIGHTS["search"]   # queue.json cũ (list URL) -> điểm như link từ trang search
+
+# ========== HELPERS (giống crawler_core) ==========
+def safe_name(s: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", s).strip("_") or "unknown"
+
+def normalize_tvpl_url(u: str) -> str:
+    p = urlparse(u)
+    qs = parse_qs(p.query)
+    qs.pop("tab", None)
+    new_query = "&".join(f"{k}={v[0]}" for k, v in qs.items())
+    return p._replace(query=new_query).geturl()
+
+def read_json(path: Path, default):
+    if not path.exists():
+        return default
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except Exception as e:
+        print(f"[WARN] lỗi đọc {path}: {e}")
+        return default
+
+def sha1_file(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+# ========== THU THẬP ==========
+def find_doc_file(member_dir: Path, stem: str) -> Optional[Path]:
+    for sub in ("doc", "downloads"):
+        for ext in (".doc", ".docx", ".pdf"):
+            p = member_dir / sub / f"{stem}{ext}"
+            if p.exists():
+                return p
+    return None
+
+def completeness(record: dict, doc_path: Optional[Path]) -> tuple:
+    """Bản nào 'đầy đủ' hơn: có file văn bản > nhiều section quan hệ > nhiều trường meta > file lớn hơn."""
+    meta = record.get("meta") or {}
+    filled = sum(1 for v in meta.values() if v and v != "Đã biết")
+    rels = sum(1 for v in (record.get("relations_sections") or {}).values() if v)
+    size = doc_path.stat().st_size if doc_path else 0
+    return (1 if doc_path else 0, rels, filled, size)
+
+def iter_member_records(member_dir: Path):
+    """(tên file gốc, record, vị trí) từ json/, docs/ (layout gốc của crawler) hoặc store/ (RECORD_STORE = "segments")."""
+    if (member_dir / "store" / "store.json").exists():
+        # chỉ đọc: store có thể của crawler đang chạy, không được flush / cắt tail.jsonl của nó
+        with SegmentStore(member_dir / "store", read_only=True) as store:
+            for stem, record in store.scan():
+                yield stem, record, f"{store.root}#{stem}"
+        return
+    json_dir = member_dir / "json"
+    if not json_dir.is_dir():
+        json_dir = member_dir / "docs"
+    if not json_dir.is_dir():
+        return
+    for jp in sorted(json_dir.glob("*.json")):
+        yield jp.stem, read_json(jp, None), str(jp)
+
+def collect_versions(raw_dir: Path) -> Dict[str, List[dict]]:
+    """doc_id -> list các bản (mỗi thành viên 1 bản)."""
+    versions: Dict[str, List[dict]] = {}
+    for member_dir in sorted(p for p in raw_dir.iterdir() if p.is_dir()):
+        for stem, record, where in iter_member_records(member_dir):
+            if not isinstance(record, dict):
+                continue
+            so_hieu = ((record.get("meta") or {}).get("Số hiệu") or "").strip()
+            doc_id = safe_name(so_hieu) if so_hieu else stem
+            doc_path = find_doc_file(member_dir, stem)
+            versions.setdefault(doc_id, []).append({
+                "member": member_dir.name,
+                "json": where,
+                "doc": str(doc_path) if doc_path else None,
+                "doc_sha1": sha1_file(doc_path) if doc_path else None,
+                "json_sha1": hashlib.sha1(
+                    json.dumps(record, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest(),
+                "source_url": record.get("source_url"),
+                "_rank": completeness(record, doc_path),
+            })
+    return versions
+
+# ========== GỘP ==========
+def resolve(versions: Dict[str, List[dict]]):
+    index, conflicts = {}, {}
+    for doc_id, vs in versions.items():
+        best = max(vs, key=lambda v: v["_rank"])
+        index[doc_id] = {k: v for k, v in best.items() if not k.startswith("_")}
+        index[doc_id]["copies"] = len(vs)
+        # chỉ so hash cùng loại: file văn bản với file văn bản, json với json
+        doc_hashes = {v["doc_sha1"] for v in vs if v["doc_sha1"]}
+        json_hashes = {v["json_sha1"] for v in vs}
+        if len(doc_hashes) > 1 or len(json_hashes) > 1:
+            conflicts[doc_id] = {
+                "chosen": best["member"],
+                "variants": [{k: v for k, v in x.items() if not k.startswith("_")} for x in vs],
+            }
+    return index, conflicts
+
+def queue_owner(url: str, members: List[str]) -> str:
+    """Thành viên được giao URL: sha1 ổn định giữa các lần chạy (hash() của Python đổi theo tiến trình)."""
+    return members[int(hashlib.sha1(url.encode("utf-8")).hexdigest()[:8], 16) % len(members)]
+
+def merge_members(raw_dir: Path, out_dir: Path):
+    versions = collect_versions(raw_dir)
+    index, conflicts = resolve(versions)
+
+    seen_ids = set(index)
+    seen_urls = set()
+    for v in index.values():
+        if v.get("source_url"):
+            seen_urls.add(v["source_url"])
+            seen_urls.add(normalize_tvpl_url(v["source_url"]))
+
+    # url -> entry frontier (điểm cao nhất giữa các thành viên); crawler_core.load_global_queue nạp lại
+    queue: Dict[str, dict] = {}
+    member_dirs = sorted(p for p in raw_dir.iterdir() if p.is_dir())
+    for member_dir in member_dirs:
+        cp = member_dir / "checkpoints"
+        seen_ids |= set(read_json(cp / "seen_ids.json", []))
+        for u in read_json(cp / "queue.json", []):
+            # loop_ver3 lưu frontier dạng dict {"url", "score", ...}, bản cũ là list URL
+            nu = normalize_tvpl_url(u["url"] if isinstance(u, dict) else u)
+            if nu in seen_urls:
+                continue
+            entry = {"url": nu, "score": u.get("score", SEARCH_SCORE), "depth": u.get("depth", 0),
+                     "relation": u.get("relation", "search")} if isinstance(u, dict) else \
+                    {"url": nu, "score": SEARCH_SCORE, "depth": 0, "relation": "search"}
+            if nu not in queue or entry["score"] > queue[nu]["score"]:
+                queue[nu] = entry
+    queue = sorted(queue.values(), key=lambda e: -e["score"])
+
+    cp_out = out_dir / "checkpoints"
+    cp_out.mkdir(parents=True, exist_ok=True)
+    (cp_out / "seen_ids.json").write_text(json.dumps(sorted(seen_ids), ensure_ascii=False, indent=2), encoding="utf-8")
+    (cp_out / "seen_urls.json").write_text(json.dumps(sorted(seen_urls), ensure_ascii=False, indent=2), encoding="utf-8")
+    (cp_out / "queue.json").write_text(json.dumps(queue, ensure_ascii=False, indent=2), encoding="utf-8")
+    members = [d.name for d in member_dirs]
+    parts_dir = cp_out / "queue_parts"
+    parts_dir.mkdir(exist_ok=True)
+    for old in parts_dir.glob("*.json"):
+        old.unlink()            # thành viên đã rút khỏi raw/ không giữ phần cũ
+    parts: Dict[str, List[dict]] = {m: [] for m in members}
+    for e in queue:
+        parts[queue_owner(e["url"], members)].append(e)
+    for m, part in parts.items():
+        (parts_dir / f"{m}.json").write_text(json.dumps(part, ensure_ascii=False, indent=2), encoding="utf-8")
+    (out_dir / "doc_index.json").write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+    (out_dir / "conflicts.json").write_text(json.dumps(conflicts, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    dup = sum(v["copies"] - 1 for v in index.values())
+    print(f"[MERGE] {len(index)} văn bản ({dup} bản trùng giữa thành viên, {len(conflicts)} xung đột nội dung)")
+    print(f"[MERGE] global seen: {len(seen_ids)} id, {len(seen_urls)} url; global queue: {len(queue)} url "
+          f"({', '.join(f'{m} {len(part)}' for m, part in parts.items())})")
+    print(f"[DONE] -> {out_dir}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw", default="out_luocdo/raw", help="thư mục chứa các thư mục thành viên")
+    parser.add_argument("--out", default="out_luocdo/global", help="thư mục global")
+    args = parser.parse_args()
+    merge_members(Path(args.raw), Path(args.out))
@@ -0,0 +1,232 @@
+# mock_tvpl_server.py
+# Server HTTP cục bộ giả lập thuvienphapluat.vn để đo hiệu năng crawler mà không cần mạng / Cloudflare.
+#
+# Dữ liệu "ghi lại" lấy từ out_luocdo/raw/<member>/json (meta + relations) và doc/ (file .doc thật).
+# Phục vụ:
+#   /page/searchlegal.aspx?...&page=N   -> trang kết quả tìm kiếm (a[href*="/van-ban/"])
+#   /van-ban/Mock/van-ban-<id>.aspx     -> trang văn bản có tab4 (lược đồ), tab "Tải về"
+#   /download/<id>.doc                  -> file .doc
+# Có cấu hình độ trễ, tỉ lệ lỗi 503/429 và tỉ lệ trả về trang "challenge".
+#
+# Chạy riêng:
+#   python mock_tvpl_server.py --port 8765 --latency-ms 150 --fail-rate 0.02
+
+import argparse, html, json, random, re, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+RAW_DIR = Path(__file__).resolve().parent.parent / "out_luocdo" / "raw"
+RESULTS_PER_PAGE = 20
+PREVIEW_LINKS = 5           # số link hiện sẵn trong mỗi section, còn lại sau nút .dgcvm
+LOAD_MORE_DELAY_MS = 120    # độ trễ giả lập khi bấm .dgcvm
+
+SECTION_KEYS = [
+    ("guidedDocument", "Văn bản được hướng dẫn"), ("DuocHopNhatDocument", "Văn bản được hợp nhất"),
+    ("amendedDocument", "Văn bản bị sửa đổi bổ sung"), ("correctedDocument", "Văn bản bị đính chính"),
+    ("replacedDocument", "Văn bản bị thay thế"), ("referentialDocument", "Văn bản được dẫn chiếu"),
+    ("basisDocument", "Văn bản được căn cứ"), ("guideDocument", "Văn bản hướng dẫn"),
+    ("HopNhatDocument", "Văn bản hợp nhất"), ("amendDocument", "Văn bản sửa đổi bổ sung"),
+    ("correctingDocument", "Văn bản đính chính"), ("replaceDocument", "Văn bản thay thế"),
+]
+
+# ========== DỮ LIỆU ==========
+class Corpus:
+    def __init__(self, raw_dir: Path = RAW_DIR, links_per_section: int = 3, seed: int = 0):
+        self.docs: List[dict] = []
+        self.doc_files: Dict[int, Path] = {}
+        seen = set()
+        for jp in sorted(raw_dir.glob("*/json/*.json")):
+            try:
+                rec = json.loads(jp.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            key = (rec.get("meta") or {}).get("Số hiệu") or jp.stem
+            if key in seen:
+                continue
+            seen.add(key)
+            doc_no = len(self.docs) + 1
+            self.docs.append(rec)
+            for ext in (".doc", ".docx"):
+                p = jp.parent.parent / "doc" / f"{jp.stem}{ext}"
+                if p.exists():
+                    self.doc_files[doc_no] = p
+                    break
+        # đồ thị quan hệ tổng hợp (dữ liệu thật gần như rỗng) -> crawler có link để đi tiếp
+        rng = random.Random(seed)
+        n = len(self.docs)
+        self.relations: Dict[int, Dict[str, List[int]]] = {}
+        for doc_no in range(1, n + 1):
+            rels = {}
+            for key, _ in SECTION_KEYS:
+                k = rng.choice([0, 0, 0, links_per_section, links_per_section * 3])
+                rels[key] = [rng.randint(1, n) for _ in range(k)] if n else []
+            self.relations[doc_no] = rels
+
+    def __len__(self):
+        return len(self.docs)
+
+# ========== HTML ==========
+def doc_url(doc_no: int, base: str = "") -> str:
+    # site thật trả link tuyệt đối trong lược đồ (harvest_new_urls lọc theo domain)
+    return f"{base}/van-ban/Mock/van-ban-{doc_no}.aspx"
+
+def clean(s: str) -> str:
+    # giữ nguyên chữ đã ghi lại ("xác minh"... có trong tóm tắt thật): crawler phải không nhận nhầm là challenge
+    return html.escape(s or "")
+
+def render_search(corpus: Corpus, page_num: int, base: str) -> str:
+    start = (page_num - 1) * RESULTS_PER_PAGE
+    items = range(start + 1, min(start + RESULTS_PER_PAGE, len(corpus)) + 1)
+    links = "\n".join(
+        f'<p class="nqTitle"><a href="{doc_url(i, base)}">{clean((corpus.docs[i - 1].get("meta") or {}).get("Tiêu đề", ""))}</a></p>'
+        for i in items)
+    return f"<html><body><div id='block-info-advan'>{links or 'Không tìm thấy văn bản'}</div></body></html>"
+
+def render_section(section_id: str, title: str, targets: List[int], corpus: Corpus, base: str) -> str:
+    def link(i):
+        t = (corpus.docs[i - 1].get("meta") or {}).get("Tiêu đề", "")
+        return f'<div class="dgc"><a href="{doc_url(i, base)}">{clean(t)}</a></div>'
+    shown = "".join(link(i) for i in targets[:PREVIEW_LINKS])
+    hidden = "".join(link(i) for i in targets[PREVIEW_LINKS:])
+    more = ""
+    if hidden:
+        # giống AJAX của site thật: link chỉ được chèn vào DOM sau khi bấm, trễ một chút
+        more = (f'<template>{hidden}</template>'
+                f'<a class="dgcvm" onclick="var b=this,t=b.previousSibling;setTimeout(function(){{'
+                f'b.parentNode.insertBefore(t.content,t);t.remove();b.remove();}},{LOAD_MORE_DELAY_MS});">Xem thêm</a>')
+    header = (f'<div class="ghd" onclick="toggle(\'{section_id}\')">{title} [ {len(targets)} ]</div>')
+    box = f'<div id="{section_id}" class="ct" style="display:none">{shown}{more}</div>'
+    return header + box
+
+def render_doc(corpus: Corpus, doc_no: int, base: str) -> str:
+    rec = corpus.docs[doc_no - 1]
+    meta = rec.get("meta") or {}
+    rows = "".join(
+        f'<div class="att"><div class="hd fl">{clean(k)}:</div><div class="ds fl">{clean(v)}</div></div>'
+        for k, v in meta.items() if k not in ("Tiêu đề", "Tóm tắt văn bản"))
+    rels = corpus.relations[doc_no]
+    left = "".join(render_section(k, t, rels[k], corpus, base) for k, t in SECTION_KEYS[:6])
+    right = "".join(render_section(k, t, rels[k], corpus, base) for k, t in SECTION_KEYS[6:])
+    return f"""<html><head><script>
+function toggle(id) {{ var e = document.getElementById(id); e.style.display = e.style.display == 'none' ? 'block' : 'none'; }}
+</script></head><body>
+<ul><li><a href="#tab1">Nội dung</a></li><li><a href="#tab4">Lược đồ</a></li><li><a href="#tab7">Tải về</a></li></ul>
+<div class="Tomtatvanban">{clean(meta.get("Tóm tắt văn bản", ""))}</div>
+<div id="tab4">
+  <div id="viewingDocument" class="ct"><div class="tt">{clean(meta.get("Tiêu đề", ""))}</div>{rows}</div>
+  <div class="left fl">{left}</div>
+  <div class="rr fl">{right}</div>
+  <div id="contentConnection"><div class="dgcParent"></div></div>
+</div>
+<div id="tab7"><a id="ctl00_Content_ThongTinVB_vietnameseHyperLink" href="{base}/download/{doc_no}.doc">Tải Văn bản tiếng Việt</a></div>
+</body></html>"""
+
+# dạng trang challenge thật của Cloudflare: 403 + header cf-mitigated, title / form / script challenge-platform
+CHALLENGE_PAGE = ("<html><head><title>Just a moment...</title></head><body>"
+                  "<form id=\"challenge-form\" action=\"/?__cf_chl_f_tk=mock\" method=\"POST\"></form>"
+                  "<script src=\"/cdn-cgi/challenge-platform/h/b/orchestrate/chl_page/v1\"></script></body></html>")
+
+# ========== SERVER ==========
+class MockState:
+    def __init__(self, corpus: Corpus, latency_ms: float = 0, jitter_ms: float = 0,
+                 fail_rate: float = 0.0, challenge_rate: float = 0.0, seed: int = 0):
+        self.corpus = corpus
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.challenge_rate = challenge_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes": 0, "errors": 0, "challenges": 0,
+                      "search": 0, "doc": 0, "download": 0}
+
+    def count(self, **kw):
+        with self.lock:
+            for k, v in kw.items():
+                self.stats[k] = self.stats.get(k, 0) + v
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_body(self, code: int, body: bytes, ctype: str, headers: Optional[dict] = None):
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            state.count(requests=1, bytes=len(body))
+
+        def do_GET(self):
+            with state.lock:
+                delay = max(0.0, state.latency_ms + state.rng.uniform(-state.jitter_ms, state.jitter_ms))
+                fail = state.rng.random() < state.fail_rate
+                challenge = state.rng.random() < state.challenge_rate
+            time.sleep(delay / 1000.0)
+
+            parsed = urlparse(self.path)
+            path = parsed.path
+            if fail and path != "/":
+                state.count(errors=1)
+                return self.send_body(state.rng.choice([503, 429]), b"Service Unavailable", "text/plain")
+            if challenge and path.startswith("/van-ban/"):
+                state.count(challenges=1)
+                return self.send_body(403, CHALLENGE_PAGE.encode("utf-8"), "text/html; charset=utf-8",
+                                      {"cf-mitigated": "challenge"})
+
+            base = f"http://{self.headers.get('Host')}"
+            if path == "/":
+                return self.send_body(200, b"<html><body>mock thuvienphapluat</body></html>", "text/html; charset=utf-8")
+            if path.startswith("/page/"):
+                page_num = int((parse_qs(parsed.query).get("page") or ["1"])[0])
+                state.count(search=1)
+                return self.send_body(200, render_search(state.corpus, page_num, base).encode("utf-8"), "text/html; charset=utf-8")
+            m = re.match(r"^/van-ban/.*-(\d+)\.aspx$", path)
+            if m and 1 <= int(m.group(1)) <= len(state.corpus):
+                state.count(doc=1)
+                return self.send_body(200, render_doc(state.corpus, int(m.group(1)), base).encode("utf-8"), "text/html; charset=utf-8")
+            m = re.match(r"^/download/(\d+)\.doc$", path)
+            if m:
+                state.count(download=1)
+                p = state.corpus.doc_files.get(int(m.group(1)))
+                body = p.read_bytes() if p else b"\xd0\xcf\x11\xe0" + b"\0" * 4096
+                return self.send_body(200, body, "application/msword")
+            return self.send_body(404, b"not found", "text/plain")
+
+    return Handler
+
+def start_server(state: MockState, host: str = "127.0.0.1", port: int = 0):
+    """Chạy server ở thread nền, trả (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--raw", default=str(RAW_DIR))
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--challenge-rate", type=float, default=0.0)
+    parser.add_argument("--links-per-section", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = Corpus(Path(args.raw), args.links_per_section)
+    state = MockState(corpus, args.latency_ms, args.jitter_ms, args.fail_rate, args.challenge_rate)
+    server, base = start_server(state, port=args.port)
+    print(f"[MOCK] {len(corpus)} văn bản, phục vụ tại {base}  (Ctrl+C để dừng)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"[MOCK] {state.stats}")
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,108 @@
+# rate_limiter.py
+# Điều tốc AIMD (additive increase / multiplicative decrease) thay cho sleep cố định.
+#
+# - trước mỗi request gọi `await limiter.wait()`: giãn cách 1/rate giây (kèm chút jitter)
+# - sau request gọi `limiter.on_response(status, latency)`:
+#     2xx/3xx nhanh        -> rate += increase        (tăng dần khi site khỏe)
+#     phản hồi chậm        -> rate *= slow_decrease
+#     429 / 503            -> rate *= decrease, nghỉ theo Retry-After
+# - `limiter.on_challenge()` khi gặp Cloudflare / CAPTCHA -> giảm mạnh + nghỉ
+# - rate luôn nằm trong [min_rate, max_rate]; max_rate là trần chung cho cả tiến trình
+# - log định kỳ: rate đạt được thực tế, rate hiện tại, tỉ lệ challenge
+
+import asyncio, random, time
+from typing import Optional
+
+THROTTLE_STATUS = {429, 503}
+
+class AdaptiveRateLimiter:
+    def __init__(self, start_rate: float = 0.4, min_rate: float = 0.05, max_rate: float = 1.0,
+                 increase: float = 0.05, decrease: float = 0.5, slow_decrease: float = 0.8,
+                 slow_sec: float = 4.0, challenge_cooldown_sec: float = 30.0,
+                 jitter: float = 0.2, log_every: int = 20):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(start_rate, min_rate), max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_decrease = slow_decrease
+        self.slow_sec = slow_sec
+        self.challenge_cooldown_sec = challenge_cooldown_sec
+        self.jitter = jitter
+        self.log_every = log_every
+
+        self.requests = 0
+        self.throttled = 0
+        self.slow = 0
+        self.challenges = 0
+        self._t_start = time.monotonic()
+        self._last = 0.0
+        self._cooldown_until = 0.0
+        self._lock = asyncio.Lock()
+
+    # ---------- trước request ----------
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            interval = random.uniform(1 - self.jitter, 1 + self.jitter) / self.rate
+            delay = max(self._last + interval, self._cooldown_until) - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last = time.monotonic()
+            self.requests += 1
+            if self.log_every and self.requests % self.log_every == 0:
+                self.log()
+
+    # ---------- sau request ----------
+    def on_response(self, status: int, latency_sec: float, retry_after: Optional[str] = None):
+        if status in THROTTLE_STATUS:
+            self.throttled += 1
+            self._set_rate(self.rate * self.decrease)
+            pause = _parse_retry_after(retry_after)
+            if pause is None:
+                pause = 1.0 / self.rate
+            self._cooldown(pause)
+            print(f"[RATE] HTTP {status} -> giảm còn {self.rate:.3f} req/s, nghỉ {pause:.1f}s")
+        elif latency_sec > self.slow_sec:
+            self.slow += 1
+            self._set_rate(self.rate * self.slow_decrease)
+        elif 200 <= status < 400:
+            self._set_rate(self.rate + self.increase)
+
+    def on_challenge(self):
+        self.challenges += 1
+        self._set_rate(self.rate * self.decrease * self.decrease)
+        self._cooldown(self.challenge_cooldown_sec)
+        print(f"[RATE] challenge -> giảm còn {self.rate:.3f} req/s")
+
+    # ---------- nội bộ ----------
+    def _set_rate(self, rate: float):
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+
+    def _cooldown(self, sec: float):
+        self._cooldown_until = max(self._cooldown_until, time.monotonic() + sec)
+
+    # ---------- thống kê ----------
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self._t_start
+        return {
+            "requests": self.requests,
+            "achieved_rate": round(self.requests / elapsed, 4) if elapsed else 0.0,
+            "current_rate": round(self.rate, 4),
+            "throttled": self.throttled,
+            "slow": self.slow,
+            "challenges": self.challenges,
+            "challenge_rate": round(self.challenges / self.requests, 4) if self.requests else 0.0,
+        }
+
+    def log(self):
+        st = self.stats()
+        print(f"[RATE] {st['requests']} req, đạt {st['achieved_rate']:.3f} req/s (hiện {st['current_rate']:.3f}, "
+              f"trần {self.max_rate}), 429/503: {st['throttled']}, challenge: {st['challenges']} "
+              f"({st['challenge_rate'] * 100:.1f}%)")
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None     # dạng HTTP-date: bỏ qua, dùng 1/rate
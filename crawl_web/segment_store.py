@@ -0,0 +1,344 @@
+# segment_store.py
+# Kho lưu văn bản đã cào dạng segment nén, thay cho mỗi văn bản 1 file JSON indent=2.
+#
+# Bố cục thư mục store:
+#   store.json       manifest (codec, phiên bản)
+#   keys.jsonl       bảng key đã intern (key meta + key section "guidedDocument | Văn bản được hướng dẫn -"), id = số dòng
+#   seg-00000.z      các block nén nối tiếp nhau, mỗi block = BLOCK_RECORDS bản ghi JSONL gọn
+#   index.jsonl      mỗi dòng: [doc_id, segment, offset, length, vị trí trong block, ts]; dòng sau ghi đè dòng trước
+#   tail.jsonl       bản ghi chưa đủ 1 block (chưa nén); mở lại store thì nạp lại -> crash không mất dữ liệu
+#                    (dòng cuối ghi dở của tail / keys / index bị cắt khi mở lại để ghi)
+#
+# Bản ghi gọn: chỉ giữ section khác rỗng, key thay bằng id:
+#   {"u": source_url, "m": [[kid, value], ...], "rk": [kid, ...], "r": {"kid": [...]}, "c": [...]}
+# decode_record() dựng lại đúng layout cũ (kể cả section rỗng), export_files() ghi lại docs/<doc_id>.json.
+#
+# Chạy:
+#   python segment_store.py import --src out_luocdo/docs --store out_luocdo/store
+#   python segment_store.py export --store out_luocdo/store --out out_luocdo/docs_export
+#   python segment_store.py get --store out_luocdo/store --id 01_VBHN-BXD
+#   python segment_store.py stats --store out_luocdo/store
+#
+# SegmentStore(root, read_only=True): chỉ đọc store của crawler khác (có thể đang chạy) —
+# không tạo file, không mở keys/index/tail để ghi, close() không flush tail thành block.
+
+import argparse, json, time, zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard as zstd
+except ImportError:          # không có zstandard thì dùng zlib (ghi vào manifest)
+    zstd = None
+
+BLOCK_RECORDS = 64
+SEGMENT_BYTES = 64 << 20
+ZSTD_LEVEL = 10
+FORMAT_VERSION = 1
+_SEP = (",", ":")
+
+# ========== CODEC ==========
+class _Codec:
+    def __init__(self, name: str):
+        if name == "zstd" and zstd is None:
+            raise ImportError("store dùng zstd, cần `pip install zstandard`")
+        self.name = name
+        if name == "zstd":
+            self._c = zstd.ZstdCompressor(level=ZSTD_LEVEL)
+            self._d = zstd.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._c.compress(data) if self.name == "zstd" else zlib.compress(data, 6)
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._d.decompress(data) if self.name == "zstd" else zlib.decompress(data)
+
+# ========== MÃ HÓA BẢN GHI ==========
+_KNOWN = ("source_url", "meta", "relations_sections", "content_connection")
+
+def encode_record(rec: dict, intern) -> dict:
+    secs = rec.get("relations_sections") or {}
+    out = {
+        "u": rec.get("source_url"),
+        "m": [[intern(k), v] for k, v in (rec.get("meta") or {}).items()],
+        "rk": [intern(k) for k in secs],
+        "r": {str(intern(k)): v for k, v in secs.items() if v},
+    }
+    if rec.get("content_connection"):
+        out["c"] = rec["content_connection"]
+    extra = {k: v for k, v in rec.items() if k not in _KNOWN}
+    if extra:
+        out["x"] = extra
+    return out
+
+def decode_record(obj: dict, keys: List[str]) -> dict:
+    rel = obj.get("r") or {}
+    rec = {
+        "source_url": obj.get("u"),
+        "meta": {keys[k]: v for k, v in obj.get("m") or []},
+        "relations_sections": {keys[k]: rel.get(str(k), []) for k in obj.get("rk") or []},
+        "content_connection": obj.get("c") or [],
+    }
+    rec.update(obj.get("x") or {})
+    return rec
+
+# ========== STORE ==========
+def _jsonl_rows(path: Path, read_only: bool):
+    """
+    Các dòng JSON của path. Dòng cuối không có "\n" mà không parse được = ghi dở (crash giữa put,
+    hoặc tiến trình khác đang ghi): read_only thì bỏ qua, ghi được thì cắt file về trước dòng đó
+    để lần append sau không nối vào rác. Dòng cuối đủ JSON nhưng mất "\n" -> bổ sung "\n".
+    Dòng hỏng ở giữa file là hỏng dữ liệu thật: read_only bỏ qua, ghi được thì raise.
+    """
+    if not path.exists():
+        return
+    data = path.read_bytes()
+    start = 0
+    while start < len(data):
+        end = data.find(b"\n", start)
+        torn = end == -1
+        end = len(data) if torn else end + 1
+        line = data[start:end]
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                if torn:
+                    if not read_only:
+                        print(f"[STORE] cắt dòng ghi dở cuối {path.name} ({len(line)} bytes)")
+                        with open(path, "r+b") as f:
+                            f.truncate(start)
+                    return
+                if not read_only:
+                    raise ValueError(f"{path}: dòng hỏng ở byte {start}")
+                start = end
+                continue
+            if torn and not read_only:
+                with open(path, "ab") as f:
+                    f.write(b"\n")
+            yield row
+        start = end
+
+class SegmentStore:
+    def __init__(self, root, block_records: int = BLOCK_RECORDS, segment_bytes: int = SEGMENT_BYTES,
+                 read_only: bool = False):
+        self.root = Path(root)
+        self.read_only = read_only
+        if not read_only:
+            self.root.mkdir(parents=True, exist_ok=True)
+        self.block_records = block_records
+        self.segment_bytes = segment_bytes
+
+        manifest = self.root / "store.json"
+        if manifest.exists():
+            info = json.loads(manifest.read_text(encoding="utf-8"))
+        elif read_only:
+            raise FileNotFoundError(f"không có store: {manifest}")
+        else:
+            info = {"version": FORMAT_VERSION, "codec": "zstd" if zstd else "zlib"}
+            manifest.write_text(json.dumps(info), encoding="utf-8")
+        self.codec = _Codec(info["codec"])
+
+        self.keys: List[str] = []
+        self._key_ids: Dict[str, int] = {}
+        kp = self.root / "keys.jsonl"
+        for key in _jsonl_rows(kp, read_only):
+            self._key_ids[key] = len(self.keys)
+            self.keys.append(key)
+
+        # doc_id -> (segment, offset, length, vị trí, ts)
+        self.index: Dict[str, Tuple[int, int, int, int, float]] = {}
+        ip = self.root / "index.jsonl"
+        for doc_id, *loc in _jsonl_rows(ip, read_only):
+            self.index[doc_id] = tuple(loc)
+
+        segs = sorted(self.root.glob("seg-*.z"))
+        self._seg_no = int(segs[-1].stem.split("-")[1]) if segs else 0
+
+        # bản ghi chưa nén: doc_id -> (obj gọn, ts)
+        self._pending: Dict[str, Tuple[dict, float]] = {}
+        tp = self.root / "tail.jsonl"
+        for doc_id, obj, ts in _jsonl_rows(tp, read_only):
+            self._pending[doc_id] = (obj, ts)
+        self._cache: Tuple[Optional[tuple], List[str]] = (None, [])
+
+        if read_only:
+            self._keys_f = self._index_f = self._tail_f = None
+        else:
+            self._keys_f = open(kp, "a", encoding="utf-8")
+            self._index_f = open(ip, "a", encoding="utf-8")
+            self._tail_f = open(tp, "a", encoding="utf-8")
+
+    def _writable(self):
+        if self.read_only:
+            raise PermissionError(f"store mở chỉ đọc: {self.root}")
+
+    # ---------- ghi ----------
+    def _intern(self, key: str) -> int:
+        kid = self._key_ids.get(key)
+        if kid is None:
+            kid = self._key_ids[key] = len(self.keys)
+            self.keys.append(key)
+            self._keys_f.write(json.dumps(key, ensure_ascii=False) + "\n")
+            self._keys_f.flush()
+        return kid
+
+    def put(self, doc_id: str, record: dict):
+        self._writable()
+        obj = encode_record(record, self._intern)
+        ts = round(time.time(), 3)
+        self._pending.pop(doc_id, None)
+        self._pending[doc_id] = (obj, ts)
+        self._tail_f.write(json.dumps([doc_id, obj, ts], ensure_ascii=False, separators=_SEP) + "\n")
+        self._tail_f.flush()
+        if len(self._pending) >= self.block_records:
+            self.flush()
+
+    def flush(self):
+        """Nén các bản ghi đang chờ thành 1 block, ghi index, xóa tail."""
+        if not self._pending:
+            return
+        self._writable()
+        items = list(self._pending.items())
+        payload = "\n".join(json.dumps(obj, ensure_ascii=False, separators=_SEP) for _, (obj, _) in items)
+        block = self.codec.compress(payload.encode("utf-8"))
+        seg = self._segment_path(self._seg_no)
+        if seg.exists() and seg.stat().st_size + len(block) > self.segment_bytes:
+            self._seg_no += 1
+            seg = self._segment_path(self._seg_no)
+        with open(seg, "ab") as f:
+            offset = f.tell()
+            f.write(block)
+        for i, (doc_id, (_, ts)) in enumerate(items):
+            loc = (self._seg_no, offset, len(block), i, ts)
+            self.index[doc_id] = loc
+            self._index_f.write(json.dumps([doc_id, *loc], ensure_ascii=False) + "\n")
+        self._index_f.flush()
+        self._pending.clear()
+        self._tail_f.truncate(0)
+        self._tail_f.seek(0)
+
+    def close(self):
+        if self.read_only:
+            return
+        self.flush()
+        for f in (self._keys_f, self._index_f, self._tail_f):
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- đọc ----------
+    def _segment_path(self, no: int) -> Path:
+        return self.root / f"seg-{no:05d}.z"
+
+    def _read_block(self, seg: int, offset: int, length: int) -> List[str]:
+        key = (seg, offset)
+        if self._cache[0] == key:
+            return self._cache[1]
+        with open(self._segment_path(seg), "rb") as f:
+            f.seek(offset)
+            lines = self.codec.decompress(f.read(length)).decode("utf-8").split("\n")
+        self._cache = (key, lines)
+        return lines
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        if doc_id in self._pending:
+            return decode_record(self._pending[doc_id][0], self.keys)
+        loc = self.index.get(doc_id)
+        if loc is None:
+            return None
+        seg, offset, length, i, _ = loc
+        return decode_record(json.loads(self._read_block(seg, offset, length)[i]), self.keys)
+
+    def saved_at(self, doc_id: str) -> Optional[float]:
+        if doc_id in self._pending:
+            return self._pending[doc_id][1]
+        loc = self.index.get(doc_id)
+        return loc[4] if loc else None
+
+    def __contains__(self, doc_id: str):
+        return doc_id in self._pending or doc_id in self.index
+
+    def ids(self) -> List[str]:
+        return list(self.index.keys() | self._pending.keys())
+
+    def __len__(self):
+        return len(self.index.keys() | self._pending.keys())
+
+    def scan(self) -> Iterator[Tuple[str, dict]]:
+        """Duyệt tuần tự theo thứ tự trên đĩa, mỗi block giải nén 1 lần; chỉ bản mới nhất của mỗi doc_id."""
+        by_block: Dict[tuple, List[Tuple[int, str]]] = {}
+        for doc_id, (seg, offset, length, i, _) in self.index.items():
+            if doc_id not in self._pending:
+                by_block.setdefault((seg, offset, length), []).append((i, doc_id))
+        for (seg, offset, length), members in sorted(by_block.items()):
+            lines = self._read_block(seg, offset, length)
+            for i, doc_id in sorted(members):
+                yield doc_id, decode_record(json.loads(lines[i]), self.keys)
+        for doc_id, (obj, _) in list(self._pending.items()):
+            yield doc_id, decode_record(obj, self.keys)
+
+    def stats(self) -> dict:
+        seg_bytes = sum(p.stat().st_size for p in self.root.glob("seg-*.z"))
+        live = {(s, o, l) for s, o, l, _, _ in self.index.values()}
+        return {
+            "docs": len(self), "pending": len(self._pending), "keys": len(self.keys),
+            "segments": len(list(self.root.glob("seg-*.z"))), "segment_bytes": seg_bytes,
+            "live_block_bytes": sum(l for _, _, l in live), "codec": self.codec.name,
+        }
+
+# ========== IMPORT / EXPORT ==========
+def import_files(src_dir, store: SegmentStore) -> int:
+    n = 0
+    for p in sorted(Path(src_dir).glob("*.json")):
+        try:
+            store.put(p.stem, json.loads(p.read_text(encoding="utf-8")))
+            n += 1
+        except Exception as e:
+            print(f"[WARN] lỗi đọc {p}: {e}")
+    store.flush()
+    return n
+
+def export_files(store: SegmentStore, out_dir) -> int:
+    """Ghi lại layout cũ: <out_dir>/<doc_id>.json, indent=2."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = 0
+    for doc_id, rec in store.scan():
+        (out_dir / f"{doc_id}.json").write_text(json.dumps(rec, ensure_ascii=False, indent=2), encoding="utf-8")
+        n += 1
+    return n
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_imp = sub.add_parser("import")
+    p_imp.add_argument("--src", required=True, help="thư mục docs/*.json")
+    p_imp.add_argument("--store", required=True)
+    p_exp = sub.add_parser("export")
+    p_exp.add_argument("--store", required=True)
+    p_exp.add_argument("--out", required=True)
+    p_get = sub.add_parser("get")
+    p_get.add_argument("--store", required=True)
+    p_get.add_argument("--id", required=True)
+    p_st = sub.add_parser("stats")
+    p_st.add_argument("--store", required=True)
+    args = parser.parse_args()
+
+    with SegmentStore(args.store, read_only=args.cmd != "import") as store:
+        if args.cmd == "import":
+            t0 = time.perf_counter()
+            n = import_files(args.src, store)
+            src_bytes = sum(p.stat().st_size for p in Path(args.src).glob("*.json"))
+            print(f"[DONE] {n} văn bản trong {time.perf_counter() - t0:.2f}s; "
+                  f"{src_bytes} bytes json -> {store.stats()['segment_bytes']} bytes segment")
+        elif args.cmd == "export":
+            print(f"[DONE] ghi {export_files(store, args.out)} file -> {args.out}")
+        elif args.cmd == "get":
+            print(json.dumps(store.get(args.id), ensure_ascii=False, indent=2))
+        else:
+            print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
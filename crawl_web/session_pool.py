@@ -0,0 +1,162 @@
+# session_pool.py
+# Nhiều phiên đăng nhập (storage_state) chạy song song, thay cho 1 phiên + nhấn Enter mỗi lần gặp CAPTCHA.
+#
+# - mỗi file state trong thư mục sessions/ -> 1 context + 1 page riêng (cookie riêng)
+# - acquire() trả phiên khỏe theo vòng tròn; phiên gặp challenge -> quarantine() (cách ly, thời gian tăng gấp đôi
+#   mỗi lần liên tiếp), URL được xếp lại cho phiên khác; quá max_strikes lần liên tiếp thì loại hẳn
+# - mọi phiên đều đang cách ly -> chờ phiên sớm nhất hết hạn, không chặn bằng input()
+# - save_states(): ghi lại cookie mới (cf_clearance...) của các phiên khỏe
+#
+# Tạo phiên (mở Chromium, đăng nhập tay, lưu sessions/<tên>.json):
+#   python session_pool.py add --dir out_luocdo/sessions --name acc1
+#   python session_pool.py list --dir out_luocdo/sessions
+# Dùng: crawler_core.configure(SESSION="pool", ...)
+
+import argparse, asyncio, json, time
+from pathlib import Path
+from typing import List
+
+QUARANTINE_SEC = 600
+MAX_STRIKES = 3
+
+class SessionChallenged(Exception):
+    """Trang đang mở là Cloudflare / CAPTCHA; phiên cần cách ly."""
+
+class Session:
+    def __init__(self, name: str, state_path: Path, context, page):
+        self.name = name
+        self.state_path = state_path
+        self.context = context
+        self.page = page
+        self.busy = False
+        self.strikes = 0                # số lần challenge liên tiếp
+        self.quarantined_until = 0.0
+        self.retired = False
+        self.pages = 0
+        self.challenges = 0
+
+    def available(self, now: float) -> bool:
+        return not self.busy and not self.retired and now >= self.quarantined_until
+
+class SessionPool:
+    def __init__(self, sessions: List[Session], quarantine_sec: float = QUARANTINE_SEC, max_strikes: int = MAX_STRIKES):
+        if not sessions:
+            raise ValueError("không có phiên nào (tạo bằng: python session_pool.py add ...)")
+        self.sessions = sessions
+        self.quarantine_sec = quarantine_sec
+        self.max_strikes = max_strikes
+        self._next = 0
+        self._changed = asyncio.Condition()
+
+    @classmethod
+    async def open(cls, browser, state_dir: Path, quarantine_sec: float = QUARANTINE_SEC,
+                   max_strikes: int = MAX_STRIKES, **context_kw) -> "SessionPool":
+        sessions = []
+        for path in sorted(Path(state_dir).glob("*.json")):
+            context = await browser.new_context(storage_state=str(path), **context_kw)
+            sessions.append(Session(path.stem, path, context, await context.new_page()))
+        print(f"[POOL] mở {len(sessions)} phiên từ {state_dir}")
+        return cls(sessions, quarantine_sec, max_strikes)
+
+    # ---------- cấp phát ----------
+    async def acquire(self) -> Session:
+        async with self._changed:
+            while True:
+                now = time.monotonic()
+                live = [s for s in self.sessions if not s.retired]
+                if not live:
+                    raise RuntimeError("mọi phiên đều bị loại (challenge liên tục), cần tạo phiên mới")
+                for k in range(len(self.sessions)):
+                    s = self.sessions[(self._next + k) % len(self.sessions)]
+                    if s.available(now):
+                        self._next = (self._next + k + 1) % len(self.sessions)
+                        s.busy = True
+                        return s
+                # đang bận hết -> chờ release; đang cách ly hết -> chờ tới lúc phiên sớm nhất hết hạn
+                idle = [s.quarantined_until for s in live if not s.busy]
+                timeout = max(0.1, min(idle) - now) if idle else None
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, s: Session, ok: bool = True):
+        if ok:
+            s.strikes = 0
+            s.pages += 1
+        s.busy = False
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def quarantine(self, s: Session):
+        s.challenges += 1
+        s.strikes += 1
+        if s.strikes >= self.max_strikes:
+            s.retired = True
+            print(f"[POOL] loại phiên {s.name} sau {s.strikes} challenge liên tiếp")
+        else:
+            sec = self.quarantine_sec * 2 ** (s.strikes - 1)
+            s.quarantined_until = time.monotonic() + sec
+            print(f"[POOL] cách ly phiên {s.name} {sec:.0f}s (challenge lần {s.strikes}), "
+                  f"còn {self.healthy()} phiên khỏe")
+        await self.release(s, ok=False)
+
+    def healthy(self) -> int:
+        now = time.monotonic()
+        return sum(1 for s in self.sessions if not s.retired and now >= s.quarantined_until)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    # ---------- lưu / đóng ----------
+    async def save_states(self):
+        for s in self.sessions:
+            if s.strikes == 0 and not s.retired:
+                state = await s.context.storage_state()
+                s.state_path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    async def close(self):
+        await self.save_states()
+        for s in self.sessions:
+            await s.context.close()
+
+    def stats(self) -> dict:
+        return {s.name: {"pages": s.pages, "challenges": s.challenges, "strikes": s.strikes,
+                         "retired": s.retired} for s in self.sessions}
+
+# ========== CLI ==========
+async def add_session(state_dir: Path, name: str, url: str):
+    from playwright.async_api import async_playwright
+    state_dir.mkdir(parents=True, exist_ok=True)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=False)
+        context = await browser.new_context()
+        page = await context.new_page()
+        await page.goto(url)
+        print("[ACTION] Đăng nhập / vượt CAPTCHA trong cửa sổ vừa mở.")
+        await asyncio.get_running_loop().run_in_executor(None, input, "[ACTION] Xong thì nhấn Enter để lưu phiên: ")
+        path = state_dir / f"{name}.json"
+        await context.storage_state(path=str(path))
+        print(f"[OK] Đã lưu phiên {name} vào {path}")
+        await browser.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_add = sub.add_parser("add")
+    p_add.add_argument("--dir", default="out_luocdo/sessions")
+    p_add.add_argument("--name", required=True)
+    p_add.add_argument("--url", default="https://thuvienphapluat.vn")
+    p_list = sub.add_parser("list")
+    p_list.add_argument("--dir", default="out_luocdo/sessions")
+    args = parser.parse_args()
+
+    if args.cmd == "add":
+        asyncio.run(add_session(Path(args.dir), args.name, args.url))
+    else:
+        for path in sorted(Path(args.dir).glob("*.json")):
+            state = json.loads(path.read_text(encoding="utf-8"))
+            expires = [c.get("expires", -1) for c in state.get("cookies", []) if c.get("expires", -1) > 0]
+            left = (min(expires) - time.time()) / 3600 if expires else None
+            print(f"{path.stem}: {len(state.get('cookies', []))} cookie"
+                  + (f", cookie sớm hết hạn nhất còn {left:.1f}h" if left is not None else ""))
@@ -0,0 +1,158 @@
+# shared_frontier.py
+# Frontier dùng chung giữa nhiều tiến trình crawler (coordinator.py), lưu trong SQLite.
+#
+# Cùng interface với frontier.PriorityFrontier (push / pop / len / done / claim_doc) nên
+# vòng lặp trong crawler_core không phải đổi. Khác biệt:
+#   - pop() = cho thuê (lease) URL có điểm cao nhất trong LEASE_SEC giây
+#   - worker chết giữa chừng -> lease hết hạn -> URL tự quay lại hàng đợi
+#   - URL đã "done" không bị thêm lại (dedupe giữa các worker)
+#   - claim_doc(doc_id): giữ chỗ doc_id nguyên tử, 2 worker không cào trùng 1 văn bản
+#
+# Nhiều máy dùng chung 1 thư mục: đặt db trên ổ chia sẻ và dùng shared_fs=True
+# (journal DELETE thay cho WAL vì WAL cần shared memory cục bộ). Khóa file trên
+# NFS/SMB tùy hệ thống, nên để db trên máy chủ có khóa chuẩn POSIX.
+
+import sqlite3, time
+from contextlib import contextmanager
+from typing import List
+
+LEASE_SEC = 300
+MAX_ATTEMPTS = 3            # lease hết hạn quá số lần này -> "failed", không cho thuê nữa
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    score REAL NOT NULL,
+    depth INTEGER NOT NULL DEFAULT 0,
+    relation TEXT NOT NULL DEFAULT 'search',
+    state TEXT NOT NULL DEFAULT 'queued',     -- queued | leased | done | failed
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+-- rowid tăng theo thứ tự thêm -> dùng làm seq (cùng điểm thì vào trước ra trước)
+CREATE INDEX IF NOT EXISTS frontier_pick ON frontier (state, score DESC);
+CREATE INDEX IF NOT EXISTS frontier_lease ON frontier (state, lease_until);
+CREATE TABLE IF NOT EXISTS seen_docs (
+    doc_id TEXT PRIMARY KEY,
+    worker TEXT,
+    ts REAL
+);
+"""
+
+class SQLiteFrontier:
+    durable = True          # mỗi thao tác đã commit, save_checkpoint không cần ghi queue.json
+
+    def __init__(self, db_path: str, worker: str = "w0", lease_sec: float = LEASE_SEC, shared_fs: bool = False):
+        self.worker = worker
+        self.lease_sec = lease_sec
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=%s" % ("DELETE" if shared_fs else "WAL"))
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _tx(self):
+        """Giao dịch tường minh: kết nối autocommit (isolation_level=None) nên `with conn:` không gom gì cả.
+        BEGIN IMMEDIATE lấy khóa ghi ngay, lỗi giữa chừng thì ROLLBACK toàn bộ."""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    # ---------- hàng đợi ----------
+    def push(self, url: str, score: float, depth: int = 0, relation: str = "search", requeue: bool = False) -> bool:
+        """True nếu URL mới. Đã có: nâng điểm nếu còn queued; nếu chính worker này đang thuê thì trả lại hàng đợi;
+        requeue=True (xếp lại URL lỗi từ failed.json) thì cả URL đã done / failed cũng quay lại hàng đợi."""
+        with self._tx():
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO frontier (url, score, depth, relation) VALUES (?, ?, ?, ?)",
+                (url, round(score, 3), depth, relation))
+            if cur.rowcount:
+                return True
+            self.conn.execute(
+                "UPDATE frontier SET score = ? WHERE url = ? AND state = 'queued' AND score < ?",
+                (round(score, 3), url, round(score, 3)))
+            self.conn.execute(
+                "UPDATE frontier SET state = 'queued', score = ?, worker = NULL, lease_until = NULL, "
+                "attempts = attempts + 1 WHERE url = ? AND state = 'leased' AND worker = ?",
+                (round(score, 3), url, self.worker))
+            if requeue:
+                self.conn.execute(
+                    "UPDATE frontier SET state = 'queued', score = ?, worker = NULL, lease_until = NULL, attempts = 0 "
+                    "WHERE url = ? AND state IN ('done', 'failed')", (round(score, 3), url))
+        return False
+
+    def requeue_expired(self) -> int:
+        now = time.time()
+        with self._tx():
+            self.conn.execute(
+                "UPDATE frontier SET state = 'failed' WHERE state = 'leased' AND lease_until < ? AND attempts + 1 >= ?",
+                (now, MAX_ATTEMPTS))
+            cur = self.conn.execute(
+                "UPDATE frontier SET state = 'queued', worker = NULL, lease_until = NULL, attempts = attempts + 1 "
+                "WHERE state = 'leased' AND lease_until < ?", (now,))
+        return cur.rowcount
+
+    def lease(self, n: int = 1) -> List[dict]:
+        self.requeue_expired()
+        # BEGIN IMMEDIATE: giữ khóa ghi giữa SELECT và UPDATE, 2 worker không thuê cùng URL
+        with self._tx():
+            rows = self.conn.execute(
+                "SELECT url, score, depth, relation, rowid FROM frontier WHERE state = 'queued' "
+                "ORDER BY score DESC, rowid LIMIT ?", (n,)).fetchall()
+            until = time.time() + self.lease_sec
+            self.conn.executemany(
+                "UPDATE frontier SET state = 'leased', worker = ?, lease_until = ? WHERE url = ?",
+                [(self.worker, until, r[0]) for r in rows])
+        return [{"url": r[0], "score": r[1], "depth": r[2], "relation": r[3], "seq": r[4]} for r in rows]
+
+    def pop(self) -> dict:
+        got = self.lease(1)
+        if not got:
+            raise IndexError("no queued url (có thể worker khác đang giữ lease)")
+        return got[0]
+
+    def done(self, url: str):
+        with self._tx():
+            self.conn.execute(
+                "UPDATE frontier SET state = 'done', lease_until = NULL WHERE url = ? AND state = 'leased' AND worker = ?",
+                (url, self.worker))
+
+    def claim_doc(self, doc_id: str) -> bool:
+        with self._tx():
+            cur = self.conn.execute("INSERT OR IGNORE INTO seen_docs (doc_id, worker, ts) VALUES (?, ?, ?)",
+                                    (doc_id, self.worker, time.time()))
+        return cur.rowcount == 1
+
+    def mark_seen(self, doc_ids):
+        with self._tx():
+            self.conn.executemany("INSERT OR IGNORE INTO seen_docs (doc_id, worker, ts) VALUES (?, 'import', ?)",
+                                  [(d, time.time()) for d in doc_ids])
+
+    def __len__(self):
+        """Số URL còn việc: đang chờ + đang được thuê (worker khác có thể trả lại)."""
+        row = self.conn.execute("SELECT COUNT(*) FROM frontier WHERE state IN ('queued', 'leased')").fetchone()
+        return row[0]
+
+    def __contains__(self, url: str):
+        return self.conn.execute("SELECT 1 FROM frontier WHERE url = ?", (url,)).fetchone() is not None
+
+    # ---------- thống kê ----------
+    def stats(self) -> dict:
+        out = {s: n for s, n in self.conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state")}
+        out["leased_by"] = {w: n for w, n in self.conn.execute(
+            "SELECT worker, COUNT(*) FROM frontier WHERE state = 'leased' GROUP BY worker")}
+        out["seen_docs"] = self.conn.execute("SELECT COUNT(*) FROM seen_docs").fetchone()[0]
+        return out
+
+    def to_list(self) -> List[dict]:
+        return [{"url": r[0], "score": r[1], "depth": r[2], "relation": r[3], "seq": r[4]}
+                for r in self.conn.execute(
+                    "SELECT url, score, depth, relation, rowid FROM frontier WHERE state IN ('queued', 'leased')")]
+
+    def close(self):
+        self.conn.close()
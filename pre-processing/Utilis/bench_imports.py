@@ -0,0 +1,127 @@
+# bench_imports.py
+# -*- coding: utf-8 -*-
+"""
+Đo thời gian import nguội (cold start) các module Utilis: mỗi lần đo là 1 tiến trình
+python mới chạy "-X importtime -c 'import <module>'", lấy thời gian cumulative của module.
+
+- report: median qua --repeat lần + các module phụ thuộc nặng nhất (self time)
+- module import lỗi (thiếu thư viện, chỉ có trên Windows...) ghi "lỗi" thay vì dừng
+- --check: thoát mã 1 nếu module nào vượt ngân sách trong BUDGET_MS
+  (giữ doc_utils / merge_file nhẹ để worker, dịch vụ import nhanh trên Linux)
+
+Chạy:
+    python bench_imports.py
+    python bench_imports.py --modules doc_utils merge_file --repeat 7 --check
+    python bench_imports.py --out import_times.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# ========= 1. CẤU HÌNH =========
+MODULES = ["doc_utils", "merge_file", "docx_stream", "pdf_extract", "jsonl_index", "corpus_model",
+           "citation_extractor", "dedupe", "risk_scoring", "risk_rules", "version_diff",
+           "embed_index", "hybrid_retrieval", "retrieval_service"]
+# ngân sách cumulative (ms) cho module phải import nhanh
+BUDGET_MS = {"doc_utils": 25.0, "merge_file": 40.0}
+REPEAT = 5
+TOP_DEPS = 5
+
+
+# ========= 2. ĐO =========
+def parse_importtime(stderr: str):
+    """Dòng 'import time: self [us] | cumulative | tên' -> list[(tên, self_us, cum_us)]."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue        # dòng tiêu đề
+        rows.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return rows
+
+
+def import_once(module: str):
+    """1 tiến trình mới -> (cumulative_us, rows) hoặc (None, dòng lỗi cuối)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=HERE, capture_output=True, text=True, encoding="utf-8")
+    if proc.returncode != 0:
+        lines = [l for l in proc.stderr.splitlines() if l and not l.startswith("import time:")]
+        return None, lines[-1] if lines else f"exit {proc.returncode}"
+    rows = parse_importtime(proc.stderr)
+    cum = next((c for name, _, c in rows if name == module), None)
+    return cum, rows
+
+
+def bench(modules=None, repeat: int = REPEAT) -> dict:
+    results = {}
+    for module in modules or MODULES:
+        times, rows, error = [], [], None
+        for _ in range(repeat):
+            cum, out = import_once(module)
+            if cum is None:
+                error = out
+                break
+            times.append(cum)
+            rows = out
+        if error is not None:
+            results[module] = {"error": error}
+            continue
+        deps = sorted((r for r in rows if r[0] != module), key=lambda r: -r[1])[:TOP_DEPS]
+        results[module] = {
+            "median_ms": round(statistics.median(times) / 1000, 2),
+            "min_ms": round(min(times) / 1000, 2),
+            "modules_loaded": len(rows),
+            "heaviest": [{"module": n, "self_ms": round(s / 1000, 2)} for n, s, _ in deps],
+        }
+    return results
+
+
+def over_budget(results: dict, budget=None):
+    budget = BUDGET_MS if budget is None else budget
+    bad = []
+    for module, limit in budget.items():
+        r = results.get(module)
+        if r is None:
+            continue
+        if "error" in r or r["median_ms"] > limit:
+            bad.append((module, r.get("median_ms"), limit))
+    return bad
+
+
+# ========= 3. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=None, help=f"mặc định: {' '.join(MODULES)}")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--out", default=None, help="ghi kết quả JSON")
+    parser.add_argument("--check", action="store_true", help="thoát mã 1 nếu vượt BUDGET_MS")
+    args = parser.parse_args()
+
+    res = bench(args.modules, args.repeat)
+    print(f"{'module':<20}{'median ms':>10}{'min ms':>10}{'#mod':>6}  nặng nhất")
+    for module, r in res.items():
+        if "error" in r:
+            print(f"{module:<20}{'lỗi':>10}  {r['error']}")
+            continue
+        heavy = ", ".join(f"{d['module']} {d['self_ms']}" for d in r["heaviest"][:3])
+        print(f"{module:<20}{r['median_ms']:>10}{r['min_ms']:>10}{r['modules_loaded']:>6}  {heavy}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "repeat": args.repeat, "results": res},
+                      f, ensure_ascii=False, indent=2)
+        print(f"[OK] ghi {args.out}")
+
+    if args.check:
+        bad = over_budget(res)
+        for module, ms, limit in bad:
+            print(f"[FAIL] {module}: {ms if ms is not None else 'lỗi'} ms > ngân sách {limit} ms")
+        sys.exit(1 if bad else 0)
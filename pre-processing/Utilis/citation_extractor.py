@@ -0,0 +1,332 @@
+# citation_extractor.py
+# -*- coding: utf-8 -*-
+"""
+Trích xuất trích dẫn pháp lý trong hợp đồng ("Nghị định 15/2021/NĐ-CP",
+"Điều 5 Luật Đất đai", ...) và ánh xạ về chunk id của corpus do
+merge_file.build_chunks tạo ra.
+
+- Số hiệu + biến thể chuẩn hóa (normalize_doc_id) + tên Luật được biên dịch
+  thành 1 automaton Aho-Corasick => quét mỗi hợp đồng đúng 1 lượt, O(n).
+- "Điều N" / "Khoản K Điều N" bắt bằng regex rồi gắn vào trích dẫn văn bản
+  đứng ngay sau nó.
+- Hợp đồng được xử lý dạng stream, ghi kết quả ra JSONL từng dòng.
+"""
+
+import os
+import re
+import json
+import argparse
+import unicodedata
+from collections import deque
+from glob import glob
+
+from doc_utils import normalize_doc_id
+
+# ========= 1. CẤU HÌNH =========
+# khoảng cách tối đa (ký tự) giữa "Điều N" và tên văn bản đứng sau nó
+ARTICLE_LINK_WINDOW = 60
+# chỉ tạo alias theo tên cho các loại văn bản này (Luật Đất đai, Bộ luật Dân sự...)
+TITLE_ALIAS_TYPES = ("Luật", "Bộ luật")
+
+# ký tự tương đương khi quét (giữ nguyên độ dài chuỗi)
+_SCAN_TABLE = str.maketrans({"–": "-", "—": "-", "Ð": "Đ"})
+_DIEU_HEADING_RE = re.compile(r"^Điều\s+(\d+)", re.IGNORECASE)
+_ARTICLE_RE = re.compile(r"(?:KHOẢN\s+(\d+)\s*,?\s*(?:CỦA\s+|TẠI\s+)?)?ĐIỀU\s+(\d+)")
+_YEAR_TAIL_RE = re.compile(r"\s+(?:NĂM\s+)?\d{4}$")
+
+
+def _prepare_text(text: str) -> str:
+    """NFC + in hoa + thay ký tự tương đương. Offset trả về tính trên chuỗi này."""
+    text = unicodedata.normalize("NFC", text)
+    upper = text.upper()
+    if len(upper) != len(text):
+        # có ký tự in hoa thành nhiều ký tự (ﬁ, ß... hay gặp trong text pypdf) -> in hoa từng ký tự,
+        # ký tự đó giữ nguyên để offset không lệch, phần còn lại vẫn so khớp được
+        upper = "".join(u if len(u) == 1 else c for c, u in ((c, c.upper()) for c in text))
+    return upper.translate(_SCAN_TABLE)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+# ========= 2. AHO-CORASICK =========
+class AhoCorasick:
+    """
+    Automaton nhiều mẫu. add() hết mẫu rồi build() một lần,
+    sau đó iter_matches() chạy tuyến tính theo độ dài văn bản.
+    """
+
+    def __init__(self):
+        self.goto = [{}]        # node -> {ký tự: node}
+        self.fail = [0]
+        self.out = [-1]         # node -> id mẫu kết thúc tại node (-1 nếu không)
+        self.out_link = [0]     # node -> node gần nhất trên chuỗi fail có out
+        self.lengths = []
+
+    def add(self, pattern: str) -> int:
+        node = 0
+        for ch in pattern:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append(-1)
+                self.out_link.append(0)
+            node = nxt
+        if self.out[node] == -1:
+            self.out[node] = len(self.lengths)
+            self.lengths.append(len(pattern))
+        return self.out[node]
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(ch, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                fn = self.fail[nxt]
+                self.out_link[nxt] = fn if self.out[fn] != -1 else self.out_link[fn]
+
+    def iter_matches(self, text: str):
+        """Sinh (start, end, pattern_id) cho mọi lần xuất hiện."""
+        goto, fail, out, out_link, lengths = self.goto, self.fail, self.out, self.out_link, self.lengths
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            m = node if out[node] != -1 else out_link[node]
+            while m:
+                pid = out[m]
+                yield i + 1 - lengths[pid], i + 1, pid
+                m = out_link[m]
+
+
+# ========= 3. CHỈ MỤC CORPUS =========
+def symbol_variants(symbol: str):
+    """Các cách viết hay gặp của cùng 1 Số hiệu (đã in hoa)."""
+    base = normalize_doc_id(symbol, "").translate(_SCAN_TABLE)
+    if not base:
+        return []
+    variants = {base, base.replace(" ", "")}
+    variants |= {v.replace("Đ", "D") for v in list(variants)}
+    if re.match(r"0\d", base):
+        variants |= {v[1:] for v in list(variants)}
+    return [v for v in variants if len(v) >= 4]
+
+
+def title_aliases(title: str):
+    """'Luật Đất đai 2024' -> ['LUẬT ĐẤT ĐAI 2024', 'LUẬT ĐẤT ĐAI NĂM 2024', 'LUẬT ĐẤT ĐAI']"""
+    t = _prepare_text(" ".join(title.split()))
+    aliases = {t}
+    m = _YEAR_TAIL_RE.search(t)
+    if m:
+        head = t[:m.start()]
+        year = m.group(0).split()[-1]
+        aliases |= {head, f"{head} {year}", f"{head} NĂM {year}"}
+    return [a for a in aliases if len(a.split()) >= 2]
+
+
+class CitationIndex:
+    """
+    Tóm tắt corpus đủ để tra cứu trích dẫn:
+    - doc_id -> số chunk, map 'Điều N' -> chunk_index
+    - automaton trên Số hiệu / alias -> danh sách doc_id
+    Chunk id luôn có dạng f"{doc_id}:{chunk_index}" (xem build_chunks).
+    """
+
+    def __init__(self):
+        self.n_chunks = {}          # doc_id -> số chunk
+        self.articles = {}          # doc_id -> {số điều: [chunk_index]}
+        self.doc_info = {}          # doc_id -> (symbol, title, issued_date)
+        self.pattern_docs = []      # pattern_id -> [doc_id]
+        self.automaton = AhoCorasick()
+
+    @classmethod
+    def from_jsonl(cls, corpus_path: str):
+        """Đọc stream chunks_with_meta.jsonl 1 lượt rồi biên dịch automaton."""
+        idx = cls()
+        with open(corpus_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                idx.add_chunk(json.loads(line))
+        idx.build()
+        return idx
+
+    def add_chunk(self, rec: dict):
+        doc_id = rec["doc_id"]
+        ci = rec.get("chunk_index", 0)
+        self.n_chunks[doc_id] = max(self.n_chunks.get(doc_id, 0), ci + 1)
+        m = _DIEU_HEADING_RE.match(rec.get("section_title") or "")
+        if m:
+            self.articles.setdefault(doc_id, {}).setdefault(int(m.group(1)), []).append(ci)
+        if doc_id not in self.doc_info:
+            self.doc_info[doc_id] = (rec.get("symbol"), rec.get("title"), rec.get("issued_date"))
+
+    def build(self):
+        patterns = {}
+        for doc_id, (symbol, title, _) in self.doc_info.items():
+            keys = symbol_variants(symbol or "")
+            if title and (self._doc_type_of(title) in TITLE_ALIAS_TYPES):
+                keys += title_aliases(title)
+            for k in keys:
+                patterns.setdefault(k, []).append(doc_id)
+        for pattern, docs in patterns.items():
+            pid = self.automaton.add(pattern)
+            while len(self.pattern_docs) <= pid:
+                self.pattern_docs.append([])
+            # alias mơ hồ (vd 'Luật Đất đai') -> ưu tiên văn bản mới nhất
+            self.pattern_docs[pid] = sorted(set(docs), key=self._issued_key, reverse=True)
+        self.automaton.build()
+        print(f"[INFO] citation index: {len(self.n_chunks)} văn bản, {len(patterns)} mẫu")
+
+    @staticmethod
+    def _doc_type_of(title: str) -> str:
+        for t in sorted(TITLE_ALIAS_TYPES, key=len, reverse=True):
+            if title.lower().startswith(t.lower() + " "):
+                return t
+        return ""
+
+    def _issued_key(self, doc_id: str):
+        d = self.doc_info.get(doc_id, (None, None, None))[2] or ""
+        m = re.match(r"(\d{2})/(\d{2})/(\d{4})", d)
+        return (m.group(3), m.group(2), m.group(1)) if m else ("", "", "")
+
+    def chunk_ids(self, doc_id: str, article: int = None):
+        if article is None:
+            return [f"{doc_id}:{i}" for i in range(self.n_chunks.get(doc_id, 0))]
+        return [f"{doc_id}:{i}" for i in self.articles.get(doc_id, {}).get(article, [])]
+
+
+# ========= 4. TRÍCH XUẤT =========
+def _doc_matches(index: CitationIndex, text: str):
+    """Match Số hiệu/alias, giữ ranh giới từ và chỉ lấy match dài nhất bên trái."""
+    found = []
+    n = len(text)
+    for start, end, pid in index.automaton.iter_matches(text):
+        if start > 0 and _is_word_char(text[start - 1]):
+            continue
+        if end < n and (_is_word_char(text[end]) or text[end] in "/-"):
+            continue
+        found.append((start, end, pid))
+    found.sort(key=lambda x: (x[0], -(x[1] - x[0])))
+    out, last_end = [], -1
+    for start, end, pid in found:
+        if start >= last_end:
+            out.append((start, end, pid))
+            last_end = end
+    return out
+
+
+def extract_citations(index: CitationIndex, text: str):
+    """
+    Trả list[dict] trích dẫn trong 1 văn bản hợp đồng:
+    {doc_id, candidates, article, clause, chunk_ids, start, end, match}
+    Offset tính trên văn bản đã NFC-normalize.
+    "Điều 5 và Điều 6 Luật X" -> 2 trích dẫn (Điều 5, Điều 6) cùng trỏ Luật X.
+    """
+    scan = _prepare_text(text)
+    doc_hits = _doc_matches(index, scan)
+    starts = [h[0] for h in doc_hits]
+
+    # gắn "Khoản K Điều N" vào trích dẫn văn bản đứng ngay sau (nhiều điều có thể cùng trỏ 1 văn bản)
+    article_of = {}
+    for m in _ARTICLE_RE.finditer(scan):
+        lo, hi = 0, len(starts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if starts[mid] < m.end():
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(starts) and starts[lo] - m.end() <= ARTICLE_LINK_WINDOW:
+            gap = scan[m.end():starts[lo]]
+            if "." not in gap and "\n" not in gap:
+                article_of.setdefault(lo, []).append((m.start(), int(m.group(2)), m.group(1)))
+
+    results = []
+    for i, (start, end, pid) in enumerate(doc_hits):
+        docs = index.pattern_docs[pid]
+        doc_id = docs[0]
+        for art in article_of.get(i) or [None]:
+            article = art[1] if art else None
+            clause = int(art[2]) if art and art[2] else None
+            cstart = art[0] if art else start
+            results.append({
+                "doc_id": doc_id,
+                "candidates": docs,
+                "article": article,
+                "clause": clause,
+                "chunk_ids": index.chunk_ids(doc_id, article) if article else [f"{doc_id}:0"],
+                "start": cstart,
+                "end": end,
+                "match": text[cstart:end] if len(text) == len(scan) else scan[cstart:end],
+            })
+    return results
+
+
+def iter_contract_texts(paths):
+    """Stream (path, text) cho .txt / .doc / .docx, bỏ qua file lỗi."""
+    load_doc_text = None
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        try:
+            if ext == ".txt":
+                with open(path, "r", encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            else:
+                if load_doc_text is None:
+                    from merge_file import load_doc_text
+                text = load_doc_text(path)
+        except Exception as e:
+            print(f"[WARN] lỗi đọc {path}: {e}")
+            continue
+        yield path, text
+
+
+def extract_batch(index: CitationIndex, contracts):
+    """contracts: iterable (contract_id, text) -> sinh (contract_id, citations)."""
+    for contract_id, text in contracts:
+        yield contract_id, extract_citations(index, text)
+
+
+def collect_contract_paths(inputs):
+    paths = []
+    for p in inputs:
+        if os.path.isdir(p):
+            for ext in ("*.txt", "*.doc", "*.docx"):
+                paths += glob(os.path.join(p, "**", ext), recursive=True)
+        else:
+            paths.append(p)
+    return sorted(paths)
+
+
+# ========= 5. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", required=True, help="chunks_with_meta.jsonl")
+    parser.add_argument("--contracts", nargs="+", required=True, help="file hoặc thư mục hợp đồng")
+    parser.add_argument("--out", required=True, help="file jsonl kết quả")
+    args = parser.parse_args()
+
+    index = CitationIndex.from_jsonl(args.corpus)
+    paths = collect_contract_paths(args.contracts)
+    print(f"[INFO] {len(paths)} hợp đồng cần quét")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    total = 0
+    with open(args.out, "w", encoding="utf-8") as fout:
+        for path, cites in extract_batch(index, iter_contract_texts(paths)):
+            fout.write(json.dumps({"contract": path, "citations": cites}, ensure_ascii=False) + "\n")
+            total += len(cites)
+    print(f"[DONE] {total} trích dẫn -> {args.out}")
@@ -0,0 +1,426 @@
+# corpus_model.py
+# -*- coding: utf-8 -*-
+"""
+Mô hình corpus dạng cột, gọn trong RAM, thay cho list dict chunk / meta.
+
+Dict chunk lặp lại nguyên meta tiếng Việt cho từng chunk (và cả relations_sections),
+ngày là chuỗi "06/02/2025", placeholder "Đã biết" / "Dữ liệu đang cập nhật" lẫn trong dữ
+liệu. Ở đây parse 1 lần lúc nạp:
+- cột số (numpy): ngày -> int yyyymmdd (0 = không có), categorical -> mã int32
+  (0 = không có), 1 hàng/văn bản cho meta, 1 hàng/chunk chỉ giữ doc_row + chunk_index
+- Categorical: intern chuỗi (loại văn bản, tình trạng, nơi ban hành, lĩnh vực, người ký)
+- text chunk: 1 buffer UTF-8 + mảng offset, chỉ decode khi truy cập
+- số link theo từng loại quan hệ (replaceDocument, amendDocument...) thay cho list link
+- lọc vector hóa: corpus.where(doc_type="Nghị định", status="Còn hiệu lực",
+  date_from=20200101, issuer="Chính phủ") -> mảng chỉ số chunk
+- save()/open(): lưu thư mục .npy, mở lại bằng mmap (không parse JSON lần nữa)
+
+Chạy:
+    python corpus_model.py stats --corpus chunks_with_meta.jsonl --compare
+    python corpus_model.py save --corpus chunks_with_meta.jsonl --out corpus_cols
+    python corpus_model.py query --cols corpus_cols --doc-type "Nghị định" --date-from 20200101
+"""
+
+import os
+import json
+import time
+import argparse
+import tracemalloc
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from doc_utils import date_to_int, normalize_doc_id
+
+# ========= 1. CẤU HÌNH =========
+# giá trị "không có dữ liệu" trên thuvienphapluat.vn
+NULL_VALUES = {"", "Đã biết", "Dữ liệu đang cập nhật", "Đang cập nhật", "Không có", "..."}
+
+# trường chunk (merge_file.build_chunks) <- các tên meta có thể gặp
+CATEGORICAL_FIELDS = ("doc_type", "status", "issued_by", "field", "signer")
+DATE_FIELDS = ("issued_date", "effective_date", "published_date")
+META_ALIASES = {
+    "title": ("Tiêu đề", "Tieu de"),
+    "symbol": ("Số hiệu", "So hieu"),
+    "doc_type": ("Loại văn bản", "Loai van ban"),
+    "field": ("Lĩnh vực, ngành", "Linh vuc, nganh"),
+    "issued_by": ("Nơi ban hành", "Noi ban hanh"),
+    "signer": ("Người ký", "Nguoi ky"),
+    "issued_date": ("Ngày ban hành", "Ngay ban hanh"),
+    "effective_date": ("Ngày hiệu lực", "Ngay hieu luc"),
+    "published_date": ("Ngày đăng", "Ngay dang"),
+    "status": ("Tình trạng", "Tinh trang"),
+}
+RELATIONS = ("replaceDocument", "replacedDocument", "amendDocument", "amendedDocument",
+             "HopNhatDocument", "DuocHopNhatDocument", "guideDocument", "guidedDocument",
+             "correctingDocument", "correctedDocument", "basisDocument", "referentialDocument")
+_REL_COL = {r: i for i, r in enumerate(RELATIONS)}
+
+
+def clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    s = str(value).strip()
+    return None if s in NULL_VALUES else s
+
+
+def meta_to_fields(meta: dict) -> dict:
+    """meta tiếng Việt (crawler) -> tên trường của chunk."""
+    out = {}
+    for name, keys in META_ALIASES.items():
+        for k in keys:
+            if meta.get(k):
+                out[name] = meta[k]
+                break
+    return out
+
+
+# ========= 2. CATEGORICAL =========
+class Categorical:
+    """Intern chuỗi -> mã int; mã 0 = không có (None / placeholder)."""
+    __slots__ = ("values", "_code")
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[Optional[str]] = [None]
+        self._code: Dict[str, int] = {}
+        for v in values:
+            self.code(v)
+
+    def code(self, value) -> int:
+        v = clean(value)
+        if v is None:
+            return 0
+        c = self._code.get(v)
+        if c is None:
+            c = self._code[v] = len(self.values)
+            self.values.append(v)
+        return c
+
+    def lookup(self, value) -> int:
+        """Mã của giá trị đã có, -1 nếu chưa gặp (để lọc, không thêm mới)."""
+        v = clean(value)
+        return 0 if v is None else self._code.get(v, -1)
+
+    def codes_matching(self, needle: str) -> List[int]:
+        """Mã của mọi giá trị chứa needle (không phân biệt hoa thường), vd 'còn hiệu lực'."""
+        n = needle.lower()
+        return [i for i, v in enumerate(self.values) if v and n in v.lower()]
+
+    def __getitem__(self, code: int) -> Optional[str]:
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+
+# ========= 3. BẢNG =========
+class Chunk:
+    """1 hàng đọc từ CorpusTable (tạo khi truy cập, không lưu sẵn)."""
+    __slots__ = ("id", "doc_id", "chunk_index", "section_title", "text", "symbol", "title",
+                 "doc_type", "status", "issued_by", "field", "signer",
+                 "issued_date", "effective_date", "published_date", "source_url")
+
+    def __init__(self, **kw):
+        for k in self.__slots__:
+            setattr(self, k, kw.get(k))
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):
+        return f"Chunk({self.id!r}, {self.section_title!r})"
+
+
+class CorpusTable:
+    """
+    Bảng văn bản (docs) + bảng chunk. Cột văn bản:
+      doc_ids / symbol / title / source_url   list str (1 phần tử / văn bản)
+      <categorical>      int32[D]   mã trong self.cats[<tên>] (signer / issued_by có thể vượt 32767 giá trị)
+      <date>             int32[D]   yyyymmdd, 0 = không có
+      rel_counts         int16[D, len(RELATIONS)]
+    Cột chunk: doc_row int32[N], chunk_index int32[N], title_off/text_off int64[N+1] vào buffer UTF-8.
+    """
+
+    def __init__(self):
+        self.cats = {name: Categorical() for name in CATEGORICAL_FIELDS}
+        self.doc_ids: List[str] = []
+        self.symbol: List[Optional[str]] = []
+        self.title: List[Optional[str]] = []
+        self.source_url: List[Optional[str]] = []
+        self._doc_row: Dict[str, int] = {}
+        self._doc_cols = {name: array("i") for name in CATEGORICAL_FIELDS + DATE_FIELDS}
+        self._rel = array("h")
+        self._chunk_doc = array("i")
+        self._chunk_index = array("i")
+        self._title_off = array("q", [0])
+        self._text_off = array("q", [0])
+        self._titles = bytearray()
+        self._texts = bytearray()
+        self.with_text = True
+
+    # ---------- nạp ----------
+    def add_doc(self, doc_id: str, fields: dict, relations_sections: dict = None) -> int:
+        row = self._doc_row.get(doc_id)
+        if row is not None:
+            return row
+        row = self._doc_row[doc_id] = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.symbol.append(clean(fields.get("symbol")))
+        self.title.append(clean(fields.get("title")))
+        self.source_url.append(fields.get("source_url"))
+        for name in CATEGORICAL_FIELDS:
+            self._doc_cols[name].append(self.cats[name].code(fields.get(name)))
+        for name in DATE_FIELDS:
+            self._doc_cols[name].append(date_to_int(fields.get(name)))
+        counts = [0] * len(RELATIONS)
+        for key, links in (relations_sections or {}).items():
+            col = _REL_COL.get(key.split("|", 1)[0].strip())
+            if col is not None:
+                counts[col] = min(len(links or ()), 32767)
+        self._rel.extend(counts)
+        return row
+
+    def add_chunk(self, rec: dict):
+        row = self.add_doc(rec["doc_id"], rec, rec.get("relations_sections"))
+        self._chunk_doc.append(row)
+        self._chunk_index.append(int(rec.get("chunk_index") or 0))
+        if self.with_text:
+            self._titles += (rec.get("section_title") or "").encode("utf-8")
+            self._texts += (rec.get("text") or "").encode("utf-8")
+        self._title_off.append(len(self._titles))
+        self._text_off.append(len(self._texts))
+
+    def freeze(self) -> "CorpusTable":
+        """array.array -> numpy (gọi 1 lần sau khi nạp xong)."""
+        self.docs = {name: np.frombuffer(col, dtype=np.int32) for name, col in self._doc_cols.items()}
+        self.rel_counts = np.frombuffer(self._rel, dtype=np.int16).reshape(-1, len(RELATIONS))
+        self.chunk_doc = np.frombuffer(self._chunk_doc, dtype=np.int32)
+        self.chunk_index = np.frombuffer(self._chunk_index, dtype=np.int32)
+        self.title_off = np.frombuffer(self._title_off, dtype=np.int64)
+        self.text_off = np.frombuffer(self._text_off, dtype=np.int64)
+        self.titles = bytes(self._titles)
+        self.texts = bytes(self._texts)
+        del self._doc_cols, self._rel, self._chunk_doc, self._chunk_index
+        del self._title_off, self._text_off, self._titles, self._texts
+        return self
+
+    # ---------- truy cập ----------
+    def __len__(self):
+        return len(self.chunk_doc)
+
+    def n_docs(self) -> int:
+        return len(self.doc_ids)
+
+    def doc_row(self, doc_id: str) -> Optional[int]:
+        return self._doc_row.get(doc_id)
+
+    def column(self, name: str) -> np.ndarray:
+        """Cột văn bản trải ra theo chunk (vd column('issued_date')[i] = ngày ban hành của chunk i)."""
+        return self.docs[name][self.chunk_doc]
+
+    def text(self, i: int) -> str:
+        return self.texts[self.text_off[i]:self.text_off[i + 1]].decode("utf-8")
+
+    def section_title(self, i: int) -> str:
+        return self.titles[self.title_off[i]:self.title_off[i + 1]].decode("utf-8")
+
+    def __getitem__(self, i: int) -> Chunk:
+        d = int(self.chunk_doc[i])
+        doc_id = self.doc_ids[d]
+        kw = {name: self.cats[name][int(self.docs[name][d])] for name in CATEGORICAL_FIELDS}
+        kw.update({name: int(self.docs[name][d]) or None for name in DATE_FIELDS})
+        return Chunk(id=f"{doc_id}:{int(self.chunk_index[i])}", doc_id=doc_id,
+                     chunk_index=int(self.chunk_index[i]), section_title=self.section_title(i),
+                     text=self.text(i) if self.with_text else None, symbol=self.symbol[d],
+                     title=self.title[d], source_url=self.source_url[d], **kw)
+
+    # ---------- lọc vector hóa ----------
+    def doc_mask(self, doc_type=None, status=None, issuer=None, field=None,
+                 date_from: int = None, date_to: int = None, date_field: str = "issued_date",
+                 has_relation: str = None) -> np.ndarray:
+        """
+        Mask theo văn bản. doc_type / issuer: giá trị chính xác (str hoặc list);
+        status / field: chuỗi con ('hết hiệu lực', 'Đất đai'); date_*: yyyymmdd;
+        has_relation: tên quan hệ, vd 'replaceDocument' (đã có văn bản thay thế).
+        """
+        mask = np.ones(self.n_docs(), dtype=bool)
+
+        def exact(name, values):
+            codes = [self.cats[name].lookup(v) for v in ([values] if isinstance(values, str) else values)]
+            return np.isin(self.docs[name], codes)
+
+        def contains(name, needle):
+            return np.isin(self.docs[name], self.cats[name].codes_matching(needle))
+
+        if doc_type:
+            mask &= exact("doc_type", doc_type)
+        if issuer:
+            mask &= exact("issued_by", issuer)
+        if status:
+            mask &= contains("status", status)
+        if field:
+            mask &= contains("field", field)
+        if date_from or date_to:
+            dates = self.docs[date_field]
+            mask &= dates > 0
+            if date_from:
+                mask &= dates >= date_from
+            if date_to:
+                mask &= dates <= date_to
+        if has_relation:
+            mask &= self.rel_counts[:, _REL_COL[has_relation]] > 0
+        return mask
+
+    def where(self, **filters) -> np.ndarray:
+        """Chỉ số các chunk thỏa điều kiện (xem doc_mask)."""
+        return np.flatnonzero(self.doc_mask(**filters)[self.chunk_doc])
+
+    # ---------- lưu / mở ----------
+    def save(self, out_dir: str):
+        os.makedirs(out_dir, exist_ok=True)
+        save = lambda name, arr: np.save(os.path.join(out_dir, name + ".npy"), arr)
+        for name, col in self.docs.items():
+            save("doc_" + name, col)
+        save("rel_counts", self.rel_counts)
+        save("chunk_doc", self.chunk_doc)
+        save("chunk_index", self.chunk_index)
+        save("title_off", self.title_off)
+        save("text_off", self.text_off)
+        with open(os.path.join(out_dir, "titles.bin"), "wb") as f:
+            f.write(self.titles)
+        with open(os.path.join(out_dir, "texts.bin"), "wb") as f:
+            f.write(self.texts)
+        with open(os.path.join(out_dir, "docs.json"), "w", encoding="utf-8") as f:
+            json.dump({"doc_ids": self.doc_ids, "symbol": self.symbol, "title": self.title,
+                       "source_url": self.source_url, "with_text": self.with_text,
+                       "relations": list(RELATIONS),
+                       "cats": {n: c.values[1:] for n, c in self.cats.items()}}, f, ensure_ascii=False)
+
+    @classmethod
+    def open(cls, cols_dir: str) -> "CorpusTable":
+        t = cls.__new__(cls)
+        with open(os.path.join(cols_dir, "docs.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        load = lambda name: np.load(os.path.join(cols_dir, name + ".npy"), mmap_mode="r")
+        t.cats = {n: Categorical(vals) for n, vals in info["cats"].items()}
+        t.doc_ids, t.symbol, t.title, t.source_url = info["doc_ids"], info["symbol"], info["title"], info["source_url"]
+        t._doc_row = {d: i for i, d in enumerate(t.doc_ids)}
+        t.with_text = info["with_text"]
+        t.docs = {n: load("doc_" + n) for n in CATEGORICAL_FIELDS + DATE_FIELDS}
+        t.rel_counts = load("rel_counts")
+        t.chunk_doc = load("chunk_doc")
+        t.chunk_index = load("chunk_index")
+        t.title_off = load("title_off")
+        t.text_off = load("text_off")
+        mm = lambda name: np.memmap(os.path.join(cols_dir, name), dtype=np.uint8, mode="r") \
+            if os.path.getsize(os.path.join(cols_dir, name)) else b""
+        t.titles, t.texts = _Bytes(mm("titles.bin")), _Bytes(mm("texts.bin"))
+        return t
+
+    def nbytes(self) -> int:
+        arrays = list(self.docs.values()) + [self.rel_counts, self.chunk_doc, self.chunk_index,
+                                              self.title_off, self.text_off]
+        return sum(a.nbytes for a in arrays) + len(self.titles) + len(self.texts)
+
+
+class _Bytes:
+    """memmap uint8 -> cắt ra bytes như buffer trong RAM."""
+    __slots__ = ("buf",)
+
+    def __init__(self, buf):
+        self.buf = buf
+
+    def __getitem__(self, sl):
+        return bytes(self.buf[sl])
+
+    def __len__(self):
+        return len(self.buf)
+
+
+# ========= 4. NẠP =========
+def load_chunks(corpus_path: str, with_text: bool = True) -> CorpusTable:
+    """chunks_with_meta.jsonl (hoặc bản _clean) -> CorpusTable, 1 lượt đọc."""
+    t = CorpusTable()
+    t.with_text = with_text
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                t.add_chunk(json.loads(line))
+    return t.freeze()
+
+
+def load_docs(json_dirs: Iterable[str]) -> CorpusTable:
+    """Chỉ metadata: các thư mục json của crawler (out_luocdo/raw/<member>/json, jsons/<loại>)."""
+    t = CorpusTable()
+    t.with_text = False
+    for d in json_dirs:
+        for name in sorted(os.listdir(d)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(d, name), "r", encoding="utf-8") as f:
+                rec = json.load(f)
+            fields = meta_to_fields(rec.get("meta") or {})
+            fields["source_url"] = rec.get("source_url")
+            t.add_doc(normalize_doc_id(fields.get("symbol"), name[:-5]), fields, rec.get("relations_sections"))
+    return t.freeze()
+
+
+# ========= 5. CHẠY =========
+def _stats(corpus_path: str, compare: bool):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    table = load_chunks(corpus_path)
+    load_sec = time.perf_counter() - t0
+    cur, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"[INFO] {len(table)} chunk / {table.n_docs()} văn bản, nạp {load_sec:.2f}s, "
+          f"cột {table.nbytes() / 1e6:.1f} MB, tổng Python {cur / 1e6:.1f} MB")
+    for name in CATEGORICAL_FIELDS:
+        print(f"  {name}: {len(table.cats[name]) - 1} giá trị")
+    for name in DATE_FIELDS:
+        print(f"  {name}: {(table.docs[name] == 0).sum()} / {table.n_docs()} văn bản không có ngày")
+    if compare:
+        tracemalloc.start()
+        with open(corpus_path, "r", encoding="utf-8") as f:
+            dicts = [json.loads(line) for line in f if line.strip()]
+        cur_d, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"[INFO] list dict: {cur_d / 1e6:.1f} MB ({len(dicts)} dòng) -> cột dùng {cur / max(cur_d, 1):.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_stats = sub.add_parser("stats")
+    p_stats.add_argument("--corpus", required=True)
+    p_stats.add_argument("--compare", action="store_true", help="đo thêm list dict để so")
+    p_save = sub.add_parser("save")
+    p_save.add_argument("--corpus", required=True)
+    p_save.add_argument("--out", required=True)
+    p_save.add_argument("--no-text", action="store_true")
+    p_query = sub.add_parser("query")
+    p_query.add_argument("--cols", required=True)
+    p_query.add_argument("--doc-type", default=None)
+    p_query.add_argument("--status", default=None)
+    p_query.add_argument("--issuer", default=None)
+    p_query.add_argument("--field", default=None)
+    p_query.add_argument("--date-from", type=int, default=None)
+    p_query.add_argument("--date-to", type=int, default=None)
+    p_query.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.cmd == "stats":
+        _stats(args.corpus, args.compare)
+    elif args.cmd == "save":
+        load_chunks(args.corpus, with_text=not args.no_text).save(args.out)
+        print(f"[DONE] -> {args.out}")
+    else:
+        table = CorpusTable.open(args.cols)
+        rows = table.where(doc_type=args.doc_type, status=args.status, issuer=args.issuer,
+                           field=args.field, date_from=args.date_from, date_to=args.date_to)
+        print(f"[INFO] {len(rows)} chunk")
+        for i in rows[:args.limit]:
+            c = table[int(i)]
+            print(f"{c.id}\t{c.doc_type}\t{c.issued_date}\t{c.section_title[:60]}")
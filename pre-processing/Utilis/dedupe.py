@@ -0,0 +1,330 @@
+# dedupe.py
+# -*- coding: utf-8 -*-
+"""
+Phát hiện văn bản / chunk gần trùng giữa các thư mục thành viên bằng MinHash + LSH.
+
+Nhiều thành viên cào chồng lấn vào out_luocdo/raw/<member>/, cùng 1 luật có thể
+nằm dưới tên file khác, hoặc là "Văn bản hợp nhất" của văn bản khác.
+- docs:   quét raw/<member>/doc + json, gom cụm gần trùng, chọn bản chuẩn theo
+          metadata (còn hiệu lực, Ngày ban hành mới nhất) -> dedupe_map.json
+- chunks: cùng thuật toán trên chunks_with_meta.jsonl nhưng chỉ giữa các bản của CÙNG 1 chunk
+          (cùng văn bản: doc_id hoặc cụm của lệnh docs; cùng Điều / chunk_index), map chunk id
+          -> chunk chuẩn, có thể ghi luôn file jsonl đã lọc.
+build_chunks(..., dedupe_map_path=...) đọc map để bỏ các bản không chuẩn.
+
+Chạy:
+    python dedupe.py docs --raw ../../out_luocdo/raw --out dedupe_map.json
+    python dedupe.py chunks --corpus chunks_with_meta.jsonl --out chunk_dedupe.json --filtered chunks_dedup.jsonl
+    python dedupe.py chunks --corpus chunks_with_meta.jsonl --out chunk_dedupe.json --doc-map dedupe_map.json
+"""
+
+import os
+import re
+import json
+import zlib
+import hashlib
+import argparse
+from glob import glob
+
+import numpy as np
+
+from doc_utils import date_to_int
+
+# ========= 1. CẤU HÌNH =========
+NUM_PERM = 128
+BANDS = 32                  # 32 band x 4 hàng -> ngưỡng ~ (1/32)^(1/4) ≈ 0.42
+SHINGLE = 5                 # số âm tiết mỗi shingle
+THRESHOLD = 0.8             # Jaccard ước lượng tối thiểu để coi là trùng
+SIG_BLOCK = 4096            # số shingle mỗi khối khi tính minhash (bộ nhớ ~ SIG_BLOCK x NUM_PERM x 8 byte)
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK32 = np.uint64(0xFFFFFFFF)
+_TOKEN_RE = re.compile(r"\w+")
+_DIEU_NO_RE = re.compile(r"^\s*Điều\s+(\d+[a-zđ]?)\b", re.IGNORECASE)
+
+
+# ========= 2. MINHASH =========
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b < 2^32 để a*x + b (x < 2^32) không tràn uint64
+        self.a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def shingles(self, text: str) -> np.ndarray:
+        toks = _TOKEN_RE.findall(text.lower())
+        if len(toks) < SHINGLE:
+            grams = [" ".join(toks)] if toks else []
+        else:
+            grams = {" ".join(toks[i:i + SHINGLE]) for i in range(len(toks) - SHINGLE + 1)}
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        sh = self.shingles(text)
+        if not len(sh):
+            return np.full(self.num_perm, _MASK32, dtype=np.uint64)
+        # (a*x + b) mod p, lấy min theo từng hoán vị -> O(số shingle x num_perm);
+        # tính theo khối shingle để văn bản hợp nhất dài (~100k shingle) không cần ma trận ~100MB
+        sig = np.full(self.num_perm, _MASK32, dtype=np.uint64)
+        for s in range(0, len(sh), SIG_BLOCK):
+            hv = (np.outer(sh[s:s + SIG_BLOCK], self.a) + self.b) % _PRIME
+            np.minimum(sig, (hv & _MASK32).min(axis=0), out=sig)
+        return sig
+
+
+def lsh_candidates(signatures, bands: int = BANDS):
+    """Sinh cặp (i, j) rơi chung ít nhất 1 bucket; tránh so sánh O(n^2)."""
+    rows = NUM_PERM // bands
+    pairs = set()
+    for b in range(bands):
+        buckets = {}
+        for i, sig in enumerate(signatures):
+            key = sig[b * rows:(b + 1) * rows].tobytes()
+            buckets.setdefault(key, []).append(i)
+        for members in buckets.values():
+            if len(members) > 1:
+                head = members[0]
+                # nối vào phần tử đầu bucket là đủ cho union-find
+                for other in members[1:]:
+                    pairs.add((head, other))
+    return pairs
+
+
+def cluster(signatures, threshold: float = THRESHOLD):
+    """Union-find trên các cặp ứng viên đã kiểm tra Jaccard ước lượng."""
+    parent = list(range(len(signatures)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in lsh_candidates(signatures):
+        if find(i) == find(j):
+            continue
+        if float(np.mean(signatures[i] == signatures[j])) >= threshold:
+            parent[find(i)] = find(j)
+    groups = {}
+    for i in range(len(signatures)):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+# ========= 3. CHỌN BẢN CHUẨN =========
+def canonical_key(meta: dict, text_len: int):
+    """Ưu tiên: không hết hiệu lực > Ngày ban hành mới nhất > văn bản dài hơn."""
+    status = (meta.get("Tình trạng") or meta.get("status") or "").lower()
+    in_force = 0 if status.startswith("hết hiệu lực") else 1
+    issued = date_to_int(meta.get("Ngày ban hành") or meta.get("issued_date"))
+    return in_force, issued, text_len
+
+
+def _pick(groups, keys, names):
+    """Trả (map tên bị bỏ -> tên chuẩn, tập index bị bỏ)."""
+    mapping, dropped = {}, set()
+    for g in groups:
+        best = max(g, key=lambda i: keys[i])
+        for i in g:
+            if i != best:
+                dropped.add(i)
+                if names[i] != names[best]:
+                    mapping[names[i]] = names[best]
+    return mapping, dropped
+
+
+# ========= 4. DEDUPE VĂN BẢN =========
+def iter_member_docs(root_raw_dir: str):
+    """Sinh (key 'member/stem', doc_path, meta) giống cách build_chunks ghép doc + json."""
+    for member in sorted(os.listdir(root_raw_dir)):
+        doc_dir = os.path.join(root_raw_dir, member, "doc")
+        json_dir = os.path.join(root_raw_dir, member, "json")
+        if not os.path.isdir(doc_dir) or not os.path.isdir(json_dir):
+            continue
+        for doc_path in sorted(glob(os.path.join(doc_dir, "*.*"))):
+            base = os.path.splitext(os.path.basename(doc_path))[0]
+            json_path = os.path.join(json_dir, base + ".json")
+            if not os.path.exists(json_path):
+                continue
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f).get("meta", {})
+            except Exception as e:
+                print(f"[WARN] lỗi đọc {json_path}: {e}")
+                continue
+            yield f"{member}/{base}", doc_path, meta
+
+
+def dedupe_docs(root_raw_dir: str, out_path: str):
+    from merge_file import load_doc_text
+
+    hasher = MinHasher()
+    names, sigs, keys = [], [], []
+    for key, doc_path, meta in iter_member_docs(root_raw_dir):
+        try:
+            text = load_doc_text(doc_path)
+        except Exception as e:
+            print(f"[WARN] lỗi đọc {doc_path}: {e}")
+            continue
+        if not text.strip():
+            continue
+        names.append(key)
+        sigs.append(hasher.signature(text))
+        keys.append(canonical_key(meta, len(text)))
+
+    groups = cluster(sigs)
+    mapping, _ = _pick(groups, keys, names)
+    _write_map(out_path, {"documents": mapping})
+    print(f"[DONE] {len(names)} văn bản, {len(groups)} cụm trùng, bỏ {len(mapping)} -> {out_path}")
+    return mapping
+
+
+# ========= 5. DEDUPE CHUNK =========
+def chunk_key(rec: dict) -> str:
+    """Cùng 1 văn bản do 2 thành viên cào cho ra cùng chunk id -> kèm đường dẫn gốc để phân biệt."""
+    return f"{rec['id']}|{rec.get('original_doc_path') or ''}"
+
+
+def chunk_slot(rec: dict) -> str:
+    """Vị trí chunk trong văn bản: số Điều (giữ nguyên khi thành viên tách lệch chunk_index), không có thì chunk_index."""
+    m = _DIEU_NO_RE.match(rec.get("section_title") or "")
+    return "dieu:" + m.group(1).lower() if m else f"idx:{rec.get('chunk_index')}"
+
+
+def member_doc_key(doc_path: str) -> str:
+    """raw/<member>/doc/<stem>.docx -> 'member/stem' (khóa của dedupe_map.json "documents")."""
+    stem = os.path.splitext(os.path.basename(doc_path))[0]
+    member = os.path.basename(os.path.dirname(os.path.dirname(doc_path)))
+    return f"{member}/{stem}"
+
+
+class _Scopes:
+    """Union-find trên chuỗi: các văn bản được coi là cùng 1 văn bản (cùng doc_id / cùng cụm trùng)."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x: str) -> str:
+        self.parent.setdefault(x, x)
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: str, b: str):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[ra] = rb
+
+
+def dedupe_chunks(corpus_path: str, out_path: str, filtered_path: str = None, doc_map_path: str = None):
+    """
+    Chỉ gom các bản của CÙNG 1 chunk: cùng văn bản (cùng doc_id, hoặc cùng cụm trùng cấp văn bản
+    theo doc_map_path = dedupe_map.json của lệnh docs) và cùng vị trí (chunk_slot: số Điều / chunk_index).
+    Hai Điều khác nhau không bao giờ bị gộp, kể cả trong 1 văn bản có đoạn giống nhau; điều khoản
+    mẫu giữa các luật khác nhau ("Hiệu lực thi hành"...) cũng giữ nguyên, để by_doc / tra cứu theo
+    Điều của từng văn bản không bị thủng.
+    """
+    doc_map = load_dedupe_map(doc_map_path).get("documents", {}) if doc_map_path else {}
+    hasher = MinHasher()
+    scopes = _Scopes()
+    names, keys, row_doc, row_slot = [], [], [], []     # theo thứ tự dòng
+    texts = {}                  # (doc_id, slot, sha1) -> dòng đại diện: chỉ text khác nhau mới cần minhash
+    groups = {}                 # dòng đại diện -> các dòng trùng y hệt
+    sig_rows, sigs = [], []
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            text = rec.get("text") or ""
+            row = len(names)
+            names.append(chunk_key(rec))
+            keys.append(canonical_key(rec, len(text)))
+            doc = "id:" + (rec.get("doc_id") or "")
+            path = rec.get("original_doc_path")
+            if path:
+                member_doc = member_doc_key(path)
+                scopes.union(doc, "doc:" + doc_map.get(member_doc, member_doc))
+            row_doc.append(doc)
+            slot = chunk_slot(rec)
+            row_slot.append(slot)
+            h = (doc, slot, hashlib.sha1(text.encode("utf-8")).digest())
+            if h in texts:
+                groups[texts[h]].append(row)
+                continue
+            texts[h] = row
+            groups[row] = [row]
+            sig_rows.append(row)
+            sigs.append(hasher.signature(text))
+
+    # LSH chạy riêng từng (phạm vi văn bản, vị trí chunk): text y hệt khác doc_id nhưng cùng cụm cũng gom ở đây
+    by_scope = {}
+    for i, row in enumerate(sig_rows):
+        by_scope.setdefault((scopes.find(row_doc[row]), row_slot[row]), []).append(i)
+    for members in by_scope.values():
+        if len(members) < 2:
+            continue
+        for g in cluster([sigs[i] for i in members]):
+            root = sig_rows[members[g[0]]]
+            for j in g[1:]:
+                groups[root] += groups.pop(sig_rows[members[j]])
+    dup_groups = [g for g in groups.values() if len(g) > 1]
+    mapping, dropped = _pick(dup_groups, keys, names)
+    _write_map(out_path, {"chunks": mapping})
+    print(f"[DONE] {len(names)} chunk, bỏ {len(dropped)} chunk trùng -> {out_path}")
+
+    if filtered_path:
+        kept = row = 0
+        with open(corpus_path, "r", encoding="utf-8") as fin, \
+             open(filtered_path, "w", encoding="utf-8") as fout:
+            for line in fin:
+                if not line.strip():
+                    continue
+                if row not in dropped:
+                    fout.write(line if line.endswith("\n") else line + "\n")
+                    kept += 1
+                row += 1
+        print(f"[DONE] giữ {kept} chunk -> {filtered_path}")
+    return mapping
+
+
+def _write_map(out_path: str, data: dict):
+    """Ghi đè phần tương ứng, giữ phần còn lại (docs/chunks chung 1 file được)."""
+    old = {}
+    if os.path.exists(out_path):
+        with open(out_path, "r", encoding="utf-8") as f:
+            old = json.load(f)
+    old.update(data)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(old, f, ensure_ascii=False, indent=2)
+
+
+def load_dedupe_map(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ========= 6. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_docs = sub.add_parser("docs")
+    p_docs.add_argument("--raw", required=True, help="thư mục raw chứa các thư mục thành viên")
+    p_docs.add_argument("--out", required=True)
+
+    p_chunks = sub.add_parser("chunks")
+    p_chunks.add_argument("--corpus", required=True)
+    p_chunks.add_argument("--out", required=True)
+    p_chunks.add_argument("--filtered", default=None, help="ghi jsonl đã bỏ chunk trùng")
+    p_chunks.add_argument("--doc-map", default=None,
+                          help="dedupe_map.json của lệnh docs: chunk của các văn bản cùng cụm được gom với nhau")
+
+    args = parser.parse_args()
+    if args.cmd == "docs":
+        dedupe_docs(args.raw, args.out)
+    else:
+        dedupe_chunks(args.corpus, args.out, args.filtered, args.doc_map)
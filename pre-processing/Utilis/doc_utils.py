@@ -0,0 +1,60 @@
+# doc_utils.py
+# -*- coding: utf-8 -*-
+"""
+Hàm xử lý văn bản thuần Python dùng chung (chỉ cần thư viện chuẩn): tách theo "Điều",
+chuẩn hóa doc_id, đổi ngày dd/mm/yyyy sang số yyyymmdd. Tách khỏi merge_file để import ở
+bất kỳ đâu (Linux, worker, dịch vụ) mà không kéo theo backend đọc file (Word COM, pypdf, lxml).
+"""
+
+import re
+
+_DIEU_SPLIT_RE = re.compile(r"(?=^Điều\s+\d+[.\s])", re.MULTILINE)
+_DATE_RE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})")
+
+
+# ========= 1. TÁCH THEO "ĐIỀU ..." =========
+def split_by_dieu(full_text: str):
+    """
+    Tách văn bản thành các đoạn theo mẫu 'Điều <số>'
+    Trả về list[(heading, body)]
+    """
+    text = full_text.replace("\r\n", "\n").replace("\r", "\n")
+    parts = _DIEU_SPLIT_RE.split(text)
+
+    chunks = []
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        first_nl = part.find("\n")
+        if first_nl != -1:
+            heading = part[:first_nl].strip()
+            body = part[first_nl + 1:].strip()
+        else:
+            heading = part
+            body = ""
+        chunks.append((heading, body))
+    return chunks
+
+
+# ========= 2. CHUẨN HÓA DOC_ID =========
+def normalize_doc_id(symbol: str, fallback: str) -> str:
+    """
+    Ưu tiên dùng Số hiệu làm doc_id.
+    Nếu không có thì dùng tên file.
+    """
+    if symbol:
+        s = symbol.strip().upper()
+        s = s.replace("–", "-").replace("—", "-")
+        s = s.replace("NÐ", "NĐ")
+        return s
+    return fallback
+
+
+# ========= 3. NGÀY =========
+def date_to_int(s) -> int:
+    """'06/02/2025' -> 20250206; placeholder ('Đã biết', 'Dữ liệu đang cập nhật') -> 0."""
+    m = _DATE_RE.search(s or "")
+    if not m:
+        return 0
+    return int(m.group(3)) * 10000 + int(m.group(2)) * 100 + int(m.group(1))
@@ -0,0 +1,182 @@
+# docx_stream.py
+# -*- coding: utf-8 -*-
+"""
+Đọc .docx kiểu streaming: iterparse thẳng word/document.xml trong file zip,
+không dựng cây Document của python-docx.
+
+- trả đoạn văn và DÒNG BẢNG theo đúng thứ tự trong văn bản (python-docx doc.paragraphs
+  bỏ mất toàn bộ bảng: biểu phí, mức phạt, phụ lục...)
+- bộ nhớ không phụ thuộc độ dài văn bản: phần tử xử lý xong bị clear khỏi cây
+- dòng bảng ghi thành "| ô 1 | ô 2 |" -> không bị split_by_dieu nhầm là "Điều ..."
+  (bảng lồng trong ô được gộp vào text của ô)
+
+Dùng trong merge_file.load_doc_text. So sánh với python-docx trên corpus:
+    python docx_stream.py bench --dir ../mau_hop_dong --dir ../../out_luocdo/raw
+    python docx_stream.py dump --file "../mau_hop_dong/HỢP ĐỒNG HỨA MUA.docx"
+"""
+
+import os
+import time
+import zipfile
+import argparse
+import multiprocessing
+from glob import glob
+from typing import Iterator, List, Tuple, Union
+from xml.etree.ElementTree import iterparse
+
+# ========= 1. CẤU HÌNH =========
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+P, T, TAB, BR, CR, NBH = _W + "p", _W + "t", _W + "tab", _W + "br", _W + "cr", _W + "noBreakHyphen"
+TBL, TR, TC, BODY = _W + "tbl", _W + "tr", _W + "tc", _W + "body"
+# w:tab trong w:pPr/w:tabs là định nghĩa tab stop, không phải ký tự tab
+TABS = _W + "tabs"
+
+
+# ========= 2. STREAMING PARSER =========
+def iter_docx_blocks(path: str) -> Iterator[Tuple[str, Union[str, List[str]]]]:
+    """
+    Sinh ("p", text) cho đoạn văn ngoài bảng và ("row", [text từng ô]) cho dòng bảng
+    cấp ngoài cùng, theo thứ tự trong văn bản.
+    """
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as f:
+        body = None
+        depth = 0
+        paras: List[List[str]] = []     # stack đoạn đang mở (đoạn lồng: text box trong đoạn)
+        cells: List[List[str]] = []     # stack ô đang mở (bảng lồng)
+        rows: List[List[str]] = []      # stack dòng đang mở
+        in_tabs = 0
+        for event, el in iterparse(f, events=("start", "end")):
+            tag = el.tag
+            if event == "start":
+                depth += 1
+                if tag == P:
+                    paras.append([])
+                elif tag == TC:
+                    cells.append([])
+                elif tag == TR:
+                    rows.append([])
+                elif tag == TABS:
+                    in_tabs += 1
+                elif tag == BODY:
+                    body = el
+                continue
+
+            depth -= 1
+            if tag == T:
+                if paras:
+                    paras[-1].append(el.text or "")
+            elif tag == TAB:
+                if paras and not in_tabs:
+                    paras[-1].append("\t")
+            elif tag in (BR, CR):
+                if paras:
+                    paras[-1].append("\n")
+            elif tag == NBH:
+                if paras:
+                    paras[-1].append("-")
+            elif tag == TABS:
+                in_tabs -= 1
+            elif tag == P:
+                text = "".join(paras.pop())
+                if paras:
+                    paras[-1].append("\n" + text)
+                elif cells:
+                    cells[-1].append(text)
+                else:
+                    yield "p", text
+            elif tag == TC:
+                text = " ".join(s.strip() for s in cells.pop() if s.strip())
+                if rows:
+                    rows[-1].append(text)
+            elif tag == TR:
+                row = rows.pop()
+                if cells:
+                    # bảng lồng: gộp dòng vào ô đang mở của bảng ngoài
+                    cells[-1].append(" | ".join(c for c in row if c))
+                else:
+                    yield "row", row
+            # xong 1 phần tử con trực tiếp của body -> bỏ khỏi cây, giữ bộ nhớ cố định
+            if depth == 2 and body is not None:
+                body.clear()
+
+
+def docx_text(path: str) -> str:
+    """Text cả văn bản: đoạn văn 1 dòng, dòng bảng dạng '| ô 1 | ô 2 |' (bỏ dòng trống hết)."""
+    lines = []
+    for kind, value in iter_docx_blocks(path):
+        if kind == "p":
+            lines.append(value)
+        elif any(value):
+            lines.append("| " + " | ".join(c.replace("\n", " ") for c in value) + " |")
+    return "\n".join(lines)
+
+
+# ========= 3. BENCHMARK =========
+def _python_docx_text(path: str) -> str:
+    from docx import Document
+    return "\n".join(p.text for p in Document(path).paragraphs)
+
+
+BACKENDS = {"python-docx": _python_docx_text, "docx_stream": docx_text}
+
+
+def _bench_child(name: str, files: List[str], repeat: int):
+    """Chạy trong tiến trình riêng: RSS đỉnh của python-docx nằm ở lxml (C), tracemalloc không thấy."""
+    try:
+        import resource
+    except ImportError:         # Windows: không đo RSS
+        resource = None
+    fn = BACKENDS[name]
+    fn(files[0])                # nạp module trước khi lấy mốc bộ nhớ (files[0] là file nhỏ nhất)
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+    best, chars = float("inf"), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chars = sum(len(fn(p)) for p in files)
+        best = min(best, time.perf_counter() - t0)
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base) * 1024 if resource else None
+    return best, peak, chars
+
+
+def bench(dirs: List[str], repeat: int = 3):
+    files = sorted({p for d in dirs for p in glob(os.path.join(d, "**", "*.docx"), recursive=True)},
+                   key=os.path.getsize)
+    if not files:
+        print("[WARN] không tìm thấy .docx")
+        return
+    mb = sum(os.path.getsize(p) for p in files) / 1e6
+    print(f"[INFO] {len(files)} file .docx, {mb:.1f} MB")
+
+    # đoạn văn ngoài bảng phải giống python-docx; phần bảng là phần thêm
+    mismatch, rows = 0, 0
+    for p in files:
+        blocks = list(iter_docx_blocks(p))
+        rows += sum(1 for k, _ in blocks if k == "row")
+        if "\n".join(v for k, v in blocks if k == "p") != _python_docx_text(p):
+            mismatch += 1
+            print(f"[DIFF] đoạn văn khác python-docx: {p}")
+    print(f"[INFO] {rows} dòng bảng (python-docx bỏ qua), {mismatch} file lệch đoạn văn")
+
+    ctx = multiprocessing.get_context("spawn")
+    for name in BACKENDS:
+        with ctx.Pool(1) as pool:
+            elapsed, peak, chars = pool.apply(_bench_child, (name, files, repeat))
+        mem = f"+{peak / 1e6:6.1f} MB RSS" if peak is not None else "RSS n/a"
+        print(f"{name:12s} {len(files) / elapsed:8.1f} file/s  {mb / elapsed:6.2f} MB/s  {mem}  {chars} ký tự")
+
+
+# ========= 4. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_bench = sub.add_parser("bench")
+    p_bench.add_argument("--dir", action="append", required=True)
+    p_bench.add_argument("--repeat", type=int, default=3)
+    p_dump = sub.add_parser("dump")
+    p_dump.add_argument("--file", required=True)
+    args = parser.parse_args()
+
+    if args.cmd == "bench":
+        bench(args.dir, args.repeat)
+    else:
+        print(docx_text(args.file))
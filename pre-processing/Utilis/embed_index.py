@@ -0,0 +1,409 @@
+# embed_index.py
+# -*- coding: utf-8 -*-
+"""
+Embedding + chỉ mục vector cục bộ cho các chunk của merge_file.
+
+- encode: mã hóa chunk theo lô bằng model CPU (sentence-transformers), cache
+  vector theo sha1(text), mỗi model 1 thư mục cache => chunk không đổi thì không mã hóa lại.
+- build: gom vector theo thứ tự corpus vào ma trận float16 hoặc int8 (np.memmap),
+  dựng chỉ mục IVF (k-means thô) + cột metadata (doc_type, status, ngày ban hành)
+  để lọc trước khi tìm.
+- search: lọc metadata trước bằng mask numpy; lọc chặt thì quét thẳng các hàng khớp,
+  không thì quét các cụm gần nhất (nprobe), thiếu kết quả khớp thì mở thêm cụm tới khi đủ k.
+
+Chạy:
+    python embed_index.py build --corpus chunks_with_meta.jsonl --index-dir vec_index
+    python embed_index.py search --index-dir vec_index --query "giá thuê nhà ở xã hội"
+    python embed_index.py bench --index-dir vec_index
+"""
+
+import os
+import json
+import time
+import hashlib
+import argparse
+
+import numpy as np
+
+from doc_utils import date_to_int
+
+# ========= 1. CẤU HÌNH =========
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+BATCH_SIZE = 128
+QUANT = "f16"               # "f16" hoặc "int8"
+NPROBE = 8
+BRUTE_FORCE_ROWS = 20000    # bộ lọc còn ít hàng hơn số này -> quét thẳng các hàng khớp, bỏ qua IVF
+KMEANS_ITERS = 15
+KMEANS_SAMPLE = 50000
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+# ========= 2. ENCODER + CACHE =========
+_model = None
+
+
+def get_model(model_name: str = MODEL_NAME):
+    # import nặng (torch) -> chỉ nạp khi thật sự cần mã hóa
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(model_name, device="cpu")
+    return _model
+
+
+def encode_texts(texts, model_name: str = MODEL_NAME) -> np.ndarray:
+    model = get_model(model_name)
+    vecs = model.encode(texts, batch_size=BATCH_SIZE, convert_to_numpy=True,
+                        normalize_embeddings=True, show_progress_bar=False)
+    return vecs.astype(np.float32)
+
+
+class EmbeddingCache:
+    """
+    Cache append-only trong 1 thư mục, của đúng 1 model:
+      info.json    {"model", "dim"}; mở bằng model / dim khác -> ValueError (không dùng nhầm vector)
+      vectors.f16  float16 thô, nối thêm cuối file (ghi trước)
+      keys.txt     1 hash/dòng, dòng i <-> vector hàng i (ghi sau)
+    Crash giữa add(): vector thừa / hàng ghi dở / dòng key dở bị cắt khi mở lại -> hàng và key luôn khớp.
+    """
+
+    def __init__(self, cache_dir: str, model_name: str = MODEL_NAME, dim: int = None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.keys_path = os.path.join(cache_dir, "keys.txt")
+        self.vec_path = os.path.join(cache_dir, "vectors.f16")
+        self.info_path = os.path.join(cache_dir, "info.json")
+        self.model_name = model_name
+        self.dim = dim
+        if os.path.exists(self.info_path):
+            with open(self.info_path, "r", encoding="utf-8") as f:
+                info = json.load(f)
+            if info.get("model") != model_name:
+                raise ValueError(f"cache {cache_dir} là của model {info.get('model') or '(không rõ)'}, "
+                                 f"không dùng cho {model_name}; chọn --cache-dir khác")
+            if dim is not None and dim != info["dim"]:
+                raise ValueError(f"cache {cache_dir} có dim {info['dim']}, cần {dim}")
+            self.dim = info["dim"]
+        self.rows = {}
+        self.n = 0
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, "r", encoding="utf-8") as f:
+                keys = f.read().split("\n")
+            keys.pop()                  # phần sau "\n" cuối: rỗng, hoặc dòng key ghi dở
+            self._repair(keys)
+
+    def _repair(self, keys):
+        """Giữ min(số key đủ dòng, số hàng vector đủ byte), cắt phần thừa của cả 2 file."""
+        row_bytes = 2 * (self.dim or 0)
+        n_vec = os.path.getsize(self.vec_path) // row_bytes if row_bytes and os.path.exists(self.vec_path) else 0
+        n = min(len(keys), n_vec)
+        if n != len(keys) or (row_bytes and os.path.getsize(self.vec_path) != n * row_bytes):
+            print(f"[CACHE] khôi phục sau crash: giữ {n} hàng (key {len(keys)}, vector {n_vec})")
+            with open(self.keys_path, "w", encoding="utf-8") as f:
+                f.writelines(k + "\n" for k in keys[:n])
+            if os.path.exists(self.vec_path):
+                with open(self.vec_path, "r+b") as f:
+                    f.truncate(n * row_bytes)
+        elif os.path.getsize(self.keys_path) != sum(len(k.encode("utf-8")) + 1 for k in keys):
+            with open(self.keys_path, "w", encoding="utf-8") as f:    # bỏ dòng key ghi dở cuối file
+                f.writelines(k + "\n" for k in keys)
+        for i, k in enumerate(keys[:n]):
+            self.rows[k] = i
+        self.n = n
+
+    def matrix(self) -> np.ndarray:
+        if not self.n:
+            return np.zeros((0, self.dim or 0), dtype=np.float16)
+        return np.memmap(self.vec_path, dtype=np.float16, mode="r", shape=(self.n, self.dim))
+
+    def add(self, hashes, vecs: np.ndarray):
+        if self.dim is None:
+            self.dim = int(vecs.shape[1])
+            with open(self.info_path, "w", encoding="utf-8") as f:
+                json.dump({"model": self.model_name, "dim": self.dim}, f)
+        elif vecs.shape[1] != self.dim:
+            raise ValueError(f"vector dim {vecs.shape[1]} khác dim của cache {self.dim}")
+        # vector trước, key sau: crash giữa chừng chỉ để lại vector thừa, _repair cắt khi mở lại
+        with open(self.vec_path, "ab") as fv:
+            fv.write(vecs.astype(np.float16).tobytes())
+        with open(self.keys_path, "a", encoding="utf-8") as fk:
+            fk.write("".join(h + "\n" for h in hashes))
+        for h in hashes:
+            self.rows[h] = self.n
+            self.n += 1
+
+
+def cache_dir_for(index_dir: str, model_name: str) -> str:
+    """Mặc định mỗi model 1 thư mục cache con: index_dir/cache/<model>."""
+    return os.path.join(index_dir, "cache", model_name.replace("/", "__"))
+
+
+def encode_corpus(corpus_path: str, cache: EmbeddingCache, model_name: str = MODEL_NAME):
+    """
+    Stream corpus, chỉ mã hóa text chưa có trong cache (theo lô BATCH_SIZE).
+    Trả list hash theo thứ tự chunk + list metadata thô.
+    """
+    order, metas = [], []
+    pending_h, pending_t = [], []
+    encoded = 0
+
+    def flush():
+        nonlocal encoded
+        if pending_t:
+            cache.add(pending_h, encode_texts(pending_t, model_name))
+            encoded += len(pending_t)
+            pending_h.clear()
+            pending_t.clear()
+
+    queued = set()
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            text = rec.get("text") or ""
+            h = text_hash(text)
+            order.append(h)
+            metas.append((rec.get("id"), rec.get("doc_type"), rec.get("status"), rec.get("issued_date")))
+            if h not in cache.rows and h not in queued:
+                queued.add(h)
+                pending_h.append(h)
+                pending_t.append(text)
+                if len(pending_t) >= BATCH_SIZE * 8:
+                    flush()
+                    print(f"[INFO] đã mã hóa {encoded} chunk mới")
+    flush()
+    print(f"[INFO] {len(order)} chunk, mã hóa mới {encoded}, dùng lại cache {len(order) - encoded}")
+    return order, metas
+
+
+# ========= 3. BUILD INDEX =========
+def kmeans(x: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """k-means cosine đơn giản (Lloyd) trên mẫu con; x đã chuẩn hóa L2."""
+    rng = np.random.default_rng(seed)
+    if len(x) > KMEANS_SAMPLE:
+        x = x[rng.choice(len(x), KMEANS_SAMPLE, replace=False)]
+    cent = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ cent.T, axis=1)
+        for c in range(k):
+            members = x[assign == c]
+            if len(members):
+                v = members.sum(axis=0)
+                cent[c] = v / (np.linalg.norm(v) or 1.0)
+            else:
+                cent[c] = x[rng.integers(len(x))]
+    return cent
+
+
+def _encode_categorical(values):
+    cats = sorted({v for v in values if v})
+    code = {v: i + 1 for i, v in enumerate(cats)}      # 0 = rỗng
+    return np.asarray([code.get(v, 0) for v in values], dtype=np.int32), cats
+
+
+def build_index(corpus_path: str, index_dir: str, cache_dir: str = None,
+                quant: str = QUANT, model_name: str = MODEL_NAME):
+    os.makedirs(index_dir, exist_ok=True)
+    cache = EmbeddingCache(cache_dir or cache_dir_for(index_dir, model_name), model_name)
+    order, metas = encode_corpus(corpus_path, cache, model_name)
+    n = len(order)
+    if n == 0:
+        print("[WARN] corpus rỗng")
+        return
+
+    cache_mat = cache.matrix()
+    rows = np.fromiter((cache.rows[h] for h in order), dtype=np.int64, count=n)
+    vecs = np.asarray(cache_mat[rows], dtype=np.float32)
+
+    nlist = max(1, int(np.sqrt(n)))
+    cent = kmeans(vecs, min(nlist, n))
+    assign = np.argmax(vecs @ cent.T, axis=1)
+    perm = np.argsort(assign, kind="stable")          # sắp theo cụm -> mỗi cụm là 1 đoạn liên tục
+    list_ptr = np.zeros(len(cent) + 1, dtype=np.int64)
+    np.add.at(list_ptr, assign + 1, 1)
+    np.cumsum(list_ptr, out=list_ptr)
+
+    vecs = vecs[perm]
+    if quant == "int8":
+        scales = np.abs(vecs).max(axis=1, keepdims=True) / 127.0
+        scales[scales == 0] = 1.0
+        stored = np.round(vecs / scales).astype(np.int8)
+        np.save(os.path.join(index_dir, "scales.npy"), scales.astype(np.float32).ravel())
+    else:
+        stored = vecs.astype(np.float16)
+    mm = np.lib.format.open_memmap(os.path.join(index_dir, "vectors.npy"), mode="w+",
+                                   dtype=stored.dtype, shape=stored.shape)
+    mm[:] = stored
+    mm.flush()
+
+    ids = [metas[i][0] for i in perm]
+    doc_type, doc_type_cats = _encode_categorical([metas[i][1] for i in perm])
+    status, status_cats = _encode_categorical([metas[i][2] for i in perm])
+    issued = np.asarray([date_to_int(metas[i][3]) for i in perm], dtype=np.int32)
+
+    np.save(os.path.join(index_dir, "centroids.npy"), cent.astype(np.float32))
+    np.save(os.path.join(index_dir, "list_ptr.npy"), list_ptr)
+    np.save(os.path.join(index_dir, "meta_doc_type.npy"), doc_type)
+    np.save(os.path.join(index_dir, "meta_status.npy"), status)
+    np.save(os.path.join(index_dir, "meta_issued.npy"), issued)
+    with open(os.path.join(index_dir, "ids.json"), "w", encoding="utf-8") as f:
+        json.dump(ids, f, ensure_ascii=False)
+    with open(os.path.join(index_dir, "info.json"), "w", encoding="utf-8") as f:
+        json.dump({"n": n, "dim": int(stored.shape[1]), "quant": quant, "nlist": len(cent),
+                   "model": model_name, "doc_type": doc_type_cats, "status": status_cats},
+                  f, ensure_ascii=False)
+    print(f"[DONE] {n} vector ({quant}), {len(cent)} cụm -> {index_dir}")
+
+
+# ========= 4. TÌM KIẾM =========
+class VectorIndex:
+    def __init__(self, index_dir: str):
+        path = lambda name: os.path.join(index_dir, name)
+        with open(path("info.json"), "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+        with open(path("ids.json"), "r", encoding="utf-8") as f:
+            self.ids = json.load(f)
+        self.vectors = np.load(path("vectors.npy"), mmap_mode="r")
+        self.scales = np.load(path("scales.npy")) if self.info["quant"] == "int8" else None
+        self.centroids = np.load(path("centroids.npy"))
+        self.list_ptr = np.load(path("list_ptr.npy"))
+        self.doc_type = np.load(path("meta_doc_type.npy"))
+        self.status = np.load(path("meta_status.npy"))
+        self.issued = np.load(path("meta_issued.npy"))
+        self._doc_type_code = {v: i + 1 for i, v in enumerate(self.info["doc_type"])}
+        self._status_code = {v: i + 1 for i, v in enumerate(self.info["status"])}
+
+    def _filter_mask(self, doc_type=None, status=None, date_from=None, date_to=None):
+        """Mask trên toàn bộ hàng index; None nếu không lọc."""
+        mask = None
+
+        def both(m):
+            return m if mask is None else (mask & m)
+
+        if doc_type:
+            codes = [self._doc_type_code.get(t, -1) for t in ([doc_type] if isinstance(doc_type, str) else doc_type)]
+            mask = both(np.isin(self.doc_type, codes))
+        if status:
+            codes = [self._status_code.get(t, -1) for t in ([status] if isinstance(status, str) else status)]
+            mask = both(np.isin(self.status, codes))
+        if date_from:
+            mask = both(self.issued >= date_from)
+        if date_to:
+            mask = both((self.issued <= date_to) & (self.issued > 0))
+        return mask
+
+    def _scores(self, rows: np.ndarray, q: np.ndarray) -> np.ndarray:
+        sc = np.asarray(self.vectors[rows], dtype=np.float32) @ q
+        if self.scales is not None:
+            sc *= self.scales[rows]
+        return sc
+
+    def search_vector(self, q: np.ndarray, k: int = 10, nprobe: int = NPROBE, **filters):
+        """
+        q: vector đã chuẩn hóa. filters: doc_type, status (str hoặc list), date_from/date_to (yyyymmdd).
+        Trả list[(chunk_id, score)].
+        """
+        return [(self.ids[r], s) for r, s in self.search_rows(q, k, nprobe, **filters)]
+
+    def search_rows(self, q: np.ndarray, k: int = 10, nprobe: int = NPROBE, **filters):
+        """
+        Như search_vector nhưng trả list[(hàng trong index, score)].
+        Lọc trước: mask tính trên mọi hàng; còn <= BRUTE_FORCE_ROWS hàng khớp thì quét thẳng các hàng đó,
+        không thì duyệt cụm theo độ gần, qua nprobe cụm mà chưa đủ k hàng khớp thì duyệt tiếp.
+        """
+        q = np.asarray(q, dtype=np.float32).ravel()
+        mask = self._filter_mask(**filters)
+        if mask is not None:
+            allowed = np.flatnonzero(mask)
+            if len(allowed) <= BRUTE_FORCE_ROWS:
+                return self._top(allowed, self._scores(allowed, q), k)
+        order = np.argsort(-(self.centroids @ q))
+        cand_rows, cand_scores, found = [], [], 0
+        for i, c in enumerate(order):
+            if i >= nprobe and found >= k:
+                break
+            s, e = int(self.list_ptr[c]), int(self.list_ptr[c + 1])
+            m = None if mask is None else mask[s:e]
+            if s == e or (m is not None and not m.any()):
+                continue
+            rows, sc = np.arange(s, e), self._scores(slice(s, e), q)     # đọc liền 1 đoạn memmap
+            if m is not None:
+                rows, sc = rows[m], sc[m]
+            cand_rows.append(rows)
+            cand_scores.append(sc)
+            found += len(rows)
+        if not cand_rows:
+            return []
+        return self._top(np.concatenate(cand_rows), np.concatenate(cand_scores), k)
+
+    @staticmethod
+    def _top(rows: np.ndarray, scores: np.ndarray, k: int):
+        if not len(rows):
+            return []
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def search(self, query: str, k: int = 10, **kw):
+        q = encode_texts([query], self.info.get("model", MODEL_NAME))[0]
+        return self.search_vector(q, k, **kw)
+
+
+def bench(index_dir: str, n_queries: int = 200, k: int = 10, **filters):
+    """Đo độ trễ truy vấn (không tính thời gian mã hóa câu hỏi)."""
+    idx = VectorIndex(index_dir)
+    rng = np.random.default_rng(0)
+    rows = rng.integers(0, idx.info["n"], n_queries)
+    lat = []
+    for r in rows:
+        q = np.asarray(idx.vectors[r], dtype=np.float32)
+        if idx.scales is not None:
+            q = q * idx.scales[r]
+        q /= (np.linalg.norm(q) or 1.0)
+        t0 = time.perf_counter()
+        idx.search_vector(q, k, **filters)
+        lat.append((time.perf_counter() - t0) * 1000)
+    lat = np.asarray(lat)
+    print(f"[BENCH] {n_queries} truy vấn: p50={np.percentile(lat, 50):.2f}ms "
+          f"p99={np.percentile(lat, 99):.2f}ms max={lat.max():.2f}ms")
+
+
+# ========= 5. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build")
+    p_build.add_argument("--corpus", required=True)
+    p_build.add_argument("--index-dir", required=True)
+    p_build.add_argument("--cache-dir", default=None)
+    p_build.add_argument("--quant", choices=["f16", "int8"], default=QUANT)
+    p_build.add_argument("--model", default=MODEL_NAME)
+
+    for name in ("search", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--index-dir", required=True)
+        p.add_argument("--k", type=int, default=10)
+        p.add_argument("--doc-type", default=None)
+        p.add_argument("--status", default=None)
+        p.add_argument("--date-from", type=int, default=None, help="yyyymmdd")
+        p.add_argument("--date-to", type=int, default=None, help="yyyymmdd")
+        if name == "search":
+            p.add_argument("--query", required=True)
+
+    args = parser.parse_args()
+    if args.cmd == "build":
+        build_index(args.corpus, args.index_dir, args.cache_dir, args.quant, args.model)
+    else:
+        filters = {"doc_type": args.doc_type, "status": args.status,
+                   "date_from": args.date_from, "date_to": args.date_to}
+        if args.cmd == "search":
+            for cid, score in VectorIndex(args.index_dir).search(args.query, args.k, **filters):
+                print(f"{score:.4f}\t{cid}")
+        else:
+            bench(args.index_dir, k=args.k, **filters)
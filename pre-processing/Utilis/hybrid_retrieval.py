@@ -0,0 +1,238 @@
+# hybrid_retrieval.py
+# -*- coding: utf-8 -*-
+"""
+Tìm chunk căn cứ cho điều khoản hợp đồng: BM25 (bắt đúng thuật ngữ luật) + vector
+(bắt câu diễn đạt lại), gộp bằng reciprocal rank fusion rồi xếp lại bằng cross-encoder.
+
+- 2 nhánh chạy song song trong thread pool: BM25 trên index risk_scoring, vector trên
+  index embed_index (mã hóa cả lô câu hỏi 1 lần)
+- RRF: score = sum 1 / (RRF_K + hạng) qua 2 nhánh, khóa theo số dòng chunk trong corpus
+- rerank: top RERANK_TOP của mọi câu trong lô gom thành 1 danh sách cặp (câu, chunk),
+  cross-encoder CPU chấm 1 lần theo lô RERANK_BATCH
+- văn bản "Còn hiệu lực" được cộng IN_FORCE_BOOST (nhân lên điểm đã chuẩn hóa 0..1)
+- search_batch(queries): 1 hợp đồng = 1 lô, chi phí mã hóa / rerank chia đều cho các điều khoản
+
+Cả 2 index phải build từ cùng 1 corpus (chunks_with_meta.jsonl).
+
+Chạy:
+    python risk_scoring.py build --corpus chunks_with_meta.jsonl --index-dir risk_index
+    python embed_index.py build --corpus chunks_with_meta.jsonl --index-dir vec_index
+    python hybrid_retrieval.py search --bm25-dir risk_index --vec-dir vec_index --query "phạt vi phạm hợp đồng"
+    python hybrid_retrieval.py contract --bm25-dir risk_index --vec-dir vec_index --file hop_dong.docx
+"""
+
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from embed_index import VectorIndex, encode_texts, MODEL_NAME
+from risk_scoring import ChunkRetriever, split_clauses, TOP_K
+
+# ========= 1. CẤU HÌNH =========
+RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"   # đa ngôn ngữ, có tiếng Việt
+CANDIDATES = 50             # số ứng viên mỗi nhánh
+RRF_K = 60
+RERANK_TOP = 20             # số ứng viên sau RRF đưa vào cross-encoder (mỗi câu)
+RERANK_BATCH = 64
+RERANK_MAX_LENGTH = 512
+MAX_QUERY_CHARS = 500
+MAX_PASSAGE_CHARS = 1500
+IN_FORCE_BOOST = 0.15
+THREADS = 2
+
+
+def is_in_force(status) -> bool:
+    return (status or "").lower().startswith("còn hiệu lực")
+
+
+def rrf_fuse(rankings, k: int = RRF_K):
+    """rankings: list các list khóa theo thứ tự hạng -> list[(khóa, điểm RRF)] giảm dần."""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda x: -x[1])
+
+
+def _minmax(x: np.ndarray) -> np.ndarray:
+    if not len(x):
+        return x
+    lo, hi = float(x.min()), float(x.max())
+    return (x - lo) / (hi - lo) if hi > lo else np.ones_like(x)
+
+
+# ========= 2. CROSS-ENCODER =========
+_reranker = None
+
+
+def get_reranker(model_name: str = RERANK_MODEL):
+    # import nặng (torch) -> chỉ nạp khi thật sự rerank
+    global _reranker
+    if _reranker is None:
+        from sentence_transformers import CrossEncoder
+        _reranker = CrossEncoder(model_name, device="cpu", max_length=RERANK_MAX_LENGTH)
+    return _reranker
+
+
+# ========= 3. HYBRID =========
+class HybridRetriever:
+    def __init__(self, bm25_dir: str, vec_dir: str = None, rerank_model: str = RERANK_MODEL,
+                 in_force_boost: float = IN_FORCE_BOOST, threads: int = THREADS):
+        self.bm25 = ChunkRetriever(bm25_dir)
+        self.chunks = self.bm25.chunks
+        self.vec = VectorIndex(vec_dir) if vec_dir else None
+        self.rerank_model = rerank_model
+        self.in_force_boost = in_force_boost
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.timings = {}
+        with open(os.path.join(bm25_dir, "doc_status.json"), "r", encoding="utf-8") as f:
+            doc_status = json.load(f)
+        # mask theo số dòng corpus: chunk thuộc văn bản còn hiệu lực
+        self.in_force = np.zeros(len(self.chunks), dtype=bool)
+        for doc_id, st in doc_status.items():
+            if is_in_force(st.get("status")):
+                self.in_force[self.chunks.doc_line_nos(doc_id)] = True
+        # hàng index vector -> số dòng corpus, tính 1 lần khi cần
+        self._vec_rows = None
+
+    # ---------- 2 nhánh ----------
+    def _lexical(self, queries, n: int):
+        return [[no for no, _ in hits] for hits in self.bm25.search_batch(queries, n)]
+
+    def _vector_rows(self) -> np.ndarray:
+        if self._vec_rows is None:
+            rows = (self.chunks.line_no(cid) for cid in self.vec.ids)
+            self._vec_rows = np.fromiter((-1 if r is None else r for r in rows), dtype=np.int64,
+                                         count=len(self.vec.ids))
+            missing = int((self._vec_rows < 0).sum())
+            if missing:
+                print(f"[WARN] {missing} id trong index vector không có trong corpus BM25 (bỏ qua)")
+        return self._vec_rows
+
+    def _vector(self, queries, n: int):
+        rows = self._vector_rows()
+        qv = encode_texts(list(queries), self.vec.info.get("model", MODEL_NAME))
+        out = []
+        for q in qv:
+            hits = (int(rows[r]) for r, _ in self.vec.search_rows(q, n))
+            out.append([no for no in hits if no >= 0])
+        return out
+
+    # ---------- rerank ----------
+    def _rerank(self, queries, fused, texts):
+        """fused: list (mỗi câu) các số dòng ứng viên -> list mảng điểm cross-encoder."""
+        pairs, spans = [], []
+        for q, cands in zip(queries, fused):
+            spans.append((len(pairs), len(pairs) + len(cands)))
+            pairs += [(q[:MAX_QUERY_CHARS], texts[no][:MAX_PASSAGE_CHARS]) for no in cands]
+        if not pairs:
+            return [np.zeros(0, dtype=np.float32) for _ in queries]
+        scores = np.asarray(get_reranker(self.rerank_model).predict(
+            pairs, batch_size=RERANK_BATCH, show_progress_bar=False), dtype=np.float32).ravel()
+        return [scores[s:e] for s, e in spans]
+
+    # ---------- API ----------
+    def search_batch(self, queries, k: int = TOP_K, candidates: int = CANDIDATES, rerank: bool = True):
+        """
+        Trả list (mỗi câu) các dict {no, id, doc_id, score, in_force, lexical_rank, vector_rank},
+        score đã chuẩn hóa 0..1 trong từng câu rồi cộng boost hiệu lực.
+        """
+        queries = [" ".join((q or "").split()) for q in queries]
+        t0 = time.perf_counter()
+        f_lex = self.executor.submit(self._lexical, queries, candidates)
+        f_vec = self.executor.submit(self._vector, queries, candidates) if self.vec else None
+        lexical = f_lex.result()
+        vector = f_vec.result() if f_vec else [[] for _ in queries]
+        t1 = time.perf_counter()
+
+        top_n = max(k, RERANK_TOP)
+        fused = []
+        for lex, vec in zip(lexical, vector):
+            fused.append(rrf_fuse([lex, vec])[:top_n])
+
+        # text chunk đọc 1 lần cho cả lô (nhiều điều khoản hay trúng cùng chunk)
+        recs = {}
+        for cands in fused:
+            for no, _ in cands:
+                if no not in recs:
+                    recs[no] = self.chunks.line(no) or {}
+        t2 = time.perf_counter()
+
+        cand_nos = [[no for no, _ in cands] for cands in fused]
+        if rerank and recs:
+            texts = {no: rec.get("text") or "" for no, rec in recs.items()}
+            raw = self._rerank(queries, cand_nos, texts)
+        else:
+            raw = [np.asarray([s for _, s in cands], dtype=np.float32) for cands in fused]
+        t3 = time.perf_counter()
+
+        out = []
+        for lex, vec, nos, sc in zip(lexical, vector, cand_nos, raw):
+            nos = np.asarray(nos, dtype=np.int64)
+            score = _minmax(sc)
+            if len(nos):
+                score = score * np.where(self.in_force[nos], 1.0 + self.in_force_boost, 1.0)
+            order = np.argsort(-score, kind="stable")[:k]
+            lex_rank = {no: r + 1 for r, no in enumerate(lex)}
+            vec_rank = {no: r + 1 for r, no in enumerate(vec)}
+            hits = []
+            for i in order:
+                no = int(nos[i])
+                rec = recs[no]
+                hits.append({"no": no, "id": rec.get("id"), "doc_id": rec.get("doc_id"),
+                             "score": round(float(score[i]), 4), "in_force": bool(self.in_force[no]),
+                             "lexical_rank": lex_rank.get(no), "vector_rank": vec_rank.get(no)})
+            out.append(hits)
+        self.timings = {"candidates_ms": round((t1 - t0) * 1000, 1), "fetch_ms": round((t2 - t1) * 1000, 1),
+                        "rerank_ms": round((t3 - t2) * 1000, 1), "queries": len(queries),
+                        "pairs": sum(len(n) for n in cand_nos) if rerank else 0}
+        return out
+
+    def search(self, query: str, k: int = TOP_K, **kw):
+        return self.search_batch([query], k, **kw)[0]
+
+    def search_contract(self, text: str, k: int = TOP_K, **kw):
+        """Mỗi điều khoản (split_clauses) 1 câu hỏi, cả hợp đồng chạy thành 1 lô."""
+        clauses = [(h, (h + "\n" + b).strip()) for h, b in split_clauses(text)]
+        results = self.search_batch([c for _, c in clauses], k, **kw)
+        return [{"clause": i, "heading": h[:200], "hits": hits}
+                for i, ((h, _), hits) in enumerate(zip(clauses, results))]
+
+
+# ========= 4. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    for name in ("search", "contract"):
+        p = sub.add_parser(name)
+        p.add_argument("--bm25-dir", required=True, help="thư mục risk_scoring build")
+        p.add_argument("--vec-dir", default=None, help="thư mục embed_index build (bỏ trống = chỉ BM25)")
+        p.add_argument("--k", type=int, default=TOP_K)
+        p.add_argument("--candidates", type=int, default=CANDIDATES)
+        p.add_argument("--no-rerank", action="store_true")
+        p.add_argument("--rerank-model", default=RERANK_MODEL)
+        p.add_argument("--boost", type=float, default=IN_FORCE_BOOST, help="cộng cho văn bản còn hiệu lực")
+        if name == "search":
+            p.add_argument("--query", nargs="+", required=True)
+        else:
+            p.add_argument("--file", required=True, help=".txt / .doc / .docx")
+    args = parser.parse_args()
+
+    hr = HybridRetriever(args.bm25_dir, args.vec_dir, args.rerank_model, args.boost)
+    kw = {"candidates": args.candidates, "rerank": not args.no_rerank}
+    if args.cmd == "search":
+        for q, hits in zip(args.query, hr.search_batch(args.query, args.k, **kw)):
+            print(f"# {q}")
+            for h in hits:
+                print(f"{h['score']:.4f}\t{h['id']}\tBM25={h['lexical_rank']} vec={h['vector_rank']}"
+                      f"{' [còn hiệu lực]' if h['in_force'] else ''}")
+    else:
+        from citation_extractor import iter_contract_texts
+        for path, text in iter_contract_texts([args.file]):
+            for c in hr.search_contract(text, args.k, **kw):
+                print(json.dumps(c, ensure_ascii=False))
+    print(f"[TIME] {hr.timings}")
@@ -0,0 +1,235 @@
+# jsonl_index.py
+# -*- coding: utf-8 -*-
+"""
+Đọc ngẫu nhiên file JSONL (chunks_with_meta.jsonl, *_clean.jsonl, *_clean_unicode.jsonl...)
+theo id chunk ("15/2021/NĐ-CP:12") hoặc theo doc_id, không phải quét cả file.
+
+Chỉ mục đi kèm nằm trong thư mục <file>.idx/, tạo trong 1 lượt đọc:
+  offsets.npy    int64[N+1]  byte offset đầu mỗi dòng (dòng i = [off[i], off[i+1]))
+  id_hash.npy    uint64[M]   hash id đã sắp xếp  \\
+  id_line.npy    int64[M]    dòng tương ứng      / -> searchsorted, O(log M), không nạp dict
+  doc_hash.npy   uint64[D]   hash doc_id đã sắp xếp
+  doc_ptr.npy    int64[D+1]  con trỏ vào doc_lines
+  doc_lines.npy  int64[M]    dòng của từng doc_id, theo thứ tự chunk trong file
+  info.json      kích thước + mtime file nguồn (đổi thì tự build lại)
+Mọi mảng mở bằng np.load(mmap_mode="r"), file JSONL mở bằng mmap: nhiều process dùng chung
+page cache, chỉ decode đúng các dòng được hỏi. Trùng hash thì so lại id thật sau khi decode.
+
+Chạy:
+    python jsonl_index.py build --jsonl chunks_with_meta.jsonl
+    python jsonl_index.py get --jsonl chunks_with_meta.jsonl --id "15/2021/NĐ-CP:12"
+    python jsonl_index.py doc --jsonl chunks_with_meta.jsonl --doc-id "15/2021/NĐ-CP"
+"""
+
+import os
+import json
+import mmap
+import hashlib
+import argparse
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+# ========= 1. CẤU HÌNH =========
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+
+def key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def index_dir_of(jsonl_path: str) -> str:
+    return jsonl_path + INDEX_SUFFIX
+
+
+def _source_info(jsonl_path: str) -> dict:
+    st = os.stat(jsonl_path)
+    return {"version": INDEX_VERSION, "size": st.st_size, "mtime": st.st_mtime}
+
+
+# ========= 2. GHI CHỈ MỤC =========
+class OffsetIndexWriter:
+    """
+    Nhận từng dòng theo thứ tự file: add(len(raw_bytes), rec hoặc None cho dòng trống).
+    Dùng riêng (build_offset_index) hoặc gắn vào 1 lượt đọc sẵn có (risk_scoring.build_index).
+    """
+
+    def __init__(self, jsonl_path: str):
+        self.jsonl_path = jsonl_path
+        self.offsets = [0]
+        self.ids: List[int] = []
+        self.id_lines: List[int] = []
+        self.docs: Dict[int, List[int]] = {}
+
+    def add(self, raw_len: int, rec: Optional[dict]):
+        no = len(self.offsets) - 1
+        self.offsets.append(self.offsets[-1] + raw_len)
+        if not rec:
+            return
+        if rec.get("id") is not None:
+            self.ids.append(key_hash(str(rec["id"])))
+            self.id_lines.append(no)
+        if rec.get("doc_id") is not None:
+            self.docs.setdefault(key_hash(str(rec["doc_id"])), []).append(no)
+
+    def close(self):
+        out = index_dir_of(self.jsonl_path)
+        os.makedirs(out, exist_ok=True)
+        save = lambda name, arr: np.save(os.path.join(out, name), arr)
+
+        ids = np.asarray(self.ids, dtype=np.uint64)
+        order = np.argsort(ids, kind="stable")
+        save("offsets.npy", np.asarray(self.offsets, dtype=np.int64))
+        save("id_hash.npy", ids[order])
+        save("id_line.npy", np.asarray(self.id_lines, dtype=np.int64)[order])
+
+        doc_keys = sorted(self.docs)
+        ptr = np.zeros(len(doc_keys) + 1, dtype=np.int64)
+        ptr[1:] = np.cumsum([len(self.docs[k]) for k in doc_keys])
+        lines = [no for k in doc_keys for no in self.docs[k]]
+        save("doc_hash.npy", np.asarray(doc_keys, dtype=np.uint64))
+        save("doc_ptr.npy", ptr)
+        save("doc_lines.npy", np.asarray(lines, dtype=np.int64))
+        # info ghi sau cùng: build dở dang thì lần mở sau thấy thiếu -> build lại
+        with open(os.path.join(out, "info.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(_source_info(self.jsonl_path), lines=len(self.offsets) - 1,
+                           ids=len(self.ids), docs=len(doc_keys)), f)
+        return out
+
+
+def build_offset_index(jsonl_path: str) -> str:
+    w = OffsetIndexWriter(jsonl_path)
+    with open(jsonl_path, "rb") as f:
+        for raw in f:
+            line = raw.strip()
+            w.add(len(raw), json.loads(line) if line else None)
+    out = w.close()
+    print(f"[DONE] chỉ mục {len(w.offsets) - 1} dòng, {len(w.ids)} id, {len(w.docs)} doc_id -> {out}")
+    return out
+
+
+def index_is_fresh(jsonl_path: str) -> bool:
+    p = os.path.join(index_dir_of(jsonl_path), "info.json")
+    if not os.path.exists(p):
+        return False
+    with open(p, "r", encoding="utf-8") as f:
+        info = json.load(f)
+    cur = _source_info(jsonl_path)
+    return all(info.get(k) == v for k, v in cur.items())
+
+
+# ========= 3. ĐỌC =========
+class JsonlReader:
+    """mmap file JSONL + chỉ mục sidecar; tự build chỉ mục nếu chưa có / cũ."""
+
+    def __init__(self, jsonl_path: str, auto_build: bool = True):
+        if not index_is_fresh(jsonl_path):
+            if not auto_build:
+                raise FileNotFoundError(f"chưa có chỉ mục cho {jsonl_path} (python jsonl_index.py build)")
+            build_offset_index(jsonl_path)
+        d = index_dir_of(jsonl_path)
+        load = lambda name: np.load(os.path.join(d, name), mmap_mode="r")
+        self.offsets = load("offsets.npy")
+        self.id_hash = load("id_hash.npy")
+        self.id_line = load("id_line.npy")
+        self.doc_hash = load("doc_hash.npy")
+        self.doc_ptr = load("doc_ptr.npy")
+        self.doc_lines = load("doc_lines.npy")
+        self.path = jsonl_path
+        self._f = open(jsonl_path, "rb")
+        size = os.fstat(self._f.fileno()).st_size
+        self.data = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def line(self, no: int) -> Optional[dict]:
+        raw = self.data[self.offsets[no]:self.offsets[no + 1]].strip()
+        return json.loads(raw) if raw else None
+
+    def get(self, chunk_id: str) -> Optional[dict]:
+        h = np.uint64(key_hash(chunk_id))
+        lo = int(np.searchsorted(self.id_hash, h, side="left"))
+        while lo < len(self.id_hash) and self.id_hash[lo] == h:
+            rec = self.line(int(self.id_line[lo]))
+            if rec is not None and str(rec.get("id")) == chunk_id:
+                return rec
+            lo += 1
+        return None
+
+    def get_many(self, chunk_ids) -> List[Optional[dict]]:
+        return [self.get(c) for c in chunk_ids]
+
+    def line_no(self, chunk_id: str) -> Optional[int]:
+        """Số dòng của id; chỉ decode để so lại khi nhiều id trùng hash."""
+        h = np.uint64(key_hash(chunk_id))
+        lo = int(np.searchsorted(self.id_hash, h, side="left"))
+        hi = int(np.searchsorted(self.id_hash, h, side="right"))
+        if hi - lo == 1:
+            return int(self.id_line[lo])
+        for i in range(lo, hi):
+            rec = self.line(int(self.id_line[i]))
+            if rec is not None and str(rec.get("id")) == chunk_id:
+                return int(self.id_line[i])
+        return None
+
+    def doc_line_nos(self, doc_id: str) -> np.ndarray:
+        """Các dòng của 1 doc_id theo hash (không decode, có thể lẫn doc trùng hash)."""
+        h = np.uint64(key_hash(doc_id))
+        lo = int(np.searchsorted(self.doc_hash, h, side="left"))
+        hi = int(np.searchsorted(self.doc_hash, h, side="right"))
+        if lo == hi:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([self.doc_lines[self.doc_ptr[i]:self.doc_ptr[i + 1]] for i in range(lo, hi)])
+
+    def first_of_doc(self, doc_id: str) -> Optional[dict]:
+        """Chunk đầu của 1 văn bản (meta / quan hệ cấp văn bản): thường chỉ decode 1 dòng."""
+        for no in self.doc_line_nos(doc_id):
+            rec = self.line(int(no))
+            if rec is not None and str(rec.get("doc_id")) == doc_id:
+                return rec
+        return None
+
+    def by_doc(self, doc_id: str) -> List[dict]:
+        """Mọi chunk của 1 văn bản, theo thứ tự trong file."""
+        out = []
+        for no in self.doc_line_nos(doc_id):
+            rec = self.line(int(no))
+            if rec is not None and str(rec.get("doc_id")) == doc_id:
+                out.append(rec)
+        return out
+
+    def __iter__(self) -> Iterator[dict]:
+        for no in range(len(self)):
+            rec = self.line(no)
+            if rec is not None:
+                yield rec
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._f.close()
+
+
+# ========= 4. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build")
+    p_build.add_argument("--jsonl", required=True)
+    p_get = sub.add_parser("get")
+    p_get.add_argument("--jsonl", required=True)
+    p_get.add_argument("--id", required=True)
+    p_doc = sub.add_parser("doc")
+    p_doc.add_argument("--jsonl", required=True)
+    p_doc.add_argument("--doc-id", required=True)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build_offset_index(args.jsonl)
+    elif args.cmd == "get":
+        print(json.dumps(JsonlReader(args.jsonl).get(args.id), ensure_ascii=False, indent=2))
+    else:
+        for rec in JsonlReader(args.jsonl).by_doc(args.doc_id):
+            print(json.dumps({k: rec.get(k) for k in ("id", "section_title")}, ensure_ascii=False))
@@ -0,0 +1,130 @@
+# loadtest_service.py
+# -*- coding: utf-8 -*-
+"""
+Bắn tải vào retrieval_service.py, báo p50/p90/p99 độ trễ + QPS theo từng endpoint.
+
+- câu truy vấn lấy từ section_title / đầu text của corpus (hoặc file --queries, 1 câu/dòng)
+- --hot-ratio: tỉ lệ request dùng lại 1 nhóm nhỏ câu "nóng" (đo tác dụng LRU)
+- --mix: tỉ lệ search:chunk:status
+- cuối cùng in /stats của dịch vụ (cache hit rate, kích thước lô)
+
+Chạy:
+    python loadtest_service.py --url http://127.0.0.1:8765 --corpus chunks_with_meta.jsonl \
+        --requests 5000 --concurrency 32
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+from urllib.parse import urlencode
+
+import numpy as np
+from aiohttp import ClientSession, TCPConnector
+
+# ========= 1. CẤU HÌNH =========
+N_QUERIES = 2000            # số câu mẫu lấy từ corpus
+HOT_QUERIES = 50
+
+
+def sample_workload(corpus_path: str, queries_path: str = None, n: int = N_QUERIES, seed: int = 0):
+    """(câu truy vấn, chunk id, doc_id) lấy mẫu ngẫu nhiên đều từ corpus (reservoir)."""
+    rng = random.Random(seed)
+    queries, ids, doc_ids = [], [], []
+    if corpus_path:
+        with open(corpus_path, "r", encoding="utf-8") as f:
+            for i, line in enumerate(f):
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                item = (" ".join((rec.get("text") or "").split()[:12]), rec.get("id"), rec.get("doc_id"))
+                if len(ids) < n:
+                    queries.append(item[0])
+                    ids.append(item[1])
+                    doc_ids.append(item[2])
+                else:
+                    j = rng.randrange(i + 1)
+                    if j < n:
+                        queries[j], ids[j], doc_ids[j] = item
+    if queries_path:
+        with open(queries_path, "r", encoding="utf-8") as f:
+            queries = [ln.strip() for ln in f if ln.strip()]
+    return queries, ids, doc_ids
+
+
+def make_requests(total: int, queries, ids, doc_ids, mix, hot_ratio: float, seed: int = 0):
+    rng = random.Random(seed)
+    hot = queries[:HOT_QUERIES]
+    kinds = ["search", "chunk", "status"]
+    weights = [w if (k == "search" and queries) or (k != "search" and ids) else 0 for k, w in zip(kinds, mix)]
+    out = []
+    for _ in range(total):
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "search":
+            q = rng.choice(hot) if hot and rng.random() < hot_ratio else rng.choice(queries)
+            out.append((kind, "/search?" + urlencode({"q": q})))
+        elif kind == "chunk":
+            out.append((kind, "/chunk?" + urlencode({"id": rng.choice(ids)})))
+        else:
+            out.append((kind, "/status?" + urlencode({"doc_id": rng.choice(doc_ids)})))
+    return out
+
+
+async def run_load(url: str, reqs, concurrency: int):
+    lat = {}
+    errors = 0
+    it = iter(reqs)
+
+    async def worker(session):
+        nonlocal errors
+        for kind, path in it:
+            t0 = time.perf_counter()
+            try:
+                async with session.get(url + path) as resp:
+                    await resp.read()
+                    if resp.status >= 500:
+                        errors += 1
+            except Exception:
+                errors += 1
+                continue
+            lat.setdefault(kind, []).append((time.perf_counter() - t0) * 1000)
+
+    async with ClientSession(connector=TCPConnector(limit=concurrency)) as session:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        async with session.get(url + "/stats") as resp:
+            stats = await resp.json()
+    return lat, errors, elapsed, stats
+
+
+def report(lat, errors: int, elapsed: float, stats: dict):
+    total = sum(len(v) for v in lat.values())
+    print(f"[LOAD] {total} request OK, {errors} lỗi trong {elapsed:.2f}s -> {total / elapsed:.1f} QPS")
+    for kind, arr in sorted(lat.items()):
+        a = np.asarray(arr)
+        print(f"  {kind:7s} n={len(a):6d}  p50={np.percentile(a, 50):7.2f}ms  p90={np.percentile(a, 90):7.2f}ms  "
+              f"p99={np.percentile(a, 99):7.2f}ms  max={a.max():7.2f}ms")
+    print(f"[SERVICE] cache {stats.get('cache')}, batching {stats.get('batching')}")
+
+
+# ========= 2. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--corpus", default=None, help="lấy câu truy vấn / id từ corpus")
+    parser.add_argument("--queries", default=None, help="file câu truy vấn, 1 câu/dòng")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default="8:1:1", help="search:chunk:status")
+    parser.add_argument("--hot-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    queries, ids, doc_ids = sample_workload(args.corpus, args.queries, seed=args.seed)
+    if not queries and not ids:
+        raise SystemExit("cần --corpus hoặc --queries")
+    mix = [float(x) for x in args.mix.split(":")]
+    reqs = make_requests(args.requests, queries, ids, doc_ids, mix, args.hot_ratio, args.seed)
+    report(*asyncio.run(run_load(args.url.rstrip("/"), reqs, args.concurrency)))
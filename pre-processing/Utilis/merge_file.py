@@ -6,98 +6,90 @@ Kết quả: 1 file JSONL, mỗi dòng là 1 chunk (theo Điều) + metadata đ
 """
 
 import os
-import re
 import json
 from glob import glob
 
-# ========= 1. HÀM ĐỌC DOC/DOCX BẰNG WINDOWS WORD / PYTHON-DOCX =========
-# yêu cầu: pip install pywin32 python-docx
-import win32com.client
-from docx import Document
+from doc_utils import split_by_dieu, normalize_doc_id     # noqa: F401  (giữ import cũ từ merge_file)
+
+# ========= 1. BACKEND ĐỌC FILE (import lười) =========
+# backend nặng / chỉ có trên Windows -> import ở lần gặp định dạng đó đầu tiên, nên
+# import merge_file (hoặc chỉ dùng split_by_dieu / normalize_doc_id) chạy được trên Linux.
+#   .docx -> docx_stream (lxml)     .pdf -> pdf_extract (pypdf)
+#   .doc  -> Word COM (pywin32, Windows); không có thì LibreOffice headless nếu cài sẵn
+def _read_docx(path: str) -> str:
+    from docx_stream import docx_text
+    return docx_text(path)
+
+
+def _read_pdf(path: str) -> str:
+    from pdf_extract import pdf_text
+    return pdf_text(path)
+
+
+def _read_doc_soffice(path: str) -> str:
+    """.doc -> .docx bằng LibreOffice headless (Linux) rồi đọc như .docx."""
+    import shutil, tempfile, subprocess
+    exe = shutil.which("soffice") or shutil.which("libreoffice")
+    if exe is None:
+        raise RuntimeError(f"đọc .doc cần Word (pip install pywin32, Windows) hoặc LibreOffice: {path}")
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run([exe, "--headless", "--convert-to", "docx", "--outdir", tmp, path],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return _read_docx(os.path.join(tmp, os.path.splitext(os.path.basename(path))[0] + ".docx"))
+
+
+def _read_doc(path: str) -> str:
+    try:
+        import win32com.client
+    except ImportError:
+        return _read_doc_soffice(path)
+    word = win32com.client.Dispatch("Word.Application")
+    word.Visible = False
+    try:
+        doc = word.Documents.Open(path)
+        text = doc.Content.Text
+        doc.Close()
+    finally:
+        word.Quit()
+    return text
+
+
+EXTRACTORS = {".docx": _read_docx, ".doc": _read_doc, ".pdf": _read_pdf}
+
+
+def register_extractor(ext: str, fn):
+    """Thêm / thay backend cho 1 đuôi file: fn(path) -> text."""
+    EXTRACTORS[ext.lower()] = fn
 
 
 def load_doc_text(doc_path: str) -> str:
     """
-    Đọc nội dung văn bản:
-    - .docx -> dùng python-docx
-    - .doc  -> dùng Word COM
-    - .pdf  -> tạm bỏ qua (return "")
-    """
-    ext = os.path.splitext(doc_path)[1].lower()
-
-    # đọc .docx
-    if ext == ".docx":
-        doc = Document(doc_path)
-        paras = [p.text for p in doc.paragraphs]
-        return "\n".join(paras)
-
-    # đọc .doc bằng Word COM
-    if ext == ".doc":
-        word = win32com.client.Dispatch("Word.Application")
-        word.Visible = False
-        try:
-            doc = word.Documents.Open(doc_path)
-            text = doc.Content.Text
-            doc.Close()
-        finally:
-            word.Quit()
-        return text
-
-    # nếu là pdf hoặc format khác thì bỏ qua
-    if ext == ".pdf":
-        print(f"[WARN] bỏ qua PDF: {doc_path}")
-        return ""
-
-    raise ValueError(f"Không đọc được định dạng: {doc_path}")
-
-
-# ========= 2. TÁCH THEO "ĐIỀU ..." =========
-def split_by_dieu(full_text: str):
-    """
-    Tách văn bản thành các đoạn theo mẫu 'Điều <số>'
-    Trả về list[(heading, body)]
-    """
-    text = full_text.replace("\r\n", "\n").replace("\r", "\n")
-    pattern = r"(?=^Điều\s+\d+[.\s])"
-    parts = re.split(pattern, text, flags=re.MULTILINE)
-
-    chunks = []
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-        first_nl = part.find("\n")
-        if first_nl != -1:
-            heading = part[:first_nl].strip()
-            body = part[first_nl + 1:].strip()
-        else:
-            heading = part
-            body = ""
-        chunks.append((heading, body))
-    return chunks
-
-
-# ========= 3. CHUẨN HÓA DOC_ID =========
-def normalize_doc_id(symbol: str, fallback: str) -> str:
+    Đọc nội dung văn bản theo đuôi file (xem EXTRACTORS):
+    - .docx -> docx_stream (đoạn văn + dòng bảng "| ô | ô |", theo thứ tự văn bản)
+    - .doc  -> Word COM (Windows) hoặc LibreOffice headless
+    - .pdf  -> pdf_extract (song song theo trang, cache theo hash file; bản scan trả "" kèm cảnh báo)
     """
-    Ưu tiên dùng Số hiệu làm doc_id.
-    Nếu không có thì dùng tên file.
-    """
-    if symbol:
-        s = symbol.strip().upper()
-        s = s.replace("–", "-").replace("—", "-")
-        s = s.replace("NÐ", "NĐ")
-        return s
-    return fallback
+    fn = EXTRACTORS.get(os.path.splitext(doc_path)[1].lower())
+    if fn is None:
+        raise ValueError(f"Không đọc được định dạng: {doc_path}")
+    return fn(doc_path)
 
 
-# ========= 4. HÀM CHÍNH =========
-def build_chunks(root_raw_dir: str, out_path: str):
+# ========= 2. HÀM CHÍNH =========
+def build_chunks(root_raw_dir: str, out_path: str, dedupe_map_path: str = None):
     """
     root_raw_dir: thư mục 'raw' chứa các thư mục thành viên
     out_path: file jsonl đầu ra
+    dedupe_map_path: (tùy chọn) file do dedupe.py docs tạo ra,
+                     văn bản không phải bản chuẩn sẽ bị bỏ qua
     """
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+    duplicates = {}
+    if dedupe_map_path:
+        with open(dedupe_map_path, "r", encoding="utf-8") as f:
+            duplicates = json.load(f).get("documents", {})
+        print(f"[INFO] dedupe map: bỏ qua {len(duplicates)} văn bản trùng")
     out_f = open(out_path, "w", encoding="utf-8")
 
     # lấy danh sách các folder thành viên
@@ -127,6 +119,11 @@ def build_chunks(root_raw_dir: str, out_path: str):
             base_name = os.path.splitext(os.path.basename(doc_path))[0]
             json_path = os.path.join(json_dir, base_name + ".json")
 
+            dup_of = duplicates.get(f"{member}/{base_name}")
+            if dup_of:
+                print(f"[DUP] {member}/{base_name} trùng với {dup_of}, bỏ qua")
+                continue
+
             if not os.path.exists(json_path):
                 print(f"[WARN] {member}: không tìm thấy JSON cho {base_name}, bỏ qua")
                 continue
@@ -194,10 +191,11 @@ def build_chunks(root_raw_dir: str, out_path: str):
     print(f"[DONE] đã tạo file: {out_path}")
 
 
-# ========= 5. CHẠY =========
+# ========= 3. CHẠY =========
 if __name__ == "__main__":
     # ⚠️ NHỚ sửa lại 2 dòng này cho đúng đường dẫn của bạn
     ROOT_RAW = r"D:\crawl_web\out_luocdo\raw"
     OUT_FILE = r"D:\crawl_web\out_luocdo\processed\chunks_with_meta.jsonl"
+    DEDUPE_MAP = None   # vd r"D:\crawl_web\out_luocdo\processed\dedupe_map.json" (dedupe.py docs)
 
-    build_chunks(ROOT_RAW, OUT_FILE)
+    build_chunks(ROOT_RAW, OUT_FILE, DEDUPE_MAP)
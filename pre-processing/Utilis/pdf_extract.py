@@ -0,0 +1,209 @@
+# pdf_extract.py
+# -*- coding: utf-8 -*-
+"""
+Trích text từ PDF cho merge_file.load_doc_text (trước đây PDF bị bỏ qua).
+
+- song song theo trang: PDF nhiều trang chia thành các dải trang, chạy trên
+  ProcessPoolExecutor (mỗi tiến trình mở PdfReader 1 lần cho mỗi file)
+- nối dòng theo bố cục: bỏ header/footer lặp lại + số trang, nối dòng bị ngắt
+  giữa câu, giữ xuống dòng trước "Điều N.", "Chương", "1.", "a)"... để
+  split_by_dieu vẫn tách đúng
+- cache theo sha1 nội dung file (CACHE_DIR/<sha1>.v<N>.txt): mỗi PDF chỉ parse 1 lần,
+  đổi thuật toán nối dòng thì tăng EXTRACT_VERSION
+
+Chạy trước để làm nóng cache:
+    python pdf_extract.py --dir ../../out_luocdo/raw --workers 4
+    python pdf_extract.py --file abc.pdf --print
+"""
+
+import os
+import re
+import atexit
+import hashlib
+import argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from typing import List
+
+from pypdf import PdfReader
+
+# ========= 1. CẤU HÌNH =========
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pdf_cache")
+EXTRACT_VERSION = 1
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PARALLEL_MIN_PAGES = 16         # ít trang hơn thì đọc tuần tự (khởi động pool không đáng)
+PAGES_PER_TASK = 8
+HEADER_FOOTER_RATIO = 0.5       # dòng đầu/cuối trang lặp lại ở >= 50% số trang -> header/footer
+
+# dòng bắt đầu 1 đơn vị cấu trúc -> luôn xuống dòng trước nó
+_STRUCT_RE = re.compile(
+    r"^(Điều\s+\d+|Chương\s+[IVXLCDM\d]+|Mục\s+\d+|Phần\s+(thứ\s+)?\w+|PHỤ\s+LỤC|Phụ\s+lục"
+    r"|\d+(\.\d+)*\.\s|\d+\)\s|[a-zđ]\)\s|[-–•+*]\s)"
+)
+# dòng tiêu đề (Điều / Chương / Mục) đứng riêng 1 dòng: split_by_dieu lấy dòng đầu làm heading
+_HEADING_RE = re.compile(r"^(Điều\s+\d+|Chương\s+[IVXLCDM\d]+|Mục\s+\d+)")
+_END_RE = re.compile(r"[.:;!?…]['\")\]]?$")
+_PAGE_NO_RE = re.compile(r"^(trang\s+)?\d+(\s*/\s*\d+)?$", re.IGNORECASE)
+# "…được quy định. Điều 5. Phạm vi" (pypdf dồn 2 dòng) -> tách lại trước tiêu đề Điều
+_INLINE_DIEU_RE = re.compile(r"(?<=[.;:])\s+(?=Điều\s+\d+\.\s)")
+
+
+# ========= 2. NỐI DÒNG =========
+def _norm(line: str) -> str:
+    return re.sub(r"\d+", "#", line.strip().lower())
+
+
+def strip_headers_footers(pages: List[List[str]]) -> List[List[str]]:
+    """Bỏ số trang và dòng đầu/cuối trang lặp lại (tên cơ quan, 'Công báo số ...')."""
+    pages = [[ln for ln in p if ln.strip()] for p in pages]
+    repeated = set()
+    if len(pages) >= 3:
+        edges = Counter()
+        for p in pages:
+            edges.update({_norm(ln) for ln in p[:2] + p[-2:]})
+        repeated = {k for k, c in edges.items() if c >= HEADER_FOOTER_RATIO * len(pages)}
+    out = []
+    for p in pages:
+        keep = []
+        for i, ln in enumerate(p):
+            edge = i < 2 or i >= len(p) - 2
+            if edge and (_PAGE_NO_RE.match(ln.strip()) or _norm(ln) in repeated):
+                continue
+            keep.append(ln)
+        out.append(keep)
+    return out
+
+
+def _is_caps(line: str) -> bool:
+    letters = [c for c in line if c.isalpha()]
+    return bool(letters) and all(c.isupper() for c in letters)
+
+
+def join_lines(lines: List[str]) -> str:
+    """Nối các dòng bị ngắt do khổ giấy thành đoạn; giữ ranh giới cấu trúc."""
+    paras: List[str] = []
+    for raw in lines:
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        if paras:
+            prev = paras[-1]
+            starts_new = (
+                _STRUCT_RE.match(line)
+                or _HEADING_RE.match(prev)
+                or (_END_RE.search(prev) and not line[0].islower())
+                or _is_caps(prev) != _is_caps(line)      # tiêu đề in hoa <-> nội dung
+            )
+            if not starts_new:
+                paras[-1] = prev[:-1] + line if prev.endswith("-") and line[0].islower() else prev + " " + line
+                continue
+        paras.append(line)
+    return _INLINE_DIEU_RE.sub("\n", "\n".join(paras))
+
+
+# ========= 3. ĐỌC TRANG (chạy trong tiến trình con) =========
+_reader = None
+_reader_path = None
+
+
+def _open(path: str) -> PdfReader:
+    global _reader, _reader_path
+    if _reader_path != path:
+        _reader = PdfReader(path)
+        if _reader.is_encrypted:
+            _reader.decrypt("")
+        _reader_path = path
+    return _reader
+
+
+def _extract_pages(path: str, start: int, end: int) -> List[List[str]]:
+    reader = _open(path)
+    out = []
+    for i in range(start, end):
+        try:
+            text = reader.pages[i].extract_text() or ""
+        except Exception as e:
+            print(f"[WARN] {path} trang {i + 1}: {e}")
+            text = ""
+        out.append(text.splitlines())
+    return out
+
+
+# ========= 4. POOL + CACHE =========
+_pool = None
+
+
+def get_pool(workers: int = WORKERS) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        atexit.register(shutdown_pool)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def extract_pdf(path: str, parallel: bool = True) -> str:
+    """Trích + nối dòng, không qua cache."""
+    n = len(_open(path).pages)
+    if parallel and n >= PARALLEL_MIN_PAGES:
+        ranges = [(s, min(s + PAGES_PER_TASK, n)) for s in range(0, n, PAGES_PER_TASK)]
+        pool = get_pool()
+        pages = []
+        for part in pool.map(_extract_pages, [path] * len(ranges), *zip(*ranges)):
+            pages.extend(part)
+    else:
+        pages = _extract_pages(path, 0, n)
+    lines = [ln for p in strip_headers_footers(pages) for ln in p]
+    return join_lines(lines)
+
+
+def pdf_text(path: str, cache_dir: str = CACHE_DIR, parallel: bool = True) -> str:
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{file_sha1(path)}.v{EXTRACT_VERSION}.txt")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+    text = extract_pdf(path, parallel)
+    if not text.strip():
+        print(f"[WARN] {path}: PDF không có lớp text (bản scan, cần OCR)")
+    tmp = cache_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, cache_path)
+    return text
+
+
+# ========= 5. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", help="quét đệ quy *.pdf, ghi cache")
+    parser.add_argument("--file")
+    parser.add_argument("--cache", default=CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--print", action="store_true", help="in text (--file)")
+    args = parser.parse_args()
+
+    get_pool(args.workers)
+    paths = [args.file] if args.file else sorted(glob(os.path.join(args.dir, "**", "*.pdf"), recursive=True))
+    for p in paths:
+        text = pdf_text(p, args.cache)
+        if args.print:
+            print(text)
+        else:
+            print(f"[OK] {p}: {len(text)} ký tự")
+    shutdown_pool()
@@ -0,0 +1,339 @@
+# retrieval_service.py
+# -*- coding: utf-8 -*-
+"""
+Dịch vụ tra cứu chạy nền trên localhost: nạp corpus chunk + chỉ mục 1 lần,
+các script phân tích gọi HTTP thay vì tự nạp lại.
+
+- GET  /search?q=...&k=5            BM25 (risk_scoring index), trả id/score/heading/status
+- POST /search {"queries": [...], "k": 5}   nhiều câu 1 lần
+- GET  /chunk?id=15/2021/NĐ-CP:12   1 chunk (JsonlReader, O(1))
+- GET  /relations?doc_id=...        relations_sections khác rỗng + content_connection
+- GET  /status?doc_id=... | ?q=<trích dẫn>   tình trạng, bị thay thế / sửa đổi bởi,
+                                    lần theo chuỗi thay thế tới văn bản đang có hiệu lực
+- GET  /stats                       cache hit, kích thước batch, số request
+Các truy vấn search đến cùng lúc được gom thành lô nhỏ (MicroBatcher) rồi chấm điểm
+chung 1 lượt (ChunkRetriever.search_batch: mỗi bucket posting đọc 1 lần cho cả lô) trong
+thread pool; kết quả nóng nằm trong LRU theo câu truy vấn đã chuẩn hóa.
+Tham số sai (k không phải số, body POST không phải JSON / thiếu queries) -> 400.
+
+Chạy:
+    python risk_scoring.py build --corpus chunks_with_meta.jsonl --index-dir risk_index
+    python retrieval_service.py --index-dir risk_index --port 8765
+    python loadtest_service.py --url http://127.0.0.1:8765 --corpus chunks_with_meta.jsonl
+"""
+
+import os
+import json
+import time
+import asyncio
+import argparse
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from citation_extractor import CitationIndex, extract_citations
+from corpus_model import clean
+from risk_scoring import ChunkRetriever, TOP_K
+
+# ========= 1. CẤU HÌNH =========
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 4096
+BATCH_MAX = 32              # tối đa số truy vấn / lô
+BATCH_WAIT_MS = 2.0         # chờ thêm truy vấn đến cùng lúc trước khi chạy lô
+THREADS = 2
+MAX_K = 50
+STATUS_CHAIN_DEPTH = 5      # số bước tối đa khi lần theo "bị thay thế bởi"
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", q or "").lower().split())
+
+
+def parse_k(k) -> int:
+    """k từ query string / JSON -> int trong [1, MAX_K]; sai kiểu -> ValueError."""
+    if isinstance(k, bool) or not isinstance(k, (int, str)):
+        raise ValueError(f"k phải là số nguyên: {k!r}")
+    return min(max(int(k), 1), MAX_K)
+
+
+# ========= 2. LRU CACHE =========
+class LRUCache:
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+
+# ========= 3. MICRO-BATCH =========
+class MicroBatcher:
+    """
+    submit(item) -> await kết quả. Item đến trong BATCH_WAIT_MS được gom lại, gọi
+    fn(list items) -> list kết quả 1 lần trong executor (không chặn event loop).
+    """
+
+    def __init__(self, fn, executor, max_batch: int = BATCH_MAX, max_wait_ms: float = BATCH_WAIT_MS):
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending = []
+        self._timer = None
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+
+    async def submit(self, item):
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((item, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        self.max_seen = max(self.max_seen, len(batch))
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.fn, [item for item, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for (_, fut), res in zip(batch, results):
+            if not fut.done():
+                fut.set_result(res)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "items": self.items, "max_batch": self.max_seen,
+                "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0}
+
+
+# ========= 4. DỊCH VỤ =========
+class RetrievalService:
+    """Phần xử lý (không phụ thuộc HTTP): dùng được trực tiếp trong script async."""
+
+    def __init__(self, index_dir: str, threads: int = THREADS, cache_size: int = CACHE_SIZE,
+                 batch_max: int = BATCH_MAX, batch_wait_ms: float = BATCH_WAIT_MS):
+        t0 = time.perf_counter()
+        self.retriever = ChunkRetriever(index_dir)
+        self.chunks = self.retriever.chunks
+        self.citations = CitationIndex.from_jsonl(os.path.join(index_dir, "chunks_slim.jsonl"))
+        with open(os.path.join(index_dir, "doc_status.json"), "r", encoding="utf-8") as f:
+            self.doc_status = json.load(f)
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.cache = LRUCache(cache_size)
+        self.batcher = MicroBatcher(self._search_batch, self.executor, batch_max, batch_wait_ms)
+        self._inflight = {}         # câu đang chạy: request trùng chờ chung 1 kết quả
+        self.requests = {}
+        self.started = time.time()
+        print(f"[INIT] nạp {self.retriever.n} chunk, {len(self.doc_status)} văn bản "
+              f"trong {time.perf_counter() - t0:.1f}s")
+
+    def _count(self, name: str):
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    # ---------- search ----------
+    def _hit(self, no: int, score: float) -> dict:
+        rec = self.chunks.line(no) or {}
+        st = self.doc_status.get(rec.get("doc_id")) or {}
+        return {"id": rec.get("id"), "doc_id": rec.get("doc_id"), "score": round(score, 4),
+                "section_title": (rec.get("section_title") or "")[:200], "status": clean(st.get("status"))}
+
+    def _search_batch(self, items):
+        """Chạy trong thread pool: cả lô chấm điểm 1 lượt với k lớn nhất rồi cắt theo k từng câu;
+        câu trùng trong cùng lô chỉ tính 1 lần."""
+        queries = list(dict.fromkeys(q for q, _ in items))
+        k_max = max(k for _, k in items)
+        hits = dict(zip(queries, self.retriever.search_batch(queries, k_max)))
+        return [[self._hit(no, s) for no, s in hits[q][:k]] for q, k in items]
+
+    async def search(self, query: str, k: int = TOP_K):
+        self._count("search")
+        key = (normalize_query(query), parse_k(k))
+        if not key[0]:
+            return []
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        task = self._inflight.get(key)
+        if task is not None:
+            return await asyncio.shield(task)
+        task = self._inflight[key] = asyncio.ensure_future(self.batcher.submit(key))
+        try:
+            res = await task
+        finally:
+            self._inflight.pop(key, None)
+        self.cache.put(key, res)
+        return res
+
+    async def search_many(self, queries, k: int = TOP_K):
+        return await asyncio.gather(*(self.search(q, k) for q in queries))
+
+    # ---------- chunk / quan hệ ----------
+    def chunk(self, chunk_id: str):
+        self._count("chunk")
+        return self.chunks.get(chunk_id)
+
+    def relations(self, doc_id: str):
+        self._count("relations")
+        rec = self.chunks.first_of_doc(doc_id)
+        if rec is None:
+            return None
+        return {
+            "doc_id": doc_id,
+            "relations": {k: v for k, v in (rec.get("relations_sections") or {}).items() if v},
+            "content_connection": rec.get("content_connection") or [],
+        }
+
+    # ---------- tình trạng ----------
+    def _resolve_name(self, text: str):
+        for c in extract_citations(self.citations, text):
+            return c["doc_id"]
+        return None
+
+    def resolve_status(self, doc_id: str = None, text: str = None):
+        """doc_id trực tiếp, hoặc text trích dẫn ('Nghị định 15/2021/NĐ-CP')."""
+        self._count("status")
+        if not doc_id and text:
+            key = ("status", normalize_query(text))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            doc_id = self._resolve_name(text)
+        if not doc_id or doc_id not in self.doc_status:
+            return None
+        st = self.doc_status[doc_id]
+        status = clean(st.get("status")) or ""
+        chain, seen, cur = [], {doc_id}, st
+        # lần theo văn bản thay thế tới văn bản cuối cùng còn biết
+        for _ in range(STATUS_CHAIN_DEPTH):
+            nxt = next((d for d in map(self._resolve_name, cur.get("replaced_by") or []) if d and d not in seen), None)
+            if not nxt or nxt not in self.doc_status:
+                break
+            seen.add(nxt)
+            cur = self.doc_status[nxt]
+            chain.append({"doc_id": nxt, "status": clean(cur.get("status"))})
+        res = {
+            "doc_id": doc_id,
+            "status": status or None,
+            "in_force": status.lower().startswith("còn hiệu lực"),
+            "replaced_by": st.get("replaced_by") or [],
+            "amended_by": st.get("amended_by") or [],
+            "replacement_chain": chain,
+        }
+        if text:
+            self.cache.put(("status", normalize_query(text)), res)
+        return res
+
+    def stats(self) -> dict:
+        return {"uptime_sec": round(time.time() - self.started, 1), "requests": self.requests,
+                "cache": self.cache.stats(), "batching": self.batcher.stats()}
+
+
+# ========= 5. HTTP =========
+def make_app(service: RetrievalService) -> web.Application:
+    def ok(data):
+        return web.json_response(data, dumps=lambda o: json.dumps(o, ensure_ascii=False))
+
+    def not_found(what):
+        return web.json_response({"error": f"không tìm thấy {what}"}, status=404)
+
+    def bad_request(msg):
+        return web.json_response({"error": msg}, status=400, dumps=lambda o: json.dumps(o, ensure_ascii=False))
+
+    async def search(request):
+        try:
+            if request.method == "POST":
+                try:
+                    body = await request.json()
+                except ValueError:
+                    return bad_request("body phải là JSON")
+                if not isinstance(body, dict):
+                    return bad_request('body phải là {"queries": [...], "k": 5}')
+                queries = body.get("queries") or []
+                if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                    return bad_request("queries phải là list chuỗi")
+                k = parse_k(body.get("k", TOP_K))
+                return ok({"results": await service.search_many(queries, k)})
+            q = request.query.get("q", "")
+            k = parse_k(request.query.get("k", TOP_K))
+        except ValueError as e:
+            return bad_request(str(e))
+        return ok({"query": q, "results": await service.search(q, k)})
+
+    async def chunk(request):
+        rec = service.chunk(request.query.get("id", ""))
+        return ok(rec) if rec else not_found("chunk")
+
+    async def relations(request):
+        rec = service.relations(request.query.get("doc_id", ""))
+        return ok(rec) if rec else not_found("văn bản")
+
+    async def status(request):
+        res = service.resolve_status(request.query.get("doc_id"), request.query.get("q"))
+        return ok(res) if res else not_found("văn bản")
+
+    async def stats(request):
+        return ok(service.stats())
+
+    app = web.Application()
+    app.router.add_route("GET", "/search", search)
+    app.router.add_route("POST", "/search", search)
+    app.router.add_get("/chunk", chunk)
+    app.router.add_get("/relations", relations)
+    app.router.add_get("/status", status)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+# ========= 6. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index-dir", required=True, help="thư mục risk_scoring build")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    parser.add_argument("--batch-max", type=int, default=BATCH_MAX)
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    svc = RetrievalService(args.index_dir, args.threads, args.cache_size, args.batch_max, args.batch_wait_ms)
+    web.run_app(make_app(svc), host=args.host, port=args.port, access_log=None)
@@ -0,0 +1,317 @@
+# risk_rules.py
+# -*- coding: utf-8 -*-
+"""
+Luật rủi ro hợp đồng khai báo trong YAML (risk_rules.yaml): thiếu điều khoản bất khả
+kháng, trách nhiệm không giới hạn, phạt vi phạm vượt trần, nơi giải quyết tranh chấp...
+
+- mọi cụm từ của mọi luật được biên dịch vào 1 automaton Aho-Corasick (citation_extractor):
+  mỗi hợp đồng quét đúng 1 lượt dù có bao nhiêu luật, match được gán về điều khoản
+  theo vị trí (risk_scoring.clause_spans)
+- sau lượt quét chỉ còn phép tập hợp (any / all / none) trên id cụm từ + vài predicate
+  nhẹ (percent_gt, annual_percent_gt, contract_types); chỉ luật có cụm kích hoạt
+  trong điều khoản mới được xét
+- căn cứ pháp lý (doc_id + Điều) ánh xạ ra chunk id qua bảng cột corpus_model,
+  kèm tình trạng hiệu lực, kiểm legal_where (mặc định "còn hiệu lực") lúc biên dịch
+- risk_scoring.py run --rules risk_rules.yaml gộp cờ luật vào điểm rủi ro
+
+Chạy:
+    python risk_rules.py check --rules risk_rules.yaml --cols corpus_cols
+    python risk_rules.py scan --rules risk_rules.yaml --contracts hop_dong/ --out rule_flags.jsonl
+    python risk_rules.py bench --rules risk_rules.yaml --contracts hop_dong/
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import unicodedata
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import yaml
+
+from citation_extractor import AhoCorasick, _prepare_text, _is_word_char, iter_contract_texts, collect_contract_paths
+from corpus_model import CorpusTable
+from risk_scoring import normalize_newlines, clause_spans, detect_contract_type
+
+# ========= 1. CẤU HÌNH =========
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_rules.yaml")
+DEFAULT_LEGAL_WHERE = {"status": "còn hiệu lực"}
+CHUNKSIZE = 16
+MAX_EVIDENCE = 3
+PERCENT_WINDOW = 160        # tỉ lệ % phải nằm sau cụm kích hoạt, trong cùng vế câu
+
+# "10%", "8,5 %", "2%/tháng", "20 phần trăm một năm"
+_PERCENT_RE = re.compile(r"(\d+(?:[.,]\d+)?)\s*(?:%|phần\s+trăm)(?:\s*(?:/|một|mỗi|trên)\s*(tháng|năm))?",
+                         re.IGNORECASE)
+_ARTICLE_TITLE_RE = re.compile(r"^\s*Điều\s+(\d+)", re.IGNORECASE)
+_PHRASE_END_RE = re.compile(r"[;\n]|\.\s")
+
+
+def percents(text: str, annual: bool = False):
+    """Các tỉ lệ % trong text; annual=True thì '%/tháng' nhân 12."""
+    out = []
+    for m in _PERCENT_RE.finditer(text):
+        v = float(m.group(1).replace(",", "."))
+        if annual and (m.group(2) or "").lower() == "tháng":
+            v *= 12
+        out.append(v)
+    return out
+
+
+# ========= 2. BIÊN DỊCH =========
+class Rule:
+    __slots__ = ("id", "title", "scope", "absent", "any", "all", "none", "percent_gt",
+                 "annual_percent_gt", "contract_types", "weight", "legal", "legal_where")
+
+    def __init__(self, spec: dict, phrase_id):
+        self.id = spec["id"]
+        self.title = spec.get("title") or self.id
+        self.scope = spec.get("scope", "clause")
+        self.absent = spec.get("when", "present") == "absent"
+        if self.scope not in ("clause", "contract"):
+            raise ValueError(f"luật {self.id}: scope phải là clause / contract")
+        if self.absent and self.scope != "contract":
+            raise ValueError(f"luật {self.id}: when=absent chỉ dùng với scope=contract")
+        if not spec.get("any") and not spec.get("all"):
+            raise ValueError(f"luật {self.id}: cần ít nhất 'any' hoặc 'all'")
+        self.any = frozenset(phrase_id(p) for p in spec.get("any") or ())
+        self.all = frozenset(phrase_id(p) for p in spec.get("all") or ())
+        self.none = frozenset(phrase_id(p) for p in spec.get("none") or ())
+        self.percent_gt = spec.get("percent_gt")
+        self.annual_percent_gt = spec.get("annual_percent_gt")
+        self.contract_types = set(spec.get("contract_types") or ())
+        self.weight = float(spec.get("weight", 1.0))
+        self.legal = [{"doc_id": ref["doc_id"], "article": ref.get("article")} for ref in spec.get("legal") or ()]
+        self.legal_where = spec.get("legal_where", DEFAULT_LEGAL_WHERE)
+
+    def _windows(self, found, text: str):
+        """Đoạn text ngay sau mỗi lần gặp cụm kích hoạt, cắt ở cuối vế câu."""
+        for pid in (self.any | self.all) & found.keys():
+            for pos in found[pid]:
+                w = text[pos:pos + PERCENT_WINDOW]
+                m = _PHRASE_END_RE.search(w)
+                yield w[:m.start()] if m else w
+
+    def matches(self, found, text: str) -> bool:
+        """found: id cụm -> list vị trí (trong text)."""
+        if self.any and self.any.isdisjoint(found):
+            return False
+        if self.all and not self.all.issubset(found):
+            return False
+        if not self.none.isdisjoint(found):
+            return False
+        if self.percent_gt is not None and \
+                not any(v > self.percent_gt for w in self._windows(found, text) for v in percents(w)):
+            return False
+        if self.annual_percent_gt is not None and \
+                not any(v > self.annual_percent_gt for w in self._windows(found, text) for v in percents(w, True)):
+            return False
+        return True
+
+
+class RuleEngine:
+    def __init__(self, specs):
+        self.ac = AhoCorasick()
+        self.phrases = []           # id cụm -> cụm gốc (để in bằng chứng)
+        self.rules = []
+        ids = set()
+        for spec in specs:
+            rule = Rule(spec, self._phrase_id)
+            if rule.id in ids:
+                raise ValueError(f"trùng id luật: {rule.id}")
+            ids.add(rule.id)
+            self.rules.append(rule)
+        self.ac.build()
+        # id cụm -> các luật điều khoản mà cụm đó có thể kích hoạt
+        self.triggers = {}
+        for rule in self.rules:
+            if rule.scope == "clause":
+                for pid in rule.any | rule.all:
+                    self.triggers.setdefault(pid, []).append(rule)
+        self.contract_rules = [r for r in self.rules if r.scope == "contract"]
+
+    def _phrase_id(self, phrase: str) -> int:
+        pid = self.ac.add(_prepare_text(" ".join(str(phrase).split())))
+        if pid == len(self.phrases):
+            self.phrases.append(phrase)
+        return pid
+
+    @classmethod
+    def from_yaml(cls, path: str = RULES_PATH) -> "RuleEngine":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(yaml.safe_load(f).get("rules") or [])
+
+    # ---------- căn cứ pháp lý ----------
+    def link_legal(self, corpus: CorpusTable):
+        """Gắn chunk_ids + status cho từng căn cứ; trả list cảnh báo (thiếu văn bản / không thỏa legal_where)."""
+        warnings = []
+        by_doc = {}
+        for rule in self.rules:
+            mask = corpus.doc_mask(**rule.legal_where) if rule.legal_where else None
+            for ref in rule.legal:
+                row = corpus.doc_row(ref["doc_id"])
+                if row is None:
+                    ref["chunk_ids"] = []
+                    warnings.append(f"{rule.id}: không có {ref['doc_id']} trong corpus")
+                    continue
+                if row not in by_doc:
+                    by_doc[row] = np.flatnonzero(corpus.chunk_doc == row)
+                rows = by_doc[row]
+                if ref["article"] is not None:
+                    rows = [i for i in rows if _article_of(corpus.section_title(int(i))) == ref["article"]]
+                ref["chunk_ids"] = [f"{ref['doc_id']}:{int(corpus.chunk_index[i])}" for i in rows]
+                ref["status"] = corpus.cats["status"][int(corpus.docs["status"][row])]
+                if not ref["chunk_ids"]:
+                    warnings.append(f"{rule.id}: không thấy Điều {ref['article']} của {ref['doc_id']}")
+                if mask is not None and not mask[row]:
+                    warnings.append(f"{rule.id}: căn cứ {ref['doc_id']} không thỏa {rule.legal_where} "
+                                    f"(tình trạng: {ref['status']})")
+        return warnings
+
+    # ---------- quét ----------
+    def _flag(self, rule: Rule, clause, found):
+        return {"type": "risk_rule", "rule": rule.id, "detail": rule.title, "clause": clause,
+                "weight": rule.weight, "legal": rule.legal,
+                "evidence": [self.phrases[p] for p in sorted((rule.any | rule.all) & found.keys())][:MAX_EVIDENCE]}
+
+    def scan(self, text: str, contract_type: str = None):
+        """1 lượt Aho-Corasick trên cả hợp đồng -> list cờ (clause = chỉ số điều khoản / None)."""
+        # NFC trước khi tách điều khoản: _prepare_text cũng NFC, input NFD (dấu tách rời) đổi độ dài ->
+        # điều khoản, offset match và lát cắt text[s:e] phải cùng 1 hệ tọa độ
+        text = unicodedata.normalize("NFC", normalize_newlines(text))
+        spans = clause_spans(text)
+        starts = [s for s, _ in spans]
+        prepared = _prepare_text(text)
+        n = len(prepared)
+        found = [{} for _ in spans]          # mỗi điều khoản: id cụm -> vị trí (tính từ đầu điều khoản)
+        for s, e, pid in self.ac.iter_matches(prepared):
+            if (s > 0 and _is_word_char(prepared[s - 1])) or (e < n and _is_word_char(prepared[e])):
+                continue
+            ci = bisect_right(starts, s) - 1
+            found[ci].setdefault(pid, []).append(s - starts[ci])
+
+        ctype = contract_type or detect_contract_type(text)
+        applies = lambda r: not r.contract_types or ctype in r.contract_types
+        flags = []
+        for ci, ((s, e), fs) in enumerate(zip(spans, found)):
+            seen = set()
+            for pid in fs:
+                for rule in self.triggers.get(pid, ()):
+                    if rule.id in seen:
+                        continue
+                    seen.add(rule.id)
+                    if applies(rule) and rule.matches(fs, text[s:e]):
+                        flags.append(self._flag(rule, ci, fs))
+        if self.contract_rules:
+            all_found = {}
+            for (s, _), fs in zip(spans, found):
+                for pid, pos in fs.items():
+                    all_found.setdefault(pid, []).extend(p + s for p in pos)
+            for rule in self.contract_rules:
+                if applies(rule) and rule.matches(all_found, text) != rule.absent:
+                    flags.append(self._flag(rule, None, all_found))
+        return flags
+
+
+def _article_of(section_title: str):
+    m = _ARTICLE_TITLE_RE.match(section_title or "")
+    return int(m.group(1)) if m else None
+
+
+def load_engine(rules_path: str = RULES_PATH, cols_dir: str = None, verbose: bool = True) -> RuleEngine:
+    engine = RuleEngine.from_yaml(rules_path)
+    if cols_dir:
+        for w in engine.link_legal(CorpusTable.open(cols_dir)):
+            if verbose:
+                print(f"[WARN] {w}")
+    return engine
+
+
+# ========= 3. CHẠY THEO LÔ =========
+_state = {}
+
+
+def _init_worker(rules_path: str, cols_dir: str = None):
+    if _state.get("key") == (rules_path, cols_dir):
+        return
+    _state["engine"] = load_engine(rules_path, cols_dir, verbose=False)
+    _state["key"] = (rules_path, cols_dir)
+
+
+def _scan_path(path: str):
+    for p, text in iter_contract_texts([path]):
+        flags = _state["engine"].scan(text)
+        return {"contract": p, "risk_score": sum(f["weight"] for f in flags), "flags": flags}
+    return {"contract": path, "error": "không đọc được"}
+
+
+def run_batch(rules_path: str, paths, out_path: str, cols_dir: str = None, workers: int = None):
+    _init_worker(rules_path, cols_dir)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    t0 = time.perf_counter()
+    done = 0
+    with open(out_path, "w", encoding="utf-8") as fout, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules_path, cols_dir)) as pool:
+        for res in pool.map(_scan_path, paths, chunksize=CHUNKSIZE):
+            fout.write(json.dumps(res, ensure_ascii=False) + "\n")
+            done += 1
+    sec = time.perf_counter() - t0
+    print(f"[DONE] {done} hợp đồng trong {sec:.1f}s ({done / max(sec, 1e-9) * 60:.0f} hợp đồng/phút) -> {out_path}")
+
+
+def bench(rules_path: str, paths, repeat: int = 3):
+    """Đo riêng phần quét luật (1 tiến trình, text đã nạp sẵn)."""
+    engine = load_engine(rules_path)
+    texts = [t for _, t in iter_contract_texts(paths)]
+    chars = sum(len(t) for t in texts)
+    n_flags = 0
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            n_flags += len(engine.scan(t))
+    sec = (time.perf_counter() - t0) / repeat
+    print(f"[BENCH] {len(engine.rules)} luật, {len(engine.phrases)} cụm; {len(texts)} hợp đồng "
+          f"({chars / 1e6:.2f}M ký tự) trong {sec:.3f}s -> {len(texts) / max(sec, 1e-9) * 60:.0f} hợp đồng/phút/lõi, "
+          f"{chars / max(sec, 1e-9) / 1e6:.2f}M ký tự/s, {n_flags // repeat} cờ")
+
+
+# ========= 4. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_check = sub.add_parser("check", help="biên dịch luật, kiểm căn cứ pháp lý")
+    p_check.add_argument("--rules", default=RULES_PATH)
+    p_check.add_argument("--cols", default=None, help="thư mục corpus_model.py save")
+
+    p_scan = sub.add_parser("scan")
+    p_scan.add_argument("--rules", default=RULES_PATH)
+    p_scan.add_argument("--cols", default=None)
+    p_scan.add_argument("--contracts", nargs="+", required=True)
+    p_scan.add_argument("--out", required=True)
+    p_scan.add_argument("--workers", type=int, default=None)
+
+    p_bench = sub.add_parser("bench")
+    p_bench.add_argument("--rules", default=RULES_PATH)
+    p_bench.add_argument("--contracts", nargs="+", required=True)
+    p_bench.add_argument("--repeat", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.cmd == "check":
+        engine = load_engine(args.rules, args.cols)
+        print(f"[OK] {len(engine.rules)} luật, {len(engine.phrases)} cụm, {len(engine.ac.goto)} nút automaton")
+        for r in engine.rules:
+            links = ", ".join(f"{ref['doc_id']}"
+                              f"{' Điều ' + str(ref['article']) if ref['article'] else ''}"
+                              f"{' (' + str(len(ref['chunk_ids'])) + ' chunk)' if 'chunk_ids' in ref else ''}"
+                              for ref in r.legal)
+            print(f"  {r.id:32s} {r.scope:8s} w={r.weight:<4} {links}")
+    elif args.cmd == "scan":
+        paths = collect_contract_paths(args.contracts)
+        print(f"[INFO] {len(paths)} hợp đồng cần quét")
+        run_batch(args.rules, paths, args.out, args.cols, args.workers)
+    else:
+        bench(args.rules, collect_contract_paths(args.contracts), args.repeat)
@@ -0,0 +1,459 @@
+# risk_scoring.py
+# -*- coding: utf-8 -*-
+"""
+Chấm rủi ro hợp đồng theo lô trên corpus chunk pháp lý (chunks_with_meta.jsonl).
+
+Gồm 2 bước:
+1. build: đọc corpus 1 lần, ghi chỉ mục BM25 dạng mảng numpy (.npy) + bảng
+   trạng thái văn bản vào 1 thư mục index.
+2. run: mỗi hợp đồng (.docx/.doc/.txt) -> tách điều khoản -> lấy chunk liên quan
+   -> gắn cờ:
+     - điều khoản trích dẫn văn bản đã hết hiệu lực (toàn bộ / một phần) / bị thay thế / bị sửa đổi
+     - thiếu điều khoản bắt buộc theo loại hợp đồng
+     - (tùy chọn --rules) luật rủi ro khai báo trong risk_rules.yaml
+     - (tùy chọn --changes) Điều được trích dẫn đã bị sửa / bãi bỏ sau ngày ký hợp đồng
+   Chạy bằng process pool. Chỉ mục được mở bằng np.load(mmap_mode="r") nên các
+   worker dùng chung page cache của OS, không nạp lại corpus cho từng hợp đồng.
+   Text chunk đọc qua jsonl_index.JsonlReader (theo số dòng / id / doc_id).
+
+Chạy:
+    python risk_scoring.py build --corpus chunks_with_meta.jsonl --index-dir risk_index
+    python risk_scoring.py run --index-dir risk_index --contracts ../mau_hop_dong --out risk.jsonl
+    python risk_scoring.py run --index-dir risk_index --contracts ../mau_hop_dong --out risk.jsonl \
+        --rules risk_rules.yaml --cols corpus_cols
+"""
+
+import os
+import re
+import json
+import zlib
+import math
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from citation_extractor import CitationIndex, extract_citations, iter_contract_texts, collect_contract_paths
+from jsonl_index import JsonlReader, OffsetIndexWriter
+
+# ========= 1. CẤU HÌNH =========
+N_BUCKETS = 1 << 20         # hashing trick: term -> bucket, không cần vocab
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOP_K = 5
+CHUNKSIZE = 8               # số hợp đồng gửi cho worker mỗi lần
+SEARCH_BATCH_CELLS = 1 << 24  # search_batch: tối đa số câu * số chunk mỗi ma trận điểm (float32 ~ 64MB)
+
+# section quan hệ (xem relations_sections do crawler lưu)
+REPLACED_BY_KEY = "replaceDocument"     # "Văn bản thay thế" -> văn bản này đã bị thay
+AMENDED_BY_KEY = "amendDocument"        # "Văn bản sửa đổi bổ sung" -> văn bản này đã bị sửa
+
+RISK_WEIGHTS = {
+    "cites_expired": 3.0,
+    "cites_partially_expired": 1.5,     # "Hết hiệu lực một phần": chỉ một số điều bị bãi bỏ
+    "cites_replaced": 3.0,
+    "cites_amended": 1.0,
+    "missing_clause": 2.0,
+    "cites_changed_article": 1.5,
+}
+
+# loại hợp đồng -> từ khóa nhận diện (trong phần đầu văn bản) + nhóm điều khoản bắt buộc
+# (theo nội dung hợp đồng về nhà ở - Luật Nhà ở, Bộ luật Dân sự)
+CONTRACT_TYPES = {
+    "thue_nha": {
+        "keywords": ["hợp đồng thuê", "hợp đồng cho thuê"],
+        "mandatory": {
+            "doi_tuong": ["đối tượng", "diện tích", "đặc điểm"],
+            "gia_thue": ["giá thuê", "giá cho thuê", "tiền thuê"],
+            "thanh_toan": ["thanh toán"],
+            "thoi_han": ["thời hạn thuê", "thời hạn cho thuê", "thời hạn hợp đồng"],
+            "ban_giao": ["bàn giao", "giao nhận"],
+            "quyen_nghia_vu": ["quyền và nghĩa vụ", "nghĩa vụ của bên", "quyền của bên"],
+            "cham_dut": ["chấm dứt hợp đồng", "đơn phương chấm dứt"],
+            "tranh_chap": ["tranh chấp"],
+        },
+    },
+    "mua_ban_nha": {
+        "keywords": ["hợp đồng mua bán", "hợp đồng chuyển nhượng"],
+        "mandatory": {
+            "doi_tuong": ["đối tượng", "diện tích", "đặc điểm"],
+            "gia_ban": ["giá bán", "giá chuyển nhượng", "giá mua bán"],
+            "thanh_toan": ["thanh toán"],
+            "ban_giao": ["bàn giao", "giao nhận"],
+            "bao_hanh": ["bảo hành"],
+            "quyen_nghia_vu": ["quyền và nghĩa vụ", "nghĩa vụ của bên", "quyền của bên"],
+            "cham_dut": ["chấm dứt hợp đồng"],
+            "tranh_chap": ["tranh chấp"],
+        },
+    },
+}
+
+_CLAUSE_RE = re.compile(r"(?=^\s*Điều\s+\d+\s*[.:\s])", re.MULTILINE | re.IGNORECASE)
+_TOKEN_RE = re.compile(r"\w+")
+# ngày ký: chỉ nhận ngày đứng sau cụm ký kết ("Hôm nay, ngày ...", "lập ngày", "ký ngày",
+# "ký kết vào ngày") hoặc dòng địa danh đầu hợp đồng ("Hà Nội, ngày ..."); ngày dạng
+# "ngày 12 tháng 3 năm 2021" hoặc "12/03/2021"
+_SIGN_DATE_RE = re.compile(
+    r"(?:hôm\s+nay\s*,?\s*|(?:lập|ký(?:\s+kết)?)\s+(?:vào\s+)?|^[^\S\n]*[^\W\d_]+(?:[^\S\n]+[^\W\d_]+){0,4},[^\S\n]*)"
+    r"(?:ngày\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})|(?:ngày\s+)?(\d{1,2})/(\d{1,2})/(\d{4}))",
+    re.IGNORECASE | re.MULTILINE)
+# ngày của văn bản được viện dẫn, không phải ngày ký: cùng câu có "Căn cứ" / "Kèm theo" / số hiệu văn bản
+_CITED_DATE_RE = re.compile(r"căn\s+cứ|kèm\s+theo|\d+/(?:\d{4}/)?[A-ZĐ][A-ZĐ0-9]*(?:-[A-ZĐ0-9]+)*", re.IGNORECASE)
+
+
+# ========= 2. TÁCH TỪ / ĐIỀU KHOẢN =========
+def tokenize(text: str):
+    """Âm tiết thường + bigram (âm tiết tiếng Việt đơn lẻ quá mơ hồ)."""
+    toks = _TOKEN_RE.findall(text.lower())
+    return toks + [a + "_" + b for a, b in zip(toks, toks[1:])]
+
+
+def bucket_of(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & (N_BUCKETS - 1)
+
+
+def normalize_newlines(text: str) -> str:
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def clause_spans(text: str):
+    """(start, end) của từng đoạn giữa các 'ĐIỀU N' trên text (đã normalize_newlines)."""
+    cuts = sorted({0, len(text)} | {m.start() for m in _CLAUSE_RE.finditer(text)})
+    return list(zip(cuts, cuts[1:]))
+
+
+def split_clauses(text: str):
+    """
+    Tách hợp đồng theo 'ĐIỀU N' (hợp đồng hay viết hoa, khác split_by_dieu).
+    Trả list[(heading, body)]; phần trước Điều 1 là phần mở đầu.
+    """
+    text = normalize_newlines(text)
+    out = []
+    for s, e in clause_spans(text):
+        part = text[s:e].strip()
+        if not part:
+            continue
+        first_nl = part.find("\n")
+        if first_nl != -1:
+            out.append((part[:first_nl].strip(), part[first_nl + 1:].strip()))
+        else:
+            out.append((part, ""))
+    return out
+
+
+def contract_date(text: str) -> int:
+    """Ngày ký (yyyymmdd) theo cụm ký kết đầu tiên (xem _SIGN_DATE_RE), 0 nếu không có cụm nào.
+    Bỏ qua ngày mà phần câu đứng trước có "Căn cứ", "Kèm theo" hoặc số hiệu văn bản."""
+    for m in _SIGN_DATE_RE.finditer(text):
+        head = max(text.rfind(c, 0, m.start()) for c in ".;\n") + 1
+        if _CITED_DATE_RE.search(text, head, m.start()):
+            continue
+        d, mo, y = (m.group(1), m.group(2), m.group(3)) if m.group(1) else (m.group(4), m.group(5), m.group(6))
+        return int(y) * 10000 + int(mo) * 100 + int(d)
+    return 0
+
+
+def detect_contract_type(text: str):
+    head = text[:1500].lower()
+    for ctype, conf in CONTRACT_TYPES.items():
+        if any(k in head for k in conf["keywords"]):
+            return ctype
+    return None
+
+
+# ========= 3. BUILD INDEX =========
+def _doc_status(rec: dict) -> dict:
+    rel = rec.get("relations_sections") or {}
+
+    def names(key):
+        for k, v in rel.items():
+            if k.split(" | ")[0] == key:
+                return [it.get("name") for it in v if it.get("name")]
+        return []
+
+    return {
+        "status": rec.get("status"),
+        "replaced_by": names(REPLACED_BY_KEY),
+        "amended_by": names(AMENDED_BY_KEY),
+    }
+
+
+def build_index(corpus_path: str, index_dir: str):
+    """
+    1 lượt qua corpus, ghi vào index_dir:
+      doc_len.npy       float32[N]  số token mỗi chunk
+      post_ptr.npy      int64[B+1]  con trỏ posting theo bucket
+      post_doc.npy      int32[P]    chunk no
+      post_tf.npy       float32[P]  tần suất term
+      doc_status.json   doc_id -> {status, replaced_by, amended_by}
+      chunks_slim.jsonl chỉ các trường cần cho CitationIndex
+      info.json         đường dẫn corpus + avgdl
+    Cùng lượt đó ghi chỉ mục offset cạnh corpus (<corpus>.idx/, xem jsonl_index.py).
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    offsets = OffsetIndexWriter(corpus_path)
+    doc_len = []
+    postings = {}           # bucket -> list[(chunk_no, tf)]
+    doc_status = {}
+
+    with open(corpus_path, "rb") as f, \
+         open(os.path.join(index_dir, "chunks_slim.jsonl"), "w", encoding="utf-8") as slim:
+        for raw in f:
+            no = len(doc_len)
+            line = raw.strip()
+            if not line:
+                offsets.add(len(raw), None)
+                doc_len.append(0)
+                continue
+            rec = json.loads(line)
+            offsets.add(len(raw), rec)
+            toks = tokenize(rec.get("text") or "")
+            doc_len.append(len(toks))
+            tf = {}
+            for t in toks:
+                b = bucket_of(t)
+                tf[b] = tf.get(b, 0) + 1
+            for b, c in tf.items():
+                postings.setdefault(b, []).append((no, c))
+
+            doc_id = rec["doc_id"]
+            if doc_id not in doc_status:
+                doc_status[doc_id] = _doc_status(rec)
+            slim.write(json.dumps({k: rec.get(k) for k in
+                                   ("id", "doc_id", "chunk_index", "section_title", "symbol", "title", "issued_date")},
+                                  ensure_ascii=False) + "\n")
+
+    ptr = np.zeros(N_BUCKETS + 1, dtype=np.int64)
+    for b, arr in postings.items():
+        ptr[b + 1] = len(arr)
+    np.cumsum(ptr, out=ptr)
+    post_doc = np.empty(ptr[-1], dtype=np.int32)
+    post_tf = np.empty(ptr[-1], dtype=np.float32)
+    for b, arr in postings.items():
+        s = ptr[b]
+        post_doc[s:s + len(arr)] = [a[0] for a in arr]
+        post_tf[s:s + len(arr)] = [a[1] for a in arr]
+
+    offsets.close()
+    np.save(os.path.join(index_dir, "doc_len.npy"), np.asarray(doc_len, dtype=np.float32))
+    np.save(os.path.join(index_dir, "post_ptr.npy"), ptr)
+    np.save(os.path.join(index_dir, "post_doc.npy"), post_doc)
+    np.save(os.path.join(index_dir, "post_tf.npy"), post_tf)
+    with open(os.path.join(index_dir, "doc_status.json"), "w", encoding="utf-8") as f:
+        json.dump(doc_status, f, ensure_ascii=False)
+    avgdl = float(np.mean(doc_len)) if doc_len else 0.0
+    with open(os.path.join(index_dir, "info.json"), "w", encoding="utf-8") as f:
+        json.dump({"corpus": os.path.abspath(corpus_path), "n_chunks": len(doc_len), "avgdl": avgdl}, f)
+    print(f"[DONE] index {len(doc_len)} chunks, {len(post_doc)} postings -> {index_dir}")
+
+
+# ========= 4. TRUY VẤN =========
+class ChunkRetriever:
+    """BM25 trên mảng numpy mở dạng memory-map; đọc text chunk qua JsonlReader (corpus đã mmap)."""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "info.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode="r")
+        self.doc_len = load("doc_len.npy")
+        self.post_ptr = load("post_ptr.npy")
+        self.post_doc = load("post_doc.npy")
+        self.post_tf = load("post_tf.npy")
+        self.n = int(info["n_chunks"])
+        self.avgdl = float(info["avgdl"]) or 1.0
+        self.chunks = JsonlReader(info["corpus"])
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * np.asarray(self.doc_len) / self.avgdl)
+
+    def search(self, text: str, k: int = TOP_K):
+        """Trả list[(chunk_no, score)] top-k."""
+        return self.search_batch([text], k)[0]
+
+    def search_batch(self, texts, k: int = TOP_K):
+        """
+        Nhiều câu 1 lượt: duyệt hợp các bucket của cả lô, mỗi bucket đọc posting và tính
+        điểm BM25 1 lần rồi cộng vào hàng điểm của mọi câu chứa nó. Ma trận điểm
+        [số câu, n] chia theo SEARCH_BATCH_CELLS để không phình RAM khi corpus lớn.
+        """
+        out = []
+        step = max(1, SEARCH_BATCH_CELLS // max(self.n, 1))
+        for start in range(0, len(texts), step):
+            part = texts[start:start + step]
+            users = {}              # bucket -> các câu trong lô có bucket đó
+            for qi, text in enumerate(part):
+                for b in {bucket_of(t) for t in tokenize(text)}:
+                    users.setdefault(b, []).append(qi)
+            scores = np.zeros((len(part), self.n), dtype=np.float32)
+            for b in sorted(users):
+                s, e = self.post_ptr[b], self.post_ptr[b + 1]
+                if s == e:
+                    continue
+                docs = self.post_doc[s:e]
+                tf = self.post_tf[s:e]
+                idf = math.log(1 + (self.n - (e - s) + 0.5) / ((e - s) + 0.5))
+                w = idf * tf * (BM25_K1 + 1) / (tf + self._norm[docs])
+                for qi in users[b]:
+                    scores[qi, docs] += w
+            out.extend(self._top(row, k) for row in scores)
+        return out
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int):
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+    def get_chunk(self, no: int) -> dict:
+        return self.chunks.line(no)
+
+    def get_chunk_by_id(self, chunk_id: str) -> dict:
+        return self.chunks.get(chunk_id)
+
+    def doc_chunks(self, doc_id: str):
+        return self.chunks.by_doc(doc_id)
+
+
+# ========= 5. CHẤM ĐIỂM =========
+_state = {}
+
+
+def _init_worker(index_dir: str, rules_path: str = None, cols_dir: str = None, changes_path: str = None):
+    """Mở index 1 lần cho mỗi worker (với fork thì đã có sẵn từ process cha)."""
+    if _state.get("index_dir") == index_dir:
+        return
+    if changes_path:
+        from version_diff import ChangeIndex
+        _state["changes"] = ChangeIndex(changes_path)
+    if rules_path:
+        from risk_rules import load_engine      # risk_rules import ngược module này
+        _state["rules"] = load_engine(rules_path, cols_dir, verbose=False)
+    _state["retriever"] = ChunkRetriever(index_dir)
+    _state["citations"] = CitationIndex.from_jsonl(os.path.join(index_dir, "chunks_slim.jsonl"))
+    with open(os.path.join(index_dir, "doc_status.json"), "r", encoding="utf-8") as f:
+        _state["doc_status"] = json.load(f)
+    _state["index_dir"] = index_dir
+
+
+def _citation_flags(cite: dict, doc_status: dict, signed: int = 0):
+    st = doc_status.get(cite["doc_id"]) or {}
+    flags = []
+    status = (st.get("status") or "").lower()
+    if status.startswith("hết hiệu lực"):
+        kind = "cites_partially_expired" if "một phần" in status else "cites_expired"
+        flags.append({"type": kind, "doc_id": cite["doc_id"], "detail": st.get("status")})
+    if st.get("replaced_by"):
+        flags.append({"type": "cites_replaced", "doc_id": cite["doc_id"], "detail": st["replaced_by"]})
+    if st.get("amended_by"):
+        flags.append({"type": "cites_amended", "doc_id": cite["doc_id"], "detail": st["amended_by"]})
+    changes = _state.get("changes")
+    if changes and signed and cite["article"] is not None:
+        changed = changes.changed_since(cite["doc_id"], signed, cite["article"], include_undated=False)
+        if changed:
+            flags.append({"type": "cites_changed_article", "doc_id": cite["doc_id"], "article": cite["article"],
+                          "detail": [f"{r['change']} bởi {r['source_doc']} ({r['effective']})" for r in changed]})
+    return flags
+
+
+def score_contract(path: str, text: str) -> dict:
+    retriever = _state["retriever"]
+    cindex = _state["citations"]
+    doc_status = _state["doc_status"]
+
+    clauses = split_clauses(text)
+    signed = contract_date(text)
+    out_clauses = []
+    flags = []
+    for ci, (heading, body) in enumerate(clauses):
+        clause_text = (heading + "\n" + body).strip()
+        hits = retriever.search(clause_text)
+        cites = extract_citations(cindex, clause_text)
+        cflags, flagged = [], set()
+        for c in cites:
+            # 1 văn bản trích nhiều điều -> cờ cấp văn bản (hết hiệu lực, bị thay thế...) chỉ tính 1 lần
+            for fl in _citation_flags(c, doc_status, signed):
+                key = (fl["type"], fl["doc_id"], fl.get("article"))
+                if key not in flagged:
+                    flagged.add(key)
+                    cflags.append(fl)
+        for fl in cflags:
+            fl["clause"] = ci
+        flags += cflags
+        out_clauses.append({
+            "clause": ci,
+            "heading": heading[:200],
+            "top_chunks": [{"id": retriever.get_chunk(no).get("id"), "score": round(s, 3)} for no, s in hits],
+            "citations": [{"doc_id": c["doc_id"], "article": c["article"], "chunk_ids": c["chunk_ids"]} for c in cites],
+            "flags": [fl["type"] for fl in cflags],
+        })
+
+    ctype = detect_contract_type(text)
+    if ctype:
+        low = text.lower()
+        for name, kws in CONTRACT_TYPES[ctype]["mandatory"].items():
+            if not any(k in low for k in kws):
+                flags.append({"type": "missing_clause", "detail": name})
+    if _state.get("rules"):
+        flags += _state["rules"].scan(text, ctype)
+
+    score = sum(fl["weight"] if "weight" in fl else RISK_WEIGHTS.get(fl["type"], 0.0) for fl in flags)
+    return {
+        "contract": path,
+        "contract_type": ctype,
+        "signed_date": signed or None,
+        "n_clauses": len(clauses),
+        "risk_score": score,
+        "flags": flags,
+        "clauses": out_clauses,
+    }
+
+
+def _score_path(path: str):
+    for p, text in iter_contract_texts([path]):
+        return score_contract(p, text)
+    return {"contract": path, "error": "không đọc được"}
+
+
+def run_batch(index_dir: str, paths, out_path: str, workers: int = None, rules_path: str = None,
+              cols_dir: str = None, changes_path: str = None):
+    # nạp trước ở process cha: với fork, worker kế thừa luôn (copy-on-write)
+    _init_worker(index_dir, rules_path, cols_dir, changes_path)
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    done = 0
+    with open(out_path, "w", encoding="utf-8") as fout, \
+         ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(index_dir, rules_path, cols_dir, changes_path)) as pool:
+        for res in pool.map(_score_path, paths, chunksize=CHUNKSIZE):
+            fout.write(json.dumps(res, ensure_ascii=False) + "\n")
+            done += 1
+            if done % 100 == 0:
+                print(f"[INFO] đã chấm {done}/{len(paths)} hợp đồng")
+    print(f"[DONE] {done} hợp đồng -> {out_path}")
+
+
+# ========= 6. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build")
+    p_build.add_argument("--corpus", required=True)
+    p_build.add_argument("--index-dir", required=True)
+
+    p_run = sub.add_parser("run")
+    p_run.add_argument("--index-dir", required=True)
+    p_run.add_argument("--contracts", nargs="+", required=True)
+    p_run.add_argument("--out", required=True)
+    p_run.add_argument("--workers", type=int, default=None)
+    p_run.add_argument("--rules", default=None, help="risk_rules.yaml: thêm cờ theo luật khai báo")
+    p_run.add_argument("--cols", default=None, help="corpus_model save: ánh xạ căn cứ pháp lý ra chunk")
+    p_run.add_argument("--changes", default=None, help="version_diff build: cờ Điều được trích đã đổi sau ngày ký")
+
+    args = parser.parse_args()
+    if args.cmd == "build":
+        build_index(args.corpus, args.index_dir)
+    else:
+        paths = collect_contract_paths(args.contracts)
+        print(f"[INFO] {len(paths)} hợp đồng cần chấm")
+        run_batch(args.index_dir, paths, args.out, args.workers, args.rules, args.cols, args.changes)
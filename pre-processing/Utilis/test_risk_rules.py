@@ -0,0 +1,49 @@
+# test_risk_rules.py
+# -*- coding: utf-8 -*-
+"""
+Hồi quy cho risk_rules: ký tự mà .upper() đổi độ dài (ligature "ﬁ" -> "FI") hoặc text NFD
+(NFC làm ngắn lại) làm lệch vị trí match so với điều khoản -> báo sai "thiếu điều khoản",
+cờ phạt vượt trần rơi sang điều khoản khác hoặc mất hẳn.
+
+Chạy:
+    python -m pytest -q test_risk_rules.py
+"""
+
+import unicodedata
+
+from risk_rules import load_engine
+
+CONTRACT = """HỢP ĐỒNG MUA BÁN HÀNG HÓA
+Điều 1. Phạt vi phạm
+Bên vi phạm chịu mức phạt 12% giá trị phần nghĩa vụ bị vi phạm.
+Điều 2. Bất khả kháng
+Bên gặp sự kiện bất khả kháng được miễn trách nhiệm.
+Điều 3. Giải quyết tranh chấp
+Các bên thương lượng; không thành thì đưa ra Tòa án có thẩm quyền.
+"""
+
+
+def _rules(flags):
+    return {f["rule"] for f in flags}
+
+
+def _penalty_clauses(flags):
+    return [f["clause"] for f in flags if f["rule"] == "penalty_above_cap"]
+
+
+def test_ligature_does_not_shift_matches():
+    engine = load_engine(verbose=False)
+    for text in (CONTRACT, CONTRACT + "ﬁnal"):
+        rules = _rules(engine.scan(text))
+        assert "missing_force_majeure" not in rules
+        assert "missing_dispute_resolution" not in rules
+        assert "penalty_above_cap" in rules
+
+
+def test_nfd_input_keeps_clause_positions():
+    engine = load_engine(verbose=False)
+    nfc = engine.scan(CONTRACT)
+    nfd = engine.scan(unicodedata.normalize("NFD", CONTRACT))
+    assert _penalty_clauses(nfc) == [1]
+    assert _penalty_clauses(nfd) == [1]
+    assert _rules(nfd) == _rules(nfc)
@@ -0,0 +1,401 @@
+# version_diff.py
+# -*- coding: utf-8 -*-
+"""
+So sánh các phiên bản văn bản trong corpus chunk (chunks_with_meta.jsonl), tính sẵn
+bản ghi thay đổi theo từng Điều để tra nhanh "Điều nào đã đổi sau ngày X".
+
+Cặp phiên bản lấy từ relations_sections (link giải theo id trong URL, không có thì
+theo tên qua citation_extractor):
+- amend:        văn bản gốc <-> văn bản sửa đổi bổ sung (amendDocument / amendedDocument).
+                Văn bản sửa đổi không chép lại văn bản gốc nên đọc các chỉ dẫn
+                "Sửa đổi, bổ sung khoản 2 Điều 5 như sau: “...”", "Bãi bỏ Điều 9"...
+                trong phần của nó nói về văn bản gốc rồi diff nội dung mới với Điều cũ
+- consolidated: văn bản gốc <-> văn bản hợp nhất (HopNhatDocument / DuocHopNhatDocument)
+- replace:      văn bản bị thay thế <-> văn bản thay thế (replaceDocument / replacedDocument)
+Hai loại sau so trực tiếp: ghép Điều theo số (tiêu đề đủ giống) rồi theo tiêu đề,
+diff từng dòng (khoản / điểm) bằng difflib.SequenceMatcher; Điều giống hệt bỏ qua
+ngay bằng so sánh tuple dòng.
+
+Mỗi bản ghi: doc_id + article của văn bản gốc, change (modified / added / removed /
+renumbered), clause (khoản, nếu chỉ dẫn nhắm khoản), source_doc, relation, effective
+(yyyymmdd ngày hiệu lực văn bản nguồn, không có thì ngày ban hành; với văn bản hợp
+nhất là ngày ban hành VBHN), similarity, diff. ChangeIndex.changed_since(doc_id, ngày)
+trả các Điều đổi sau ngày ký hợp đồng (risk_scoring --changes dùng).
+
+Chạy:
+    python version_diff.py build --corpus chunks_with_meta.jsonl --out changes.jsonl --workers 4
+    python version_diff.py since --changes changes.jsonl --doc-id "06/2021/NĐ-CP" --date 20220101
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+
+from citation_extractor import CitationIndex, extract_citations
+from doc_utils import date_to_int
+from jsonl_index import JsonlReader
+
+# ========= 1. CẤU HÌNH =========
+TITLE_SIM = 0.5             # Điều cùng số nhưng tiêu đề giống dưới mức này -> coi là Điều khác
+MAX_OPS = 20                # số nhóm thay đổi tối đa lưu cho 1 Điều
+MAX_LINE_CHARS = 400
+CHUNKSIZE = 4
+SCOPE_HEAD_CHARS = 400      # đoạn đầu mỗi Điều của văn bản sửa đổi dùng để xác định văn bản đích
+
+# quan hệ -> (loại cặp, văn bản hiện tại là bản gốc?)
+PAIR_RELATIONS = {
+    "amendDocument": ("amend", True),
+    "amendedDocument": ("amend", False),
+    "HopNhatDocument": ("consolidated", True),
+    "DuocHopNhatDocument": ("consolidated", False),
+    "replaceDocument": ("replace", True),
+    "replacedDocument": ("replace", False),
+}
+
+_ARTICLE_RE = re.compile(r"^Điều\s+(\d+[a-zđ]?)\s*[.:]?\s*(.*)$", re.IGNORECASE)
+_URL_ID_RE = re.compile(r"-(\d+)\.aspx", re.IGNORECASE)
+_DIRECTIVE_RE = re.compile(r"^(?:\d+\.\s*|[a-zđ]\)\s*)?(Sửa đổi, bổ sung|Sửa đổi|Bổ sung|Bãi bỏ|Thay thế)\s+(.+)$",
+                           re.IGNORECASE)
+_TARGET_RE = re.compile(r"(?:khoản\s+(\d+)\s+(?:của\s+)?)?Điều\s+(\d+[a-zđ]?)", re.IGNORECASE)
+_CLAUSE_START_RE = re.compile(r"^(\d+)\.\s")
+_QUOTES = "“”\"'"
+
+
+def _norm_line(line: str) -> str:
+    return " ".join(line.split())
+
+
+def url_key(url: str):
+    m = _URL_ID_RE.search(url or "")
+    return m.group(1) if m else None
+
+
+# ========= 2. ĐIỀU / DIFF =========
+def articles_of(recs) -> dict:
+    """Chunk của 1 văn bản -> {số điều: {"title", "lines"}} theo thứ tự; bỏ phần mở đầu."""
+    out = {}
+    for rec in recs:
+        m = _ARTICLE_RE.match(_norm_line(rec.get("section_title") or ""))
+        if not m:
+            continue
+        lines = [_norm_line(ln) for ln in (rec.get("text") or "").split("\n")[1:]]
+        key = m.group(1).lower()
+        if key not in out:
+            out[key] = {"title": m.group(2).strip(), "lines": tuple(ln for ln in lines if ln)}
+    return out
+
+
+def _title_sim(a: str, b: str) -> float:
+    if not a and not b:
+        return 1.0
+    return SequenceMatcher(None, a.lower(), b.lower(), autojunk=False).ratio()
+
+
+def align_articles(old: dict, new: dict):
+    """list[(khóa cũ | None, khóa mới | None)]: theo số (tiêu đề đủ giống), rồi theo tiêu đề."""
+    pairs, used_new = [], set()
+    rest_old = []
+    for k, a in old.items():
+        b = new.get(k)
+        if b is not None and _title_sim(a["title"], b["title"]) >= TITLE_SIM:
+            pairs.append((k, k))
+            used_new.add(k)
+        else:
+            rest_old.append(k)
+    by_title = {}
+    for k, b in new.items():
+        if k not in used_new and b["title"]:
+            by_title.setdefault(b["title"].lower(), k)
+    for k in rest_old:
+        nk = by_title.pop(old[k]["title"].lower(), None) if old[k]["title"] else None
+        if nk is not None:
+            pairs.append((k, nk))
+            used_new.add(nk)
+        else:
+            pairs.append((k, None))
+    pairs += [(None, k) for k in new if k not in used_new]
+    return pairs
+
+
+def diff_lines(a, b):
+    """(similarity theo từ, list thay đổi {op, old, new} theo dòng) giữa 2 list dòng."""
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        ops.append({"op": tag, "old": [ln[:MAX_LINE_CHARS] for ln in a[i1:i2]],
+                    "new": [ln[:MAX_LINE_CHARS] for ln in b[j1:j2]]})
+    words = SequenceMatcher(None, " ".join(a).split(), " ".join(b).split())
+    return round(words.ratio(), 4), ops[:MAX_OPS]
+
+
+def diff_versions(old: dict, new: dict):
+    """So trực tiếp 2 phiên bản (hợp nhất / thay thế) -> list bản ghi (chưa có doc / nguồn)."""
+    out = []
+    for ok, nk in align_articles(old, new):
+        if nk is None:
+            out.append({"article": ok, "change": "removed", "title": old[ok]["title"]})
+        elif ok is None:
+            out.append({"article": nk, "change": "added", "title": new[nk]["title"],
+                        "diff": [{"op": "insert", "old": [], "new": list(new[nk]["lines"][:MAX_OPS])}]})
+        else:
+            a, b = old[ok], new[nk]
+            if a["lines"] == b["lines"] and ok == nk:
+                continue
+            rec = {"article": ok, "change": "modified" if ok == nk else "renumbered", "title": b["title"]}
+            if ok != nk:
+                rec["new_article"] = nk
+            if a["lines"] != b["lines"]:
+                rec["similarity"], rec["diff"] = diff_lines(a["lines"], b["lines"])
+            out.append(rec)
+    return out
+
+
+# ========= 3. CHỈ DẪN SỬA ĐỔI =========
+def parse_amendments(recs, in_scope, default_scope: bool):
+    """
+    recs: chunk của văn bản sửa đổi. in_scope(đầu Điều) -> True / False / None (không rõ, giữ
+    trạng thái trước; Điều đầu tiên không rõ thì lấy default_scope).
+    Trả list {"op", "targets": [(khoản | None, điều)], "lines": nội dung mới}.
+    """
+    directives = []
+    scope = default_scope
+    for rec in recs:
+        text = rec.get("text") or ""
+        s = in_scope(text[:SCOPE_HEAD_CHARS])
+        if s is not None:
+            scope = s
+        if not scope:
+            continue
+        cur, closed, depth = None, False, 0
+        for raw in text.split("\n")[1:]:
+            line = _norm_line(raw)
+            if not line:
+                continue
+            if depth == 0:
+                m = _DIRECTIVE_RE.match(line)
+                targets = [(int(k) if k else None, a.lower()) for k, a in _TARGET_RE.findall(m.group(2))] if m else []
+                if targets:
+                    cur, closed = {"op": m.group(1).lower(), "targets": targets, "lines": []}, False
+                    directives.append(cur)
+                    continue
+                if closed:
+                    continue
+            if cur is not None:
+                cur["lines"].append(line.strip(_QUOTES).strip())
+            depth = max(0, depth + line.count("“") - line.count("”"))
+            # nội dung trong ngoặc kép đã đóng -> dòng thường sau đó không thuộc chỉ dẫn
+            closed = depth == 0 and "”" in line
+    return directives
+
+
+def _clause_lines(lines, clause: int):
+    """Các dòng của khoản `clause` trong 1 Điều (từ 'k.' tới khoản kế tiếp)."""
+    out, inside = [], False
+    for ln in lines:
+        m = _CLAUSE_START_RE.match(ln)
+        if m:
+            inside = int(m.group(1)) == clause
+        if inside:
+            out.append(ln)
+    return tuple(out)
+
+
+def amendment_records(base: dict, directives):
+    out = []
+    for d in directives:
+        if d["op"] == "bãi bỏ":
+            for clause, art in d["targets"]:
+                out.append({"article": art, "clause": clause, "change": "removed",
+                            "title": base.get(art, {}).get("title")})
+            continue
+        clause, art = d["targets"][0]
+        new = list(d["lines"])
+        title = None
+        m = _ARTICLE_RE.match(new[0]) if new else None
+        if m:
+            title = m.group(2).strip()
+            new = new[1:]
+        old_art = base.get(art)
+        old = () if old_art is None else (old_art["lines"] if clause is None else _clause_lines(old_art["lines"], clause))
+        rec = {"article": art, "clause": clause, "change": "modified" if old else "added",
+               "title": title or (old_art or {}).get("title")}
+        if new or old:
+            rec["similarity"], rec["diff"] = diff_lines(list(old), new)
+        out.append(rec)
+    return out
+
+
+# ========= 4. CẶP PHIÊN BẢN =========
+def load_doc_meta(corpus_path: str) -> dict:
+    """1 lượt corpus: doc_id -> meta của chunk đầu (ngày, loại, quan hệ, url)."""
+    docs = {}
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            if rec["doc_id"] in docs:
+                continue
+            docs[rec["doc_id"]] = {
+                "effective": date_to_int(rec.get("effective_date")) or date_to_int(rec.get("issued_date")),
+                "issued": date_to_int(rec.get("issued_date")),
+                "source_url": rec.get("source_url"),
+                "relations": {k.split(" | ")[0]: v for k, v in (rec.get("relations_sections") or {}).items() if v},
+            }
+    return docs
+
+
+def find_pairs(docs: dict, cindex: CitationIndex):
+    """-> {(gốc, nguồn, loại)}, chỉ giữ cặp có cả 2 văn bản trong corpus."""
+    by_url = {url_key(d["source_url"]): doc_id for doc_id, d in docs.items() if url_key(d["source_url"])}
+
+    def resolve(link):
+        doc_id = by_url.get(url_key(link.get("url")))
+        if doc_id is None and link.get("name"):
+            cites = extract_citations(cindex, link["name"])
+            doc_id = cites[0]["doc_id"] if cites else None
+        return doc_id
+
+    pairs = set()
+    for doc_id, d in docs.items():
+        for rel, links in d["relations"].items():
+            if rel not in PAIR_RELATIONS:
+                continue
+            kind, is_base = PAIR_RELATIONS[rel]
+            for link in links:
+                other = resolve(link)
+                if other and other != doc_id and other in docs:
+                    pairs.add((doc_id, other, kind) if is_base else (other, doc_id, kind))
+    return pairs
+
+
+# ========= 5. TÍNH BẢN GHI (worker) =========
+_state = {}
+
+
+def _init_worker(corpus_path: str):
+    """Với fork: kế thừa reader + citation index đã mở ở process cha."""
+    if _state.get("corpus") == corpus_path:
+        return
+    _state["reader"] = JsonlReader(corpus_path)
+    _state["citations"] = CitationIndex.from_jsonl(corpus_path)
+    _state["corpus"] = corpus_path
+
+
+def _pair_records(task):
+    base_id, source_id, kind, effective, source_targets = task
+    reader, cindex = _state["reader"], _state["citations"]
+    base = articles_of(reader.by_doc(base_id))
+    source_recs = reader.by_doc(source_id)
+    if kind == "amend":
+        def in_scope(head):
+            cited = {c["doc_id"] for c in extract_citations(cindex, head)}
+            if base_id in cited:
+                return True
+            return False if cited & source_targets else None
+
+        # văn bản chỉ sửa 1 văn bản -> mặc định mọi Điều đều nói về nó
+        directives = parse_amendments(source_recs, in_scope, len(source_targets) <= 1)
+        recs = amendment_records(base, directives)
+    else:
+        recs = diff_versions(base, articles_of(source_recs))
+    for r in recs:
+        r.update({"doc_id": base_id, "source_doc": source_id, "relation": kind, "effective": effective})
+    return recs
+
+
+def build_changes(corpus_path: str, out_path: str, workers: int = None):
+    t0 = time.perf_counter()
+    _init_worker(corpus_path)
+    docs = load_doc_meta(corpus_path)
+    pairs = find_pairs(docs, _state["citations"])
+    targets = {}
+    for base_id, source_id, kind in pairs:
+        if kind == "amend":
+            targets.setdefault(source_id, set()).add(base_id)
+    tasks = [(b, s, kind, docs[s]["issued"] if kind == "consolidated" else docs[s]["effective"], targets.get(s, set()))
+             for b, s, kind in sorted(pairs)]
+    print(f"[INFO] {len(docs)} văn bản, {len(tasks)} cặp phiên bản "
+          f"({sum(t[2] == 'amend' for t in tasks)} sửa đổi, {sum(t[2] == 'consolidated' for t in tasks)} hợp nhất, "
+          f"{sum(t[2] == 'replace' for t in tasks)} thay thế)")
+    records = []
+    if workers == 1:
+        for t in tasks:
+            records += _pair_records(t)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(corpus_path,)) as pool:
+            for recs in pool.map(_pair_records, tasks, chunksize=CHUNKSIZE):
+                records += recs
+    records.sort(key=lambda r: (r["doc_id"], r["effective"], r["source_doc"]))
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+    print(f"[DONE] {len(records)} bản ghi thay đổi trong {time.perf_counter() - t0:.1f}s -> {out_path}")
+
+
+# ========= 6. TRA CỨU =========
+class ChangeIndex:
+    """doc_id -> bản ghi sắp theo effective; changed_since() = bisect."""
+
+    def __init__(self, path: str):
+        self.records = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    r = json.loads(line)
+                    self.records.setdefault(r["doc_id"], []).append(r)
+        self.dates = {}
+        for doc_id, recs in self.records.items():
+            recs.sort(key=lambda r: r["effective"])
+            self.dates[doc_id] = [r["effective"] for r in recs]
+
+    def changed_since(self, doc_id: str, date: int, article=None, include_undated: bool = True):
+        """Bản ghi có hiệu lực sau `date` (yyyymmdd); effective = 0 (không rõ ngày) tính là có thể đã đổi."""
+        recs = self.records.get(doc_id) or []
+        out = recs[bisect_right(self.dates.get(doc_id, []), date):]
+        if include_undated:
+            out = [r for r in recs if r["effective"] == 0] + out
+        if article is not None:
+            out = [r for r in out if r["article"] == str(article).lower()]
+        return out
+
+    def articles_changed_since(self, doc_id: str, date: int):
+        return sorted({r["article"] for r in self.changed_since(doc_id, date)}, key=_article_sort_key)
+
+
+def _article_sort_key(key: str):
+    m = re.match(r"(\d+)(.*)", key)
+    return (int(m.group(1)), m.group(2)) if m else (0, key)
+
+
+# ========= 7. CHẠY =========
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_build = sub.add_parser("build")
+    p_build.add_argument("--corpus", required=True)
+    p_build.add_argument("--out", required=True)
+    p_build.add_argument("--workers", type=int, default=None, help="1 = tuần tự")
+    p_since = sub.add_parser("since")
+    p_since.add_argument("--changes", required=True)
+    p_since.add_argument("--doc-id", required=True)
+    p_since.add_argument("--date", type=int, required=True, help="yyyymmdd, vd ngày ký hợp đồng")
+    p_since.add_argument("--article", default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build_changes(args.corpus, args.out, args.workers)
+    else:
+        idx = ChangeIndex(args.changes)
+        for r in idx.changed_since(args.doc_id, args.date, args.article):
+            clause = f" khoản {r['clause']}" if r.get("clause") else ""
+            print(f"{r['effective']}\tĐiều {r['article']}{clause}\t{r['change']}\t{r['relation']}: {r['source_doc']}"
+                  f"\t{(r.get('title') or '')[:60]}")